@@ -38,8 +38,10 @@ This approach is MORE ADAPTIVE than a pre-built static Decision Tree because:
 """
 
 import math
+from array import array
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple, Set
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Set, Union
 import random
 from dataclasses import dataclass, field
 from trait_system import (
@@ -52,7 +54,129 @@ from trait_system import (
 )
 
 
-@dataclass
+class CourseScoreVector:
+    """
+    Per-course scores held in an array('d') indexed by the engine's course ids.
+    
+    Course names are stored once on the engine (course_names / course_index) and
+    shared by every session, so a session only pays 8 bytes per course instead of
+    a dict entry plus a float object. Supports the dict operations the engine uses
+    (get, [], in, items, values, copy); to_dict() converts at the API/storage edge.
+    """
+    __slots__ = ("course_names", "course_index", "scores")
+    
+    def __init__(self, course_names: List[str], course_index: Dict[str, int], scores: array = None):
+        self.course_names = course_names
+        self.course_index = course_index
+        self.scores = scores if scores is not None else array('d', bytes(8 * len(course_names)))
+    
+    @classmethod
+    def from_dict(cls, course_names: List[str], course_index: Dict[str, int],
+                  values: Dict[str, float]) -> 'CourseScoreVector':
+        """Build a vector from a {course_name: score} dict (unknown courses are dropped)."""
+        vector = cls(course_names, course_index)
+        for name, score in values.items():
+            i = course_index.get(name)
+            if i is not None:
+                vector.scores[i] = score
+        return vector
+    
+    def _position(self, course_name: str) -> int:
+        i = self.course_index[course_name]
+        if i >= len(self.scores):
+            raise KeyError(course_name)
+        return i
+    
+    def __getitem__(self, course_name: str) -> float:
+        return self.scores[self._position(course_name)]
+    
+    def __setitem__(self, course_name: str, score: float):
+        self.scores[self._position(course_name)] = score
+    
+    def __contains__(self, course_name: str) -> bool:
+        i = self.course_index.get(course_name)
+        return i is not None and i < len(self.scores)
+    
+    def __len__(self) -> int:
+        return len(self.scores)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.course_names[:len(self.scores)])
+    
+    def get(self, course_name: str, default: float = None) -> Optional[float]:
+        if course_name in self:
+            return self.scores[self.course_index[course_name]]
+        return default
+    
+    def keys(self) -> List[str]:
+        return self.course_names[:len(self.scores)]
+    
+    def values(self) -> array:
+        return self.scores
+    
+    def items(self):
+        return zip(self.course_names, self.scores)
+    
+    def copy(self) -> 'CourseScoreVector':
+        return CourseScoreVector(self.course_names, self.course_index, array('d', self.scores))
+    
+    def clear(self):
+        self.scores = array('d')
+    
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self.items())
+
+
+class ActiveCourseSet:
+    """
+    Set of active course names stored as a bytearray mask over the engine's course ids.
+    
+    One byte per catalog course instead of a hash set of name references; supports
+    the set operations the engine uses (in, add, discard, len, iteration).
+    """
+    __slots__ = ("course_names", "course_index", "mask", "count")
+    
+    def __init__(self, course_names: List[str], course_index: Dict[str, int], active: bool = False):
+        self.course_names = course_names
+        self.course_index = course_index
+        self.mask = bytearray([1 if active else 0]) * len(course_names)
+        self.count = len(course_names) if active else 0
+    
+    @classmethod
+    def from_names(cls, course_names: List[str], course_index: Dict[str, int], names) -> 'ActiveCourseSet':
+        active = cls(course_names, course_index)
+        for name in names:
+            active.add(name)
+        return active
+    
+    def __contains__(self, course_name: str) -> bool:
+        i = self.course_index.get(course_name)
+        return i is not None and i < len(self.mask) and self.mask[i] == 1
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, flag in zip(self.course_names, self.mask) if flag)
+    
+    def add(self, course_name: str):
+        i = self.course_index[course_name]
+        if i < len(self.mask) and not self.mask[i]:
+            self.mask[i] = 1
+            self.count += 1
+    
+    def discard(self, course_name: str):
+        i = self.course_index.get(course_name)
+        if i is not None and i < len(self.mask) and self.mask[i]:
+            self.mask[i] = 0
+            self.count -= 1
+    
+    def clear(self):
+        self.mask = bytearray()
+        self.count = 0
+
+
+@dataclass(slots=True)
 class AdaptiveSession:
     """State for a single assessment session"""
     session_id: str
@@ -67,8 +191,9 @@ class AdaptiveSession:
     min_questions: int = 15
     
     trait_scores: Dict[str, float] = field(default_factory=dict)
-    course_scores: Dict[str, float] = field(default_factory=dict)
-    initial_course_scores: Dict[str, float] = field(default_factory=dict)  # Store initial scores with profile bonuses for proper recalculation
+    # CourseScoreVector once attached to an engine; plain dicts when freshly loaded from a store
+    course_scores: Union[CourseScoreVector, Dict[str, float]] = field(default_factory=dict)
+    initial_course_scores: Union[CourseScoreVector, Dict[str, float]] = field(default_factory=dict)  # Store initial scores with profile bonuses for proper recalculation
     answered_questions: Dict[int, int] = field(default_factory=dict)
     excluded_question_ids: Set[int] = field(default_factory=set)
     rejected_topics: Set[str] = field(default_factory=set)
@@ -77,10 +202,13 @@ class AdaptiveSession:
     answer_rejection_data: Dict[int, Dict] = field(default_factory=dict)  # Track rejected topics and penalties per question for reversal
     
     round_number: int = 0
-    active_courses: Set[str] = field(default_factory=set)
+    active_courses: Union[ActiveCourseSet, Set[str]] = field(default_factory=set)
+    active_trait_counts: Dict[str, int] = field(default_factory=dict)  # trait -> number of active courses with it, kept in sync with active_courses
     confidence: float = 0.0
     is_complete: bool = False
+    catalog_version: int = 0  # Engine snapshot this session was started on
     final_recommendations: List[dict] = field(default_factory=list)
+    final_courses_remaining: int = 0  # len(active_courses) at finalize time (active_courses is compacted away)
 
 
 # Maps SHS strand to prioritized traits for question selection
@@ -102,6 +230,218 @@ STRAND_PRIORITY_TRAITS = {
 }
 
 
+@lru_cache(maxsize=4096)
+def _split_entropy(active_with_trait: int, total_active: int) -> float:
+    """Binary entropy of a trait that covers active_with_trait of total_active courses."""
+    p = active_with_trait / total_active
+    return -p * math.log2(p) - (1-p) * math.log2(1-p) if 0 < p < 1 else 0
+
+
+# Maps question categories to the trait whose rejection excludes the whole question
+CATEGORY_TO_REJECTED_TRAIT = {
+    "education": "Teaching-Ed",
+    "teaching": "Teaching-Ed",
+    "healthcare": "Patient-Care",
+    "nursing": "Patient-Care",
+    "medical": "Medical-Lab",
+    "technology": "Software-Dev",
+    "programming": "Software-Dev",
+    "engineering": "Civil-Build",
+    "business": "Finance-Acct",
+    "accounting": "Finance-Acct",
+    "finance": "Finance-Acct",
+    "maritime": "Maritime-Sea",
+    "agriculture": "Agri-Nature",
+    "hospitality": "Hospitality-Svc",
+    "criminology": "Law-Enforce",
+    "law": "Law-Enforce",
+    "arts": "Visual-Design",
+    "creative": "Visual-Design",
+    "public service": "Community-Serve",
+}
+
+
+class QuestionScoringEngine:
+    """
+    Batched question scoring for adaptive question selection.
+    
+    Holds a sparse question x trait incidence table (option counts per trait,
+    plus the half-weight mapped traits) built once from the question bank.
+    Each round turns the session state into per-trait weight and mask vectors
+    and scores every question against them in a single pass.
+    """
+    
+    def __init__(self, questions: Dict[int, dict], trait_names: List[str]):
+        self.question_ids: List[int] = list(questions.keys())
+        self.trait_names: List[str] = list(trait_names)
+        self.trait_index: Dict[str, int] = {t: i for i, t in enumerate(self.trait_names)}
+        
+        self.option_counts: List[int] = []
+        self.option_bonus: List[float] = []
+        self.category_ids: List[int] = []
+        self.categories: List[str] = []
+        category_index: Dict[str, int] = {}
+        
+        # Sparse incidence rows: parallel arrays of trait indices and option counts
+        self.direct_traits: List[array] = []
+        self.direct_counts: List[array] = []
+        self.mapped_traits: List[array] = []
+        self.mapped_counts: List[array] = []
+        
+        for qid in self.question_ids:
+            question = questions[qid]
+            options = question.get('options', [])
+            direct: Dict[int, int] = {}
+            mapped: Dict[int, int] = {}
+            for opt in options:
+                trait = opt.get('trait_tag')
+                if not trait:
+                    continue
+                idx = self._trait_id(trait)
+                direct[idx] = direct.get(idx, 0) + 1
+                for mapped_trait in EXPANDED_TRAIT_MAPPING.get(trait, []):
+                    m_idx = self._trait_id(mapped_trait)
+                    mapped[m_idx] = mapped.get(m_idx, 0) + 1
+            
+            self.direct_traits.append(array('i', direct.keys()))
+            self.direct_counts.append(array('d', direct.values()))
+            self.mapped_traits.append(array('i', mapped.keys()))
+            self.mapped_counts.append(array('d', mapped.values()))
+            
+            self.option_counts.append(len(options))
+            # Bonus for questions with more options (more information)
+            self.option_bonus.append(min(len(options) / 4, 1.5))
+            
+            category = question.get('category', '')
+            if category not in category_index:
+                category_index[category] = len(self.categories)
+                self.categories.append(category)
+            self.category_ids.append(category_index[category])
+        
+        self.question_position: Dict[int, int] = {qid: i for i, qid in enumerate(self.question_ids)}
+        
+        # Rejected traits that exclude each category outright (keyword match on the category name)
+        self.category_rejection_traits: List[Tuple[str, ...]] = [
+            tuple(trait for keyword, trait in CATEGORY_TO_REJECTED_TRAIT.items() if keyword in category.lower())
+            for category in self.categories
+        ]
+        
+        # Strand relevance weights are fixed per strand, so build them once
+        self.strand_vectors: Dict[str, array] = {
+            strand: self._indicator_vector(traits) for strand, traits in STRAND_PRIORITY_TRAITS.items()
+        }
+    
+    def _trait_id(self, trait: str) -> int:
+        idx = self.trait_index.get(trait)
+        if idx is None:
+            idx = len(self.trait_names)
+            self.trait_names.append(trait)
+            self.trait_index[trait] = idx
+        return idx
+    
+    def _indicator_vector(self, traits) -> array:
+        vector = array('d', bytes(8 * len(self.trait_names)))
+        for trait in traits:
+            idx = self.trait_index.get(trait)
+            if idx is not None:
+                vector[idx] = 1.0
+        return vector
+    
+    @staticmethod
+    def _dot(indices: array, counts: array, vector) -> float:
+        return sum(c * vector[i] for i, c in zip(indices, counts))
+    
+    def score_questions(self, session: AdaptiveSession, trait_values: Dict[str, float],
+                        priority_traits: Set[str]) -> List[Optional[float]]:
+        """
+        Score every question for this round.
+        
+        Returns a list aligned with question_ids; None marks questions that are
+        masked out (answered, rejected category, or mostly rejected options).
+        """
+        n_traits = len(self.trait_names)
+        
+        # Per-round trait vectors
+        values = array('d', bytes(8 * n_traits))
+        for trait, value in trait_values.items():
+            idx = self.trait_index.get(trait)
+            if idx is not None:
+                values[idx] = value
+        strand = self.strand_vectors.get(session.user_strand)
+        if strand is None:
+            strand = array('d', bytes(8 * n_traits))
+        direct_weights = [v + 0.5 * s for v, s in zip(values, strand)]
+        mapped_weights = [v * 0.5 + 0.25 * s for v, s in zip(values, strand)]
+        
+        rejected = self._indicator_vector(session.rejected_topics) if session.rejected_topics else None
+        early_round = session.round_number < 5
+        priority = self._indicator_vector(priority_traits) if early_round and priority_traits else None
+        
+        # Per-round category vectors: rejection mask and diversity factor
+        category_rejected = [
+            any(trait in session.rejected_topics for trait in traits)
+            for traits in self.category_rejection_traits
+        ]
+        category_answered = [0] * len(self.categories)
+        for qid in session.answered_questions:
+            pos = self.question_position.get(qid)
+            if pos is not None:
+                category_answered[self.category_ids[pos]] += 1
+        diversity = [1 / (1 + count * 0.2) for count in category_answered]
+        
+        scores: List[Optional[float]] = []
+        for pos, qid in enumerate(self.question_ids):
+            cat_id = self.category_ids[pos]
+            if qid in session.excluded_question_ids or category_rejected[cat_id]:
+                scores.append(None)
+                continue
+            
+            total_options = self.option_counts[pos]
+            d_idx, d_cnt = self.direct_traits[pos], self.direct_counts[pos]
+            m_idx, m_cnt = self.mapped_traits[pos], self.mapped_counts[pos]
+            
+            rejected_count = self._dot(d_idx, d_cnt, rejected) if rejected is not None else 0
+            
+            # Skip questions where most options are about rejected topics
+            if total_options > 0 and rejected_count / total_options > 0.3:
+                scores.append(None)
+                continue
+            
+            score = self._dot(d_idx, d_cnt, direct_weights) + self._dot(m_idx, m_cnt, mapped_weights)
+            
+            # Penalize questions about rejected topics (mapped traits count half)
+            if total_options > 0 and rejected is not None:
+                rejection_ratio = (rejected_count + 0.5 * self._dot(m_idx, m_cnt, rejected)) / total_options
+                if rejection_ratio > 0.5:
+                    score *= 0.1
+                elif rejection_ratio > 0.3:
+                    score *= 0.4
+                elif rejection_ratio > 0.1:
+                    score *= 0.7
+            
+            score *= self.option_bonus[pos]
+            # Category diversity bonus (prefer different categories)
+            score *= diversity[cat_id]
+            
+            # FIRST 5 QUESTIONS: Focus on profile-relevant questions
+            if early_round:
+                profile_match_count = self._dot(d_idx, d_cnt, priority) if priority is not None else 0
+                if profile_match_count >= 3:
+                    score += 3.0
+                elif profile_match_count >= 2:
+                    score += 2.0
+                elif profile_match_count >= 1:
+                    score += 1.0
+                
+                # Penalty for rejected topic presence (even partial)
+                if rejected_count > 0:
+                    score *= (1 - rejected_count / total_options * 0.8)
+            
+            scores.append(score)
+        
+        return scores
+
+
 class AdaptiveAssessmentEngine:
     """
     Selects questions adaptively based on previous answers.
@@ -114,11 +454,18 @@ class AdaptiveAssessmentEngine:
     CONFIDENCE_THRESHOLD = 0.75  # Stop when top courses are this far ahead
     TOP_N_RECOMMENDATIONS = 6  # Number of courses to recommend
     
-    def __init__(self, courses: List[dict], questions: List[dict]):
-        """Initialize with course and question data."""
+    def __init__(self, courses: List[dict], questions: List[dict], session_store=None, catalog_version: int = 0):
+        """Initialize with course and question data.
+        
+        session_store: a session_store.SessionStore; defaults to an in-process dict store.
+        catalog_version: snapshot version stamped on sessions created by this engine.
+        """
+        from session_store import InMemorySessionStore
+        
         self.courses = {c['course_name']: c for c in courses}
         self.questions = {q['question_id']: q for q in questions}
-        self.sessions: Dict[str, AdaptiveSession] = {}
+        self.sessions = session_store if session_store is not None else InMemorySessionStore()
+        self.catalog_version = catalog_version
         
         # Build lookup tables
         self.trait_to_courses: Dict[str, Set[str]] = defaultdict(set)
@@ -138,8 +485,82 @@ class AdaptiveAssessmentEngine:
                 if trait:
                     self.trait_to_questions[trait].append(qid)
         
+        # Active-course count per trait when every course is active (copied into new sessions)
+        self.trait_course_counts: Dict[str, int] = {
+            trait: len(courses_with_trait) for trait, courses_with_trait in self.trait_to_courses.items()
+        }
+        
+        # Integer-indexed course and trait tables for the vectorized scoring path
+        self.course_names: List[str] = list(self.courses.keys())
+        self.course_index: Dict[str, int] = {name: i for i, name in enumerate(self.course_names)}
+        
+        all_traits = set(self.trait_to_courses) | set(self.trait_to_questions)
+        self.trait_names: List[str] = sorted(all_traits)
+        self.trait_index: Dict[str, int] = {t: i for i, t in enumerate(self.trait_names)}
+        
+        # Dense trait x trait similarity matrix (row i = similarities of trait i to every trait)
+        self.trait_similarity: List[array] = self._build_trait_similarity_matrix()
+        
+        # Per-trait course boost vectors (base points before the early-answer multiplier)
+        self.course_boost_vectors: Dict[str, array] = {
+            trait: self._build_course_boost_vector(trait) for trait in self.trait_names
+        }
+        
+        # Batched question scoring over the question x trait incidence table
+        self.question_scorer = QuestionScoringEngine(self.questions, self.trait_names)
+        
         print(f"[ENGINE] Adaptive Engine initialized with {len(self.courses)} courses and {len(self.questions)} questions")
     
+    def _build_trait_similarity_matrix(self) -> List[array]:
+        """Precompute specialized similarity for every ordered pair of known traits.
+        
+        The relationship tables are not symmetric (the first trait's entry wins),
+        so every (row, column) pair is evaluated rather than mirrored.
+        """
+        return [
+            array('d', (self._get_specialized_similarity(trait1, trait2) for trait2 in self.trait_names))
+            for trait1 in self.trait_names
+        ]
+    
+    def _build_course_boost_vector(self, chosen_trait: str) -> array:
+        """Base score boost per course (by course index) when a user picks chosen_trait."""
+        vector = array('d', bytes(8 * len(self.course_names)))
+        row_index = self.trait_index.get(chosen_trait)
+        row = self.trait_similarity[row_index] if row_index is not None else None
+        
+        for i, course_name in enumerate(self.course_names):
+            course_traits = self.course_traits.get(course_name, set())
+            
+            # Direct trait match - BIG BOOST (matches unique specialized trait)
+            if chosen_trait in course_traits:
+                vector[i] = 12.0
+                continue
+            
+            best_similarity = 0
+            for course_trait in course_traits:
+                if row is not None:
+                    sim = row[self.trait_index[course_trait]]
+                else:
+                    sim = self._get_specialized_similarity(chosen_trait, course_trait)
+                best_similarity = max(best_similarity, sim)
+            
+            if best_similarity > 0.7:
+                vector[i] = 6.0
+            elif best_similarity > 0.4:
+                vector[i] = 3.0
+            elif best_similarity > 0.2:
+                vector[i] = 1.0
+        
+        return vector
+    
+    def _get_course_boost_vector(self, chosen_trait: str) -> array:
+        """Get the boost vector for a trait, building it on first use for unseen traits."""
+        vector = self.course_boost_vectors.get(chosen_trait)
+        if vector is None:
+            vector = self._build_course_boost_vector(chosen_trait)
+            self.course_boost_vectors[chosen_trait] = vector
+        return vector
+    
     def _parse_traits(self, trait_tag) -> Set[str]:
         """Parse trait_tag field into set of traits"""
         if not trait_tag:
@@ -428,6 +849,25 @@ class AdaptiveAssessmentEngine:
         
         return None
     
+    def _get_session(self, session_id: str) -> Optional[AdaptiveSession]:
+        """Load a session, re-attaching the compact course containers if the store returned plain ones."""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            if isinstance(session.course_scores, dict):
+                session.course_scores = CourseScoreVector.from_dict(
+                    self.course_names, self.course_index, session.course_scores)
+            if isinstance(session.initial_course_scores, dict):
+                session.initial_course_scores = CourseScoreVector.from_dict(
+                    self.course_names, self.course_index, session.initial_course_scores)
+            if isinstance(session.active_courses, set):
+                session.active_courses = ActiveCourseSet.from_names(
+                    self.course_names, self.course_index, session.active_courses)
+        return session
+    
+    def _save_session(self, session: AdaptiveSession):
+        """Write session state back to the store (needed for shared, copy-on-read backends)."""
+        self.sessions.save(session)
+    
     def _get_profile_priority_traits(self, session: AdaptiveSession) -> Set[str]:
         """Get traits that should be prioritized based on user's profile interests/skills.
         
@@ -560,7 +1000,7 @@ class AdaptiveAssessmentEngine:
         min_questions = int(max_questions * 0.5)
         
         # Initialize all courses with base score
-        course_scores = {name: 50.0 for name in self.courses}
+        course_scores = CourseScoreVector(self.course_names, self.course_index, array('d', [50.0]) * len(self.course_names))
         
         # Apply initial GWA/Strand bonuses (not exclusions!)
         for course_name, course in self.courses.items():
@@ -593,7 +1033,9 @@ class AdaptiveAssessmentEngine:
             min_questions=min_questions,
             course_scores=course_scores,
             initial_course_scores=course_scores.copy(),  # Store initial scores with all profile bonuses
-            active_courses=set(self.courses.keys())
+            active_courses=ActiveCourseSet(self.course_names, self.course_index, active=True),
+            active_trait_counts=self.trait_course_counts.copy(),
+            catalog_version=self.catalog_version
         )
         
         self.sessions[session_id] = session
@@ -602,7 +1044,7 @@ class AdaptiveAssessmentEngine:
     
     def get_next_question(self, session_id: str) -> Optional[dict]:
         """Select question based on profile relevance (early) and information gain (later)."""
-        session = self.sessions.get(session_id)
+        session = self._get_session(session_id)
         if not session or session.is_complete:
             return None
         
@@ -618,91 +1060,22 @@ class AdaptiveAssessmentEngine:
         # Calculate information gain for adaptive selection
         trait_info_scores = self._calculate_trait_information_gain(session)
         
+        # Score every question in one batched pass, then break ties by a random order
+        question_scores = self.question_scorer.score_questions(
+            session, trait_info_scores, all_priority_traits
+        )
+        
         best_question = None
         best_score = -1
         
-        question_ids = list(self.questions.keys())
-        random.shuffle(question_ids)
+        order = list(range(len(question_scores)))
+        random.shuffle(order)
         
-        for qid in question_ids:
-            if qid in session.excluded_question_ids:
-                continue
-            
-            question = self.questions[qid]
-            options = question.get('options', [])
-            
-            # Check how many options are about rejected topics
-            rejected_count = 0
-            profile_match_count = 0
-            
-            # Check if the question category matches a rejected topic
-            question_category = question.get('category', '').lower()
-            
-            # Map question categories to traits for complete exclusion
-            CATEGORY_TO_REJECTED_TRAIT = {
-                "education": "Teaching-Ed",
-                "teaching": "Teaching-Ed",
-                "healthcare": "Patient-Care",
-                "nursing": "Patient-Care",
-                "medical": "Medical-Lab",
-                "technology": "Software-Dev",
-                "programming": "Software-Dev",
-                "engineering": "Civil-Build",
-                "business": "Finance-Acct",
-                "accounting": "Finance-Acct",
-                "finance": "Finance-Acct",
-                "maritime": "Maritime-Sea",
-                "agriculture": "Agri-Nature",
-                "hospitality": "Hospitality-Svc",
-                "criminology": "Law-Enforce",
-                "law": "Law-Enforce",
-                "arts": "Visual-Design",
-                "creative": "Visual-Design",
-                "public service": "Community-Serve",
-            }
-            
-            # SKIP entire question if its category matches a rejected topic
-            category_rejected = False
-            for cat_keyword, rejected_trait in CATEGORY_TO_REJECTED_TRAIT.items():
-                if cat_keyword in question_category and rejected_trait in session.rejected_topics:
-                    category_rejected = True
-                    break
-            
-            if category_rejected:
-                continue  # Skip this question entirely
-            
-            for opt in options:
-                trait = opt.get('trait_tag')
-                if trait:
-                    if trait in session.rejected_topics:
-                        rejected_count += 1
-                    if trait in all_priority_traits:
-                        profile_match_count += 1
-            
-            # Skip questions where most options are about rejected topics (lowered threshold)
-            if len(options) > 0 and rejected_count / len(options) > 0.3:
-                continue
-            
-            # Calculate base score
-            question_score = self._score_question(question, trait_info_scores, session)
-            
-            # FIRST 5 QUESTIONS: Focus on profile-relevant questions
-            if session.round_number < 5:
-                # Strong bonus for questions matching user's profile
-                if profile_match_count >= 3:
-                    question_score += 3.0
-                elif profile_match_count >= 2:
-                    question_score += 2.0
-                elif profile_match_count >= 1:
-                    question_score += 1.0
-                
-                # Penalty for rejected topic presence (even partial)
-                if rejected_count > 0:
-                    question_score *= (1 - rejected_count / len(options) * 0.8)
-            
-            if question_score > best_score:
+        for pos in order:
+            question_score = question_scores[pos]
+            if question_score is not None and question_score > best_score:
                 best_score = question_score
-                best_question = question
+                best_question = self.questions[self.question_scorer.question_ids[pos]]
         
         if best_question:
             session.round_number += 1
@@ -724,6 +1097,8 @@ class AdaptiveAssessmentEngine:
                 for name, score in sorted_courses[:5]
             ]
             
+            self._save_session(session)
+            
             return {
                 "session_id": session_id,
                 "round": session.round_number,
@@ -780,10 +1155,11 @@ class AdaptiveAssessmentEngine:
         if total_active == 0:
             return trait_value
         
-        for trait, courses_with_trait in self.trait_to_courses.items():
-            # How many active courses have this trait?
-            active_with_trait = len(courses_with_trait & session.active_courses)
-            
+        # Sessions restored without cached counts rebuild them once
+        if not session.active_trait_counts:
+            session.active_trait_counts = self._count_active_traits(session.active_courses)
+        
+        for trait, active_with_trait in session.active_trait_counts.items():
             if active_with_trait == 0 or active_with_trait == total_active:
                 # This trait doesn't discriminate at all
                 trait_value[trait] = 0
@@ -791,8 +1167,7 @@ class AdaptiveAssessmentEngine:
             
             # Information gain is highest when trait splits courses 50/50
             # Entropy: -p*log(p) - (1-p)*log(1-p)
-            p = active_with_trait / total_active
-            entropy = -p * math.log2(p) - (1-p) * math.log2(1-p) if 0 < p < 1 else 0
+            entropy = _split_entropy(active_with_trait, total_active)
             
             # Reduce value if we already have strong info about this trait
             existing_knowledge = abs(session.trait_scores.get(trait, 0))
@@ -802,70 +1177,17 @@ class AdaptiveAssessmentEngine:
         
         return trait_value
     
-    def _score_question(self, question: dict, trait_values: Dict[str, float], 
-                       session: AdaptiveSession) -> float:
-        """Score question value based on trait info gain and strand relevance."""
-        score = 0
-        options = question.get('options', [])
-        
-        # Get strand priority traits
-        strand_priority_traits = set(STRAND_PRIORITY_TRAITS.get(session.user_strand, []))
-        
-        # Track if this question is primarily about a rejected topic
-        rejected_option_count = 0
-        total_options = len(options)
-        
-        for opt in options:
-            trait = opt.get('trait_tag')
-            if trait:
-                # Check if this option's trait is in rejected topics
-                if trait in session.rejected_topics:
-                    rejected_option_count += 1
-                
-                # Direct trait value
-                score += trait_values.get(trait, 0)
-                
-                # Strand relevance bonus
-                if trait in strand_priority_traits:
-                    score += 0.5
-                
-                # Also consider mapped traits from our trait system
-                mapped_traits = EXPANDED_TRAIT_MAPPING.get(trait, [])
-                for mapped_trait in mapped_traits:
-                    score += trait_values.get(mapped_trait, 0) * 0.5
-                    if mapped_trait in strand_priority_traits:
-                        score += 0.25
-                    # Check mapped traits for rejection too
-                    if mapped_trait in session.rejected_topics:
-                        rejected_option_count += 0.5
-        
-        # Penalize questions about rejected topics
-        if total_options > 0:
-            rejection_ratio = rejected_option_count / total_options
-            if rejection_ratio > 0.5:
-                score *= 0.1
-            elif rejection_ratio > 0.3:
-                score *= 0.4
-            elif rejection_ratio > 0.1:
-                score *= 0.7
-        
-        # Bonus for questions with more options (more information)
-        option_bonus = min(len(options) / 4, 1.5)
-        score *= option_bonus
-        
-        # Category diversity bonus (prefer different categories)
-        category = question.get('category', '')
-        category_count = sum(1 for qid in session.answered_questions 
-                           if self.questions.get(qid, {}).get('category') == category)
-        diversity_bonus = 1 / (1 + category_count * 0.2)
-        score *= diversity_bonus
-        
-        return score
+    def _count_active_traits(self, active_courses: ActiveCourseSet) -> Dict[str, int]:
+        """Count active courses per trait from scratch."""
+        return {
+            trait: sum(1 for course_name in courses_with_trait if course_name in active_courses)
+            for trait, courses_with_trait in self.trait_to_courses.items()
+        }
     
     def process_answer(self, session_id: str, question_id: int, 
                       chosen_option_id: int) -> dict:
         """Process answer and update trait/course scores."""
-        session = self.sessions.get(session_id)
+        session = self._get_session(session_id)
         if not session:
             print(f"[WARN] process_answer: Session {session_id} not found!")
             return {"error": "Session not found"}
@@ -964,8 +1286,11 @@ class AdaptiveAssessmentEngine:
                         # Track the penalty for reversal
                         rejection_data["course_penalties"][course_name] = rejection_data["course_penalties"].get(course_name, 0) + 8
         
-        # Store rejection data for this question (for reversal)
-        session.answer_rejection_data[question_id] = rejection_data
+        # Store rejection data for this question (for reversal) - most answers have none
+        if rejection_data["rejected_topics"] or rejection_data["course_penalties"]:
+            session.answer_rejection_data[question_id] = rejection_data
+        else:
+            session.answer_rejection_data.pop(question_id, None)
         
         # Extract trait from chosen option
         chosen_trait = chosen_option.get('trait_tag')
@@ -1033,6 +1358,8 @@ class AdaptiveAssessmentEngine:
             for name, score in sorted_courses[:5]
         ]
         
+        self._save_session(session)
+        
         return {
             "status": "continue",
             "session_id": session_id,
@@ -1075,27 +1402,13 @@ class AdaptiveAssessmentEngine:
         elif session.round_number <= 7:
             early_boost_multiplier = 1.5  # Next 4 answers: 1.5x impact
         
-        for course_name in list(session.active_courses):
-            course_traits = self.course_traits.get(course_name, set())
-            
-            # Direct trait match - BIG BOOST (matches unique specialized trait)
-            if chosen_trait in course_traits:
-                boost = 12.0 * early_boost_multiplier  # Base 12 points (was 8)
-                session.course_scores[course_name] += boost
-            else:
-                # Check for similar traits using our SPECIALIZED trait system
-                best_similarity = 0
-                for course_trait in course_traits:
-                    sim = self._get_specialized_similarity(chosen_trait, course_trait)
-                    best_similarity = max(best_similarity, sim)
-                
-                # Similarity-based score boost (also scaled by early multiplier)
-                if best_similarity > 0.7:
-                    session.course_scores[course_name] += 6.0 * early_boost_multiplier
-                elif best_similarity > 0.4:
-                    session.course_scores[course_name] += 3.0 * early_boost_multiplier
-                elif best_similarity > 0.2:
-                    session.course_scores[course_name] += 1.0 * early_boost_multiplier
+        # Single pass over the precomputed boost vector instead of per-course similarity lookups
+        boost_vector = self._get_course_boost_vector(chosen_trait)
+        active_mask = session.active_courses.mask
+        scores = session.course_scores.scores
+        for i, base_boost in enumerate(boost_vector):
+            if base_boost and active_mask[i]:
+                scores[i] += base_boost * early_boost_multiplier
     
     def _calculate_confidence(self, session: AdaptiveSession) -> float:
         """Calculate recommendation confidence based on score separation."""
@@ -1143,6 +1456,7 @@ class AdaptiveAssessmentEngine:
         """Build final course recommendations."""
         print(f"[OK_GREEN] FINALIZE SESSION CALLED - session_id: {session.session_id}")
         session.is_complete = True
+        session.final_courses_remaining = len(session.active_courses)
         
         # Sort courses by score
         sorted_courses = sorted(
@@ -1212,6 +1526,7 @@ class AdaptiveAssessmentEngine:
         print(f"[OK_GREEN] Generated {len(recommendations)} recommendations")
         print(f"[OK_GREEN] Recommendation course names: {[r['course_name'] for r in recommendations]}")
         print(f"[OK] Session {session.session_id} complete after {session.round_number} questions")
+        self._save_session(session)
     
     def _generate_recommendation_reasoning(self, session: AdaptiveSession, course_name: str,
                                            course: dict, course_traits: Set[str],
@@ -1463,7 +1778,7 @@ class AdaptiveAssessmentEngine:
     def get_final_results(self, session_id: str) -> dict:
         """Retrieve final recommendations."""
         print(f"[BLUE] get_final_results called for session: {session_id}")
-        session = self.sessions.get(session_id)
+        session = self._get_session(session_id)
         if not session:
             print(f"[RED] Session not found: {session_id}")
             return {"error": "Session not found"}
@@ -1485,10 +1800,14 @@ class AdaptiveAssessmentEngine:
     
     def finish_early(self, session_id: str) -> dict:
         """End session early and return current recommendations."""
-        session = self.sessions.get(session_id)
+        session = self._get_session(session_id)
         if not session:
             return {"error": "Session not found"}
         
+        if session.is_complete:
+            # Already finalized (and possibly compacted) - return the stored results as they are
+            return self.get_final_results(session_id)
+        
         if session.round_number < self.MIN_QUESTIONS:
             return {
                 "error": f"Please answer at least {self.MIN_QUESTIONS} questions",
@@ -1501,7 +1820,7 @@ class AdaptiveAssessmentEngine:
     
     def go_to_previous_question(self, session_id: str) -> dict:
         """Go back to previous question and allow user to change answer."""
-        session = self.sessions.get(session_id)
+        session = self._get_session(session_id)
         if not session:
             return {"error": "Session not found"}
         
@@ -1577,6 +1896,8 @@ class AdaptiveAssessmentEngine:
         
         print(f"[PREVIOUS] Went back to Q{previous_question_id}. Round: {session.round_number}, answers: {len(session.answered_questions)}, traits: {len(session.trait_scores)}")
         
+        self._save_session(session)
+        
         return {
             "status": "continue",
             "session_id": session_id,
@@ -1596,10 +1917,11 @@ class AdaptiveAssessmentEngine:
         session.course_scores = session.initial_course_scores.copy()
         
         # Apply trait-based scoring
+        scores = session.course_scores.scores
         for trait, score in session.trait_scores.items():
             if trait in self.trait_to_courses:
                 for course_name in self.trait_to_courses[trait]:
-                    session.course_scores[course_name] = session.course_scores.get(course_name, 50.0) + (score * 2)
+                    scores[self.course_index[course_name]] += score * 2
 
 
 # Singleton instance (will be initialized by FastAPI)
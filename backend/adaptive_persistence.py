@@ -0,0 +1,276 @@
+# adaptive_persistence.py
+"""
+Background Persistence for Completed Adaptive Assessments
+
+Completed sessions used to be written inline by /adaptive/answer and
+/adaptive/finish (several commits, a raw user_test_attempts sync and one
+Course query per recommendation). They are now queued and written by a
+worker thread that batches them:
+
+- One transaction per batch: TestAttempt rows are flushed together, then
+  StudentAnswer and Recommendation rows are bulk inserted and the daily trait
+  rollups are bumped in the same transaction
+- Course names resolve through the shared catalog cache (same exact /
+  case-insensitive "contains" matching as before, without the queries)
+- The user_test_attempts sync runs in a savepoint so a missing legacy
+  table cannot roll back the batch
+- If a batch fails, its sessions are retried one by one so a single bad
+  record does not drop the others
+
+The student gets their results immediately; history shows up once the
+batch commits (max_wait_seconds, half a second by default).
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+import models
+import database
+import trait_rollups
+from catalog_cache import course_catalog
+from report_cache import report_cache
+
+
+@dataclass
+class CompletedAssessment:
+    """Snapshot of everything the history tables need from a finished session."""
+    session_id: str
+    user_id: int
+    answered_questions: Dict[int, int] = field(default_factory=dict)
+    recommendations: List[dict] = field(default_factory=list)
+    max_questions: Optional[int] = None
+    questions_presented: Optional[int] = None
+    confidence_score: Optional[float] = None
+    user_gwa: Optional[float] = None
+    user_strand: Optional[str] = None
+    traits_found: int = 0
+
+    @classmethod
+    def from_session(cls, session, recommendations: List[dict]) -> 'CompletedAssessment':
+        # Copy now: the live session may be compacted or evicted before the worker runs
+        return cls(
+            session_id=session.session_id,
+            user_id=session.user_id,
+            answered_questions=dict(session.answered_questions),
+            recommendations=list(recommendations or []),
+            max_questions=session.max_questions,
+            questions_presented=session.round_number,  # Total rounds = questions shown
+            confidence_score=round(session.confidence * 100, 1),  # 1 decimal place, same as the student app
+            user_gwa=session.user_gwa,
+            user_strand=session.user_strand,
+            traits_found=len(session.trait_scores),
+        )
+
+
+class AdaptiveResultWriter:
+    """Queue + worker thread that writes completed assessments in batches."""
+
+    def __init__(self, session_factory=None, batch_size: int = 50, max_wait_seconds: float = 0.5):
+        self.session_factory = session_factory or database.SessionLocal
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: "queue.Queue[Optional[CompletedAssessment]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._adaptive_test_id: Optional[int] = None
+        self.stats = {"queued": 0, "written": 0, "failed": 0, "batches": 0}
+
+    # ---------------- lifecycle ----------------
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="adaptive-result-writer", daemon=True)
+                self._thread.start()
+                print("[PERSIST] Adaptive result writer started")
+
+    def stop(self, timeout: float = 10.0):
+        """Write everything still queued, then stop the worker."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+            print(f"[PERSIST] Adaptive result writer stopped ({self.stats['written']} written, {self.stats['failed']} failed)")
+
+    def submit(self, assessment: CompletedAssessment):
+        self.start()
+        self._queue.put(assessment)
+        self.stats["queued"] += 1
+        print(f"[PERSIST] Queued session {assessment.session_id} for user {assessment.user_id}")
+
+    # ---------------- worker ----------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[CompletedAssessment]):
+        db = self.session_factory()
+        try:
+            written = self._write(db, batch)
+            db.commit()
+            report_cache.record_attempts(len(batch), *written)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            print(f"[PERSIST] Saved {len(batch)} adaptive session(s) in one transaction")
+            return
+        except Exception as e:
+            db.rollback()
+            self._adaptive_test_id = None  # May have been created in the rolled-back transaction
+            print(f"[WARN] Batch save of {len(batch)} sessions failed ({e}), retrying individually")
+        finally:
+            db.close()
+
+        for assessment in batch:
+            db = self.session_factory()
+            try:
+                written = self._write(db, [assessment])
+                db.commit()
+                report_cache.record_attempts(1, *written)
+                self.stats["written"] += 1
+            except Exception as e:
+                db.rollback()
+                self._adaptive_test_id = None
+                self.stats["failed"] += 1
+                print(f"[ERROR] Could not save adaptive session {assessment.session_id}: {e}")
+                import traceback
+                traceback.print_exc()
+            finally:
+                db.close()
+
+    def _write(self, db, batch: List[CompletedAssessment]) -> Tuple[List[int], List[int]]:
+        """Add the batch to the transaction. Returns (recommended course ids, chosen traits)."""
+        test_id = self._get_adaptive_test_id(db)
+
+        attempts = [
+            models.TestAttempt(
+                user_id=a.user_id,
+                test_id=test_id,
+                max_questions=a.max_questions,  # Quiz length selected (30, 50, 60)
+                questions_presented=a.questions_presented,
+                questions_answered=len(a.answered_questions),
+                confidence_score=a.confidence_score,
+                user_gwa=a.user_gwa,
+                user_strand=a.user_strand
+            )
+            for a in batch
+        ]
+        db.add_all(attempts)
+        db.flush()  # One multi-row INSERT; assigns attempt ids
+
+        answer_rows = []
+        recommendation_rows = []
+        for a, attempt in zip(batch, attempts):
+            for question_id, option_id in a.answered_questions.items():
+                answer_rows.append({
+                    "attempt_id": attempt.attempt_id,
+                    "question_id": question_id,
+                    "chosen_option_id": option_id
+                })
+            for rec in a.recommendations:
+                course_name = (rec.get("course_name") or "").strip()
+                course = course_catalog.find_by_name(db, course_name, partial=True) if course_name else None
+                if course is None:
+                    print(f"[REC_SAVE] [-] NO MATCH for: '{course_name}'")
+                    continue
+                recommendation_rows.append({
+                    "attempt_id": attempt.attempt_id,
+                    "user_id": a.user_id,
+                    "course_id": course.course_id,
+                    "reasoning": f"{rec.get('description', '')} - Match: {rec.get('match_percentage', 75)}%",
+                    "score": rec.get("match_percentage", 75)  # Store the match percentage as score
+                })
+
+        if answer_rows:
+            db.bulk_insert_mappings(models.StudentAnswer, answer_rows)
+        if recommendation_rows:
+            db.bulk_insert_mappings(models.Recommendation, recommendation_rows)
+        chosen_traits = self._record_trait_rollups(db, batch, attempts)
+
+        self._sync_user_test_attempts(db, batch, attempts, test_id)
+        return [row["course_id"] for row in recommendation_rows], chosen_traits
+
+    @staticmethod
+    def _record_trait_rollups(db, batch: List[CompletedAssessment], attempts) -> List[str]:
+        """Add the batch's answers to the daily trait rollups. Returns the traits counted."""
+        traits_by_option = trait_rollups.option_traits(
+            db, (option_id for a in batch for option_id in a.answered_questions.values())
+        )
+        days = trait_rollups.attempt_days(db, (attempt.attempt_id for attempt in attempts))
+        counts = Counter()
+        for a, attempt in zip(batch, attempts):
+            day = days[attempt.attempt_id]
+            strand = trait_rollups.normalize_strand(a.user_strand)
+            for option_id in a.answered_questions.values():
+                trait = traits_by_option.get(option_id)
+                if trait_rollups.is_reportable_trait(trait):
+                    counts[(day, strand, "adaptive", trait)] += 1
+        trait_rollups.add_counts(db, counts)
+        return [key[3] for key in counts.elements()]
+
+    def _sync_user_test_attempts(self, db, batch: List[CompletedAssessment], attempts, test_id: int):
+        """Mirror attempts into the per-user tracking table (if it exists)."""
+        params = [
+            {
+                "attempt_id": attempt.attempt_id,
+                "user_id": a.user_id,
+                "test_id": test_id,
+                "total_questions": len(a.answered_questions),  # Actual questions answered
+                "max_questions": a.max_questions,
+                "confidence_score": a.confidence_score,
+                "traits_found": a.traits_found
+            }
+            for a, attempt in zip(batch, attempts)
+        ]
+        try:
+            with db.begin_nested():
+                db.execute(text('''
+                    INSERT INTO user_test_attempts
+                    (attempt_id, user_id, test_id, score, total_questions, attempt_date, time_taken, created_at,
+                     max_questions, confidence_score, traits_found)
+                    SELECT :attempt_id, :user_id, :test_id, 0, :total_questions, NOW(), 0, NOW(),
+                           :max_questions, :confidence_score, :traits_found
+                    WHERE NOT EXISTS (SELECT 1 FROM user_test_attempts WHERE attempt_id = :attempt_id)
+                '''), params)
+        except Exception as sync_error:
+            print(f"[WARN] Could not sync to user_test_attempts: {sync_error}")
+
+    # ---------------- cached lookups ----------------
+
+    def _get_adaptive_test_id(self, db) -> int:
+        if self._adaptive_test_id is None:
+            adaptive_test = db.query(models.Test).filter(models.Test.test_type == "adaptive").first()
+            if not adaptive_test:
+                adaptive_test = models.Test(
+                    test_name="Smart Assessment (Adaptive)",
+                    test_type="adaptive",
+                    description="Akinator-style adaptive assessment"
+                )
+                db.add(adaptive_test)
+                db.flush()
+                print(f"🆕 Created new adaptive test with ID: {adaptive_test.test_id}")
+            self._adaptive_test_id = adaptive_test.test_id
+        return self._adaptive_test_id
@@ -0,0 +1,125 @@
+# admin_exports.py
+"""
+Keyset Pagination and Streaming Exports for Admin Listings
+
+Admin listings (test attempts, low-rated feedback, course feedback) used to
+load every matching row, then walk relationships lazily, before slicing.
+
+Helpers shared by those endpoints:
+- encode_cursor / decode_cursor: opaque '<timestamp iso>|<id>' keyset cursors
+  for lists ordered newest first (timestamp DESC, id DESC)
+- apply_keyset: filter a query to the rows after a cursor. On SQLite the
+  timestamps are compared (and ordered) through datetime(): server_default
+  now() stores 'YYYY-MM-DD HH:MM:SS' while a bound datetime carries
+  '.ffffff', so a raw comparison puts the cursor row after itself
+- stream_export: NDJSON or CSV StreamingResponse that pages through a query
+  with keyset batches on its own DB session, so months of rows never sit in
+  memory at once
+"""
+
+import csv
+import datetime
+import io
+import json
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_
+
+import database
+
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_BATCH_SIZE = 500
+MAX_PAGE_SIZE = 500  # Upper bound for ?limit= on paged listings
+
+_SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # What datetime() returns
+
+
+def encode_cursor(timestamp: Optional[datetime.datetime], row_id: int) -> str:
+    return f"{timestamp.isoformat() if timestamp else ''}|{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime.datetime], int]:
+    """Raises ValueError for malformed cursors."""
+    timestamp, row_id = cursor.rsplit("|", 1)
+    return (datetime.datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+
+
+def apply_keyset(query, timestamp_col, id_col, cursor: Optional[Tuple[Optional[datetime.datetime], int]]):
+    """Rows strictly after `cursor` in (timestamp DESC NULLS LAST, id DESC) order, then that ordering."""
+    sqlite = query.session.get_bind().dialect.name == "sqlite"
+    timestamp_key = func.datetime(timestamp_col) if sqlite else timestamp_col
+    if cursor is not None:
+        timestamp, row_id = cursor
+        if timestamp is not None:
+            value = timestamp.strftime(_SQLITE_TIMESTAMP_FORMAT) if sqlite else timestamp
+            query = query.filter(or_(
+                timestamp_key < value,
+                and_(timestamp_key == value, id_col < row_id),
+                timestamp_key.is_(None)
+            ))
+        else:
+            query = query.filter(timestamp_key.is_(None), id_col < row_id)
+    return query.order_by(timestamp_key.desc().nulls_last(), id_col.desc())
+
+
+def fetch_page(query, timestamp_col, id_col, cursor, limit: Optional[int], row_key: Callable):
+    """(rows, next_cursor) for one page; next_cursor is None on the last page."""
+    query = apply_keyset(query, timestamp_col, id_col, cursor)
+    if not limit:
+        return query.all(), None
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*row_key(rows[-1]))
+
+
+def iter_rows(build_query: Callable, timestamp_col, id_col, row_key: Callable,
+              serialize: Callable, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Serialized rows of build_query(db), fetched in keyset batches on a private session."""
+    db = database.SessionLocal()  # The request's session is closed before the response streams
+    try:
+        cursor = None
+        while True:
+            batch = apply_keyset(build_query(db), timestamp_col, id_col, cursor).limit(batch_size).all()
+            for row in batch:
+                yield serialize(row)
+            if len(batch) < batch_size:
+                return
+            cursor = row_key(batch[-1])
+            db.expunge_all()  # Keep the identity map from growing across batches
+    finally:
+        db.close()
+
+
+def _ndjson_lines(rows: Iterator[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def _csv_lines(rows: Iterator[dict], fields: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(fields), extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def stream_export(rows: Iterator[dict], fmt: str, fields: List[str], filename: str):
+    """StreamingResponse of rows as NDJSON or CSV (fields sets the CSV columns)."""
+    from fastapi.responses import StreamingResponse
+
+    if fmt == "csv":
+        body, media_type = _csv_lines(rows, fields), "text/csv"
+    else:
+        body, media_type = _ndjson_lines(rows), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{fmt}"}
+    )
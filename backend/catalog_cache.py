@@ -0,0 +1,190 @@
+# catalog_cache.py
+"""
+Process-wide Course Catalog Cache
+
+The course catalog (~100 rows) rarely changes but was read from the database
+on almost every request: per-recommendation lookups by name (with a LIKE
+fallback) when saving results, and per-recommendation lookups by id when
+building history, digests and exports.
+
+CourseCatalogCache loads the table once into plain read-only records indexed
+by course_id and by normalized name. It is warmed in lifespan and invalidated
+by the admin course endpoints; `version` increases on every invalidation so
+derived caches can tell when the catalog changed.
+
+Courses added by another worker or by catalog_import.py are not announced
+to this process, so a lookup miss checks the database once; if the row
+exists the cache is invalidated and reloaded. Misses that the database
+confirms are remembered until the next reload.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func
+
+import models
+
+
+@dataclass(frozen=True)
+class CachedCourse:
+    """Detached copy of a models.Course row (same attribute names)."""
+    course_id: int
+    course_name: str
+    description: Optional[str]
+    trait_tag: Optional[str]
+    required_strand: Optional[str]
+    minimum_gwa: Optional[object]  # Decimal, as stored in the Numeric column
+
+
+def normalize_course_name(name: str) -> str:
+    """Case-insensitive, whitespace-insensitive key for course names."""
+    return re.sub(r"\s+", " ", (name or "").strip()).casefold()
+
+
+class CourseCatalogCache:
+    """Course rows by id and by normalized name, loaded on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._courses: Optional[List[CachedCourse]] = None
+        self._by_id: Dict[int, CachedCourse] = {}
+        self._by_name: Dict[str, CachedCourse] = {}
+        self._misses: Set[tuple] = set()  # Lookups the database confirmed do not exist
+        self.version = 0
+
+    MAX_REMEMBERED_MISSES = 1024
+
+    def warm(self, db) -> int:
+        """(Re)load the catalog from the database. Returns the number of courses."""
+        return len(self._load(db)[0])
+
+    def _load(self, db):
+        """
+        Read the table and publish it, unless invalidate() ran while we were
+        reading (the rows may predate that edit). Returns what was read either way.
+        """
+        with self._lock:
+            version = self.version
+        rows = db.query(models.Course).order_by(models.Course.course_id).all()
+        courses = [
+            CachedCourse(
+                course_id=c.course_id,
+                course_name=c.course_name,
+                description=c.description,
+                trait_tag=c.trait_tag,
+                required_strand=c.required_strand,
+                minimum_gwa=c.minimum_gwa
+            )
+            for c in rows
+        ]
+        by_name: Dict[str, CachedCourse] = {}
+        for course in courses:
+            by_name.setdefault(course.course_name, course)
+        for course in courses:
+            by_name.setdefault(normalize_course_name(course.course_name), course)
+
+        by_id = {c.course_id: c for c in courses}
+
+        with self._lock:
+            if self.version != version:
+                print(f"[CATALOG] Catalog changed while loading; not caching version {version}")
+                return courses, by_id, by_name
+            self._courses = courses
+            self._by_id = by_id
+            self._by_name = by_name
+            self._misses.clear()
+        print(f"[CATALOG] Cached {len(courses)} courses (version {version})")
+        return courses, by_id, by_name
+
+    def invalidate(self):
+        """Drop the cached catalog; the next lookup reloads it."""
+        with self._lock:
+            self._courses = None
+            self._by_id = {}
+            self._by_name = {}
+            self._misses.clear()
+            self.version += 1
+        print(f"[CATALOG] Course cache invalidated (version {self.version})")
+
+    def _snapshot(self, db):
+        """Current (courses, by_id, by_name), loading them first if needed."""
+        with self._lock:
+            if self._courses is not None:
+                return self._courses, self._by_id, self._by_name
+        return self._load(db)
+
+    def _remember_miss(self, key: tuple):
+        with self._lock:
+            if len(self._misses) >= self.MAX_REMEMBERED_MISSES:
+                self._misses.clear()
+            self._misses.add(key)
+
+    def _reload_if_exists(self, db, key: tuple, query) -> bool:
+        """
+        After a lookup miss: True (and the cache reloaded) if `query` finds the
+        row in the database, False if not (remembered until the next reload).
+        """
+        with self._lock:
+            if key in self._misses:
+                return False
+        if query.first() is None:
+            self._remember_miss(key)
+            return False
+        print(f"[CATALOG] Course {key[1]!r} is not cached yet; reloading")
+        self.invalidate()
+        return True
+
+    def all(self, db) -> List[CachedCourse]:
+        courses, _, _ = self._snapshot(db)
+        return list(courses)
+
+    def get(self, db, course_id: int) -> Optional[CachedCourse]:
+        _, by_id, _ = self._snapshot(db)
+        course = by_id.get(course_id)
+        if course is None and course_id is not None and self._reload_if_exists(
+            db, ("id", course_id),
+            db.query(models.Course.course_id).filter(models.Course.course_id == course_id)
+        ):
+            _, by_id, _ = self._snapshot(db)
+            course = by_id.get(course_id)
+            if course is None:
+                self._remember_miss(("id", course_id))  # Deleted again meanwhile; don't reload per lookup
+        return course
+
+    def find_by_name(self, db, course_name: str, partial: bool = False) -> Optional[CachedCourse]:
+        """
+        Exact name, then normalized name. With partial=True, falls back to the
+        first course whose name contains course_name (the old ILIKE '%name%').
+        """
+        course = self._find_cached(self._snapshot(db), course_name, partial)
+        name = (course_name or "").strip()
+        if course is None and name:
+            column = models.Course.course_name
+            condition = column.ilike(f"%{name}%") if partial else func.lower(column) == name.lower()
+            key = ("name", name, partial)
+            if self._reload_if_exists(db, key, db.query(models.Course.course_id).filter(condition)):
+                course = self._find_cached(self._snapshot(db), course_name, partial)
+                if course is None:
+                    self._remember_miss(key)  # The database matches it differently (e.g. whitespace)
+        return course
+
+    @staticmethod
+    def _find_cached(snapshot, course_name: str, partial: bool) -> Optional[CachedCourse]:
+        courses, _, by_name = snapshot
+        course = by_name.get(course_name) or by_name.get(normalize_course_name(course_name))
+        if course or not partial:
+            return course
+        needle = normalize_course_name(course_name)
+        if not needle:
+            return None
+        for candidate in courses:
+            if needle in normalize_course_name(candidate.course_name):
+                return candidate
+        return None
+
+
+# Shared instance used by main.py and the background writers
+course_catalog = CourseCatalogCache()
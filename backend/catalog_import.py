@@ -0,0 +1,328 @@
+# catalog_import.py
+"""
+Bulk Catalog Import (courses, questions, options)
+
+seed_database used to add each question, flush it to get its id, then add its
+options one at a time: hundreds of round trips for the 1,000+ option bank.
+
+import_catalog() loads the same COURSES_POOL / QUESTIONS_POOL structures (or
+JSON / CSV files with the same fields) in a fixed number of statements:
+- One SELECT per table for what already exists
+- One executemany INSERT for new rows and one executemany UPDATE for changed
+  rows per table (nothing is written for unchanged rows)
+- One SELECT to pick up the ids of newly inserted questions
+
+Rows are matched on natural keys, so re-importing a catalog upserts it
+instead of requiring a wipe:
+- Courses by course_name
+- Questions by (test_id, question_text)
+- Options by (question, option_text)
+Rows missing from the import are left alone (answers and recommendations
+still reference them).
+
+Field mapping is the one seed_database always used: trait_tag lists are
+stored comma-joined, recommended_strand goes to Course.required_strand, and
+career_path / extracurricular / situational_mapped options keep their
+trait_tags / recommended_courses as JSON text. Questions without options get
+the Yes / No pair.
+
+Usage:
+    python catalog_import.py                      # built-in pools
+    python catalog_import.py catalog.json         # {"courses": [...], "questions": [...]}
+    python catalog_import.py courses.csv questions.csv
+"""
+
+import csv
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import models
+
+
+MAPPED_QUESTION_TYPES = ("career_path", "extracurricular", "situational_mapped")
+
+COURSE_FIELDS = ("description", "trait_tag", "required_strand", "minimum_gwa")
+QUESTION_FIELDS = ("category", "question_type")
+OPTION_FIELDS = ("trait_tag", "weight", "trait_tags_json", "recommended_courses_json")
+
+
+# ---------------- record normalization ----------------
+
+def course_row(c: dict) -> dict:
+    tags = c.get("trait_tag", [])
+    return {
+        "course_name": c.get("course_name"),
+        "description": c.get("description"),
+        "minimum_gwa": c.get("minimum_gwa"),
+        "required_strand": c.get("recommended_strand"),  # Map from recommended_strand to required_strand
+        "trait_tag": ", ".join(tags) if isinstance(tags, list) else str(tags)
+    }
+
+
+def question_rows(q: dict) -> Tuple[dict, List[dict]]:
+    """(question row, option rows) for one pool / file question."""
+    question_type = q.get("question_type", "standard")
+    question = {
+        # Support both old format ("question") and new format ("question_text")
+        "question_text": q.get("question_text") or q.get("question"),
+        "category": q.get("category"),
+        "question_type": question_type
+    }
+    options = []
+    for opt in q.get("options", []):
+        trait_tags_json = None
+        recommended_courses_json = None
+        if question_type in MAPPED_QUESTION_TYPES:
+            trait_tags_json = json.dumps(opt.get("trait_tags", []))
+            recommended_courses_json = json.dumps(opt.get("recommended_courses", []))
+        options.append({
+            # Support both old format ("text"/"tag") and new format ("option_text"/"trait_tag")
+            "option_text": opt.get("option_text") or opt.get("text"),
+            "trait_tag": opt.get("trait_tag") or opt.get("tag"),
+            "weight": opt.get("weight", 1),
+            "trait_tags_json": trait_tags_json,
+            "recommended_courses_json": recommended_courses_json
+        })
+    if not options:
+        options = [
+            {"option_text": "Yes", "trait_tag": q.get("tag"), "weight": 1,
+             "trait_tags_json": None, "recommended_courses_json": None},
+            {"option_text": "No", "trait_tag": "None", "weight": 1,
+             "trait_tags_json": None, "recommended_courses_json": None},
+        ]
+    return question, options
+
+
+def _changed(current: dict, row: dict, fields: Iterable[str]) -> bool:
+    return any(current[f] != row[f] for f in fields)
+
+
+# ---------------- import ----------------
+
+def import_catalog(db, courses: Iterable[dict] = (), questions: Iterable[dict] = (),
+                   test_id: Optional[int] = None, commit: bool = True) -> Dict[str, Dict[str, int]]:
+    """
+    Upsert courses and questions (with options). Questions go to test_id, the
+    "assessment" test by default. Returns inserted/updated/unchanged counts per table.
+    """
+    stats = {
+        table: {"inserted": 0, "updated": 0, "unchanged": 0}
+        for table in ("courses", "questions", "options")
+    }
+    courses = list(courses)
+    questions = list(questions)
+    if courses:
+        _upsert_courses(db, [course_row(c) for c in courses], stats["courses"])
+    if questions:
+        if test_id is None:
+            test_id = _default_test_id(db)
+        _upsert_questions(db, [question_rows(q) for q in questions], test_id, stats)
+    if commit:
+        db.commit()
+    return stats
+
+
+def _default_test_id(db) -> int:
+    test = db.query(models.Test).filter(models.Test.test_type == "assessment").first()
+    if not test:
+        test = models.Test(
+            test_name="Career Assessment",
+            test_type="assessment",
+            description="Comprehensive career interest and aptitude assessment to recommend college courses"
+        )
+        db.add(test)
+        db.flush()
+    return test.test_id
+
+
+def _upsert_courses(db, rows: List[dict], stats: Dict[str, int]):
+    C = models.Course
+    existing = {
+        r.course_name: r._asdict()
+        for r in db.query(C.course_id, C.course_name, *(getattr(C, f) for f in COURSE_FIELDS)).all()
+    }
+    new_rows, changed_rows, seen = [], [], set()
+    for row in rows:
+        name = row["course_name"]
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        current = existing.get(name)
+        if current is None:
+            new_rows.append(row)
+        elif _changed(current, row, COURSE_FIELDS):
+            changed_rows.append({"course_id": current["course_id"], **row})
+        else:
+            stats["unchanged"] += 1
+
+    if new_rows:
+        db.bulk_insert_mappings(C, new_rows)
+    if changed_rows:
+        db.bulk_update_mappings(C, changed_rows)
+    stats["inserted"] += len(new_rows)
+    stats["updated"] += len(changed_rows)
+
+
+def _upsert_questions(db, items: List[Tuple[dict, List[dict]]], test_id: int, stats: Dict[str, Dict[str, int]]):
+    Q, O = models.Question, models.Option
+
+    def load_questions() -> Dict[str, dict]:
+        return {
+            r.question_text: r._asdict()
+            for r in db.query(Q.question_id, Q.question_text, *(getattr(Q, f) for f in QUESTION_FIELDS))
+            .filter(Q.test_id == test_id).all()
+        }
+
+    existing = load_questions()
+    new_rows, changed_rows, merged = [], [], {}
+    for question, options in items:
+        text = question["question_text"]
+        if not text:
+            continue
+        if text in merged:
+            merged[text].extend(options)  # Same question listed twice: treat as one
+            continue
+        merged[text] = list(options)
+        current = existing.get(text)
+        if current is None:
+            new_rows.append({"test_id": test_id, **question})
+        elif _changed(current, question, QUESTION_FIELDS):
+            changed_rows.append({"question_id": current["question_id"], **question})
+        else:
+            stats["questions"]["unchanged"] += 1
+
+    if new_rows:
+        db.bulk_insert_mappings(Q, new_rows)
+    if changed_rows:
+        db.bulk_update_mappings(Q, changed_rows)
+    stats["questions"]["inserted"] += len(new_rows)
+    stats["questions"]["updated"] += len(changed_rows)
+
+    # Ids of the questions just inserted (one query instead of a flush per question)
+    question_ids = {text: row["question_id"] for text, row in (load_questions() if new_rows else existing).items()}
+
+    existing_options = {}
+    known_ids = [question_ids[text] for text in merged if text in existing]
+    if known_ids:
+        for r in db.query(O.option_id, O.question_id, O.option_text, *(getattr(O, f) for f in OPTION_FIELDS)) \
+                .filter(O.question_id.in_(known_ids)).all():
+            existing_options.setdefault((r.question_id, r.option_text), r._asdict())
+
+    new_options, changed_options, seen = [], [], set()
+    for text, options in merged.items():
+        question_id = question_ids[text]
+        for opt in options:
+            key = (question_id, opt["option_text"])
+            if not opt["option_text"] or key in seen:
+                continue
+            seen.add(key)
+            current = existing_options.get(key)
+            if current is None:
+                new_options.append({"question_id": question_id, **opt})
+            elif _changed(current, opt, OPTION_FIELDS):
+                changed_options.append({"option_id": current["option_id"], **opt})
+            else:
+                stats["options"]["unchanged"] += 1
+
+    if new_options:
+        db.bulk_insert_mappings(O, new_options)
+    if changed_options:
+        db.bulk_update_mappings(O, changed_options)
+    stats["options"]["inserted"] += len(new_options)
+    stats["options"]["updated"] += len(changed_options)
+
+
+# ---------------- file sources ----------------
+
+def _split_list(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").replace(";", ",").split(",") if part.strip()]
+
+
+def _read_courses_csv(rows: List[dict]) -> List[dict]:
+    return [
+        {
+            "course_name": (r.get("course_name") or "").strip(),
+            "description": r.get("description") or None,
+            "minimum_gwa": float(r["minimum_gwa"]) if r.get("minimum_gwa") else None,
+            "recommended_strand": r.get("recommended_strand") or None,
+            "trait_tag": _split_list(r.get("trait_tag"))
+        }
+        for r in rows
+    ]
+
+
+def _read_questions_csv(rows: List[dict]) -> List[dict]:
+    """One CSV row per option; consecutive rows with the same question_text form a question."""
+    questions: Dict[str, dict] = {}
+    for r in rows:
+        text = (r.get("question_text") or "").strip()
+        if not text:
+            continue
+        q = questions.setdefault(text, {
+            "question_text": text,
+            "category": r.get("category") or None,
+            "question_type": r.get("question_type") or "standard",
+            "tag": r.get("tag") or None,
+            "options": []
+        })
+        if r.get("option_text"):
+            q["options"].append({
+                "option_text": r["option_text"],
+                "trait_tag": r.get("trait_tag") or None,
+                "weight": int(r["weight"]) if r.get("weight") else 1,
+                "trait_tags": _split_list(r.get("trait_tags")),
+                "recommended_courses": _split_list(r.get("recommended_courses"))
+            })
+    return list(questions.values())
+
+
+def load_catalog_file(path: str) -> Tuple[List[dict], List[dict]]:
+    """(courses, questions) from a .json or .csv file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+        headers = set(rows[0]) if rows else set()
+        if "question_text" in headers:
+            return [], _read_questions_csv(rows)
+        if "course_name" in headers:
+            return _read_courses_csv(rows), []
+        raise ValueError(f"{path}: expected a course_name or question_text column")
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return list(data.get("courses", [])), list(data.get("questions", []))
+    if data and "course_name" in data[0]:
+        return data, []
+    return [], data
+
+
+if __name__ == "__main__":
+    import sys
+    import database
+
+    courses, questions = [], []
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            file_courses, file_questions = load_catalog_file(path)
+            courses += file_courses
+            questions += file_questions
+    else:
+        from seed_data import COURSES_POOL, QUESTIONS_POOL
+        courses, questions = COURSES_POOL, QUESTIONS_POOL
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        started = time.perf_counter()
+        result = import_catalog(db, courses, questions)
+        print(f"[IMPORT] Done in {time.perf_counter() - started:.2f}s")
+        for table, counts in result.items():
+            print(f"   {table}: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged")
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] Catalog import failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
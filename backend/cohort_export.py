@@ -0,0 +1,179 @@
+# cohort_export.py
+"""
+Cohort (Class / Section) Report Export
+
+Counselors used to call /export/pdf once per student with a payload built in
+the browser. load_cohort_reports() builds the same ExportRequest payloads on
+the server for a whole cohort:
+- Cohort = explicit user ids and/or a strand, optionally within a date range
+  (on TestAttempt.taken_at)
+- Three queries in total: attempts (with users), their recommendations, and
+  the chosen-option trait counts used for "Detected Traits" (each split into
+  IN_CHUNK_SIZE id batches to stay under SQLite's bind-variable limit)
+- Course details come from the catalog cache
+
+The payloads feed pdf_reports.PDFRenderService.render_many() and are zipped
+with pdf_reports.stream_zip().
+"""
+
+import csv
+import datetime
+import io
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
+
+import models
+from catalog_cache import course_catalog
+from pdf_reports import report_filename, unique_names
+
+
+# Ids per IN (...) list; SQLite before 3.32 allows 999 bound parameters per statement
+IN_CHUNK_SIZE = 500
+
+
+@dataclass
+class CohortReport:
+    user_id: int
+    attempt_id: int
+    taken_at: Optional[datetime.datetime]
+    filename: str
+    payload: dict  # ExportRequest shape
+
+
+def _profile_value(user, key: str):
+    return (user.academic_info or {}).get(key) if user else None
+
+
+def _chunks(ids: List[int], size: int = IN_CHUNK_SIZE) -> Iterable[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _load_attempts(db, user_ids: Optional[List[int]], strand: Optional[str],
+                   date_from: Optional[datetime.date], date_to: Optional[datetime.date]) -> List[models.TestAttempt]:
+    query = db.query(models.TestAttempt).options(joinedload(models.TestAttempt.user))
+    if date_from:
+        query = query.filter(models.TestAttempt.taken_at >= datetime.datetime.combine(date_from, datetime.time.min))
+    if date_to:
+        query = query.filter(models.TestAttempt.taken_at <= datetime.datetime.combine(date_to, datetime.time.max))
+    if strand:
+        # Strand at assessment time; attempts saved before it was recorded are
+        # matched on the current profile below
+        query = query.filter(or_(
+            func.upper(func.trim(models.TestAttempt.user_strand)) == strand,
+            models.TestAttempt.user_strand.is_(None),
+            models.TestAttempt.user_strand == ""
+        ))
+    query = query.order_by(
+        models.TestAttempt.user_id, models.TestAttempt.taken_at.desc(), models.TestAttempt.attempt_id.desc()
+    )
+    if user_ids is None:
+        attempts = query.all()
+    else:
+        attempts = []
+        for chunk in _chunks(sorted(set(user_ids))):  # Ascending chunks keep the user_id ordering
+            attempts.extend(query.filter(models.TestAttempt.user_id.in_(chunk)).all())
+    if strand:
+        attempts = [
+            a for a in attempts
+            if a.user_strand or (_profile_value(a.user, "strand") or "").strip().upper() == strand
+        ]
+    return attempts
+
+
+def load_cohort_reports(db, user_ids: Optional[Iterable[int]] = None, strand: Optional[str] = None,
+                        date_from: Optional[datetime.date] = None, date_to: Optional[datetime.date] = None,
+                        latest_only: bool = True) -> List[CohortReport]:
+    """
+    Report payloads for the cohort, ordered by student name. latest_only keeps
+    each student's most recent attempt in the range; otherwise every attempt
+    gets its own report.
+    """
+    attempts = _load_attempts(
+        db, list(user_ids) if user_ids is not None else None,
+        strand.strip().upper() if strand else None, date_from, date_to
+    )
+    if latest_only:
+        seen = set()
+        attempts = [a for a in attempts if not (a.user_id in seen or seen.add(a.user_id))]
+    if not attempts:
+        return []
+
+    attempt_ids = [a.attempt_id for a in attempts]
+
+    recommendations: Dict[int, List[dict]] = {}
+    rec_rows = []
+    for chunk in _chunks(attempt_ids):
+        rec_rows.extend(db.query(
+            models.Recommendation.attempt_id, models.Recommendation.course_id, models.Recommendation.reasoning,
+            models.Recommendation.score
+        ).filter(
+            models.Recommendation.attempt_id.in_(chunk)
+        ).order_by(models.Recommendation.attempt_id, models.Recommendation.recommendation_id).all())
+    for row in rec_rows:
+        course = course_catalog.get(db, row.course_id)
+        if course is None:
+            continue
+        recommendations.setdefault(row.attempt_id, []).append({
+            "course_name": course.course_name,
+            "description": course.description,
+            "reasoning": row.reasoning,
+            "minimum_gwa": float(course.minimum_gwa) if course.minimum_gwa is not None else None,
+            "recommended_strand": course.required_strand,
+            "compatibility_score": row.score
+        })
+
+    traits: Dict[int, Counter] = {}
+    trait_rows = []
+    for chunk in _chunks(attempt_ids):
+        trait_rows.extend(db.query(
+            models.StudentAnswer.attempt_id, models.Option.trait_tag, func.count(models.StudentAnswer.answer_id)
+        ).join(
+            models.Option, models.Option.option_id == models.StudentAnswer.chosen_option_id
+        ).filter(
+            models.StudentAnswer.attempt_id.in_(chunk),
+            models.Option.trait_tag.isnot(None),
+            models.Option.trait_tag.notin_(["", "None"])
+        ).group_by(models.StudentAnswer.attempt_id, models.Option.trait_tag).all())
+    for attempt_id, trait, count in trait_rows:
+        traits.setdefault(attempt_id, Counter())[trait] = count
+
+    attempts.sort(key=lambda a: ((a.user.fullname if a.user else "").casefold(), a.user_id,
+                                 -(a.taken_at.timestamp() if a.taken_at else 0)))
+    reports = []
+    for attempt in attempts:
+        user = attempt.user
+        name = user.fullname if user else f"User {attempt.user_id}"
+        payload = {
+            "user_name": name,
+            "user_gwa": attempt.user_gwa or _profile_value(user, "gwa"),
+            "user_strand": attempt.user_strand or _profile_value(user, "strand"),
+            "detected_traits": [[t, c] for t, c in traits.get(attempt.attempt_id, Counter()).most_common(5)],
+            "recommendations": recommendations.get(attempt.attempt_id, [])
+        }
+        filename = report_filename(name)
+        if not latest_only and attempt.taken_at:
+            filename = filename[:-4] + f"_{attempt.taken_at.strftime('%Y-%m-%d')}.pdf"
+        reports.append(CohortReport(attempt.user_id, attempt.attempt_id, attempt.taken_at, filename, payload))
+
+    for report, name in zip(reports, unique_names(r.filename for r in reports)):
+        report.filename = name
+    return reports
+
+
+def manifest_csv(reports: List[CohortReport]) -> bytes:
+    """index.csv listing which file belongs to which student / attempt."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["file", "user_id", "student_name", "attempt_id", "taken_at", "strand", "recommendations"])
+    for r in reports:
+        writer.writerow([
+            r.filename, r.user_id, r.payload["user_name"], r.attempt_id,
+            r.taken_at.isoformat() if r.taken_at else "", r.payload["user_strand"] or "",
+            len(r.payload["recommendations"])
+        ])
+    return buffer.getvalue().encode("utf-8")
@@ -0,0 +1,360 @@
+# daily_digest.py
+"""
+Daily Digest Generation
+
+/send-daily-digest used to build one user's digest per request, with a Test
+and a Recommendation query per attempt and the whole HTML document rebuilt
+from scratch each time.
+
+This module loads and renders digests in bulk:
+- load_digests(): every user with attempts on a day (optionally a subset of
+  users) with their attempts and recommendations in two queries; courses come
+  from the catalog cache
+- render_digest(): fills templates compiled once at import (the stylesheet
+  and static markup are shared by every digest)
+- run_daily_digest(): the batch job. Sends through the shared email queue
+  (worker pool, pooled connections, EMAIL_RATE_PER_SECOND throttle), or with
+  dry_run writes each rendered digest to <output_dir>/<date>/<user_id>.html
+  (the API always uses DAILY_DIGEST_DRY_RUN_DIR; only the CLI picks a path)
+
+Scheduling: with DAILY_DIGEST_TIME=HH:MM set, start_scheduler() runs the job
+once a day at that local time inside the API process. Every uvicorn worker
+starts a scheduler, so each run first claims its date in daily_digest_runs
+(claim_run); only the worker whose insert succeeds sends. It can also be run
+from cron (which claims the date the same way; --force resends a claimed date):
+    python daily_digest.py [--date YYYY-MM-DD] [--dry-run OUTPUT_DIR] [--force]
+"""
+
+import datetime
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from string import Template
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+import models
+from catalog_cache import course_catalog
+
+
+@dataclass
+class DigestItem:
+    test_name: str
+    taken_at: str
+    questions_answered: int
+    confidence_score: float
+    courses: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class UserDigest:
+    user_id: int
+    fullname: str
+    email: Optional[str]
+    items: List[DigestItem] = field(default_factory=list)
+
+
+# ---------------- loading ----------------
+
+def day_bounds(day: datetime.date):
+    return datetime.datetime.combine(day, datetime.time.min), datetime.datetime.combine(day, datetime.time.max)
+
+
+def load_digests(db, day: datetime.date, user_ids: Optional[Iterable[int]] = None) -> Dict[int, UserDigest]:
+    """Digests (attempts newest first) for every user with attempts on `day`."""
+    start, end = day_bounds(day)
+    query = db.query(models.TestAttempt).options(
+        joinedload(models.TestAttempt.user),
+        joinedload(models.TestAttempt.test)
+    ).filter(
+        models.TestAttempt.taken_at >= start,
+        models.TestAttempt.taken_at <= end
+    )
+    if user_ids is not None:
+        query = query.filter(models.TestAttempt.user_id.in_(list(user_ids)))
+    attempts = query.order_by(
+        models.TestAttempt.user_id, models.TestAttempt.taken_at.desc(), models.TestAttempt.attempt_id.desc()
+    ).all()
+    if not attempts:
+        return {}
+
+    courses_by_attempt: Dict[int, List[dict]] = {}
+    recommendations = db.query(
+        models.Recommendation.attempt_id, models.Recommendation.course_id, models.Recommendation.reasoning
+    ).filter(
+        models.Recommendation.attempt_id.in_([a.attempt_id for a in attempts])
+    ).order_by(models.Recommendation.recommended_at.asc(), models.Recommendation.recommendation_id.asc()).all()
+    for rec in recommendations:
+        course = course_catalog.get(db, rec.course_id)
+        if course:
+            courses_by_attempt.setdefault(rec.attempt_id, []).append({
+                "name": course.course_name,
+                "description": course.description,
+                "reasoning": rec.reasoning
+            })
+
+    digests: Dict[int, UserDigest] = {}
+    for attempt in attempts:
+        user = attempt.user
+        digest = digests.get(attempt.user_id)
+        if digest is None:
+            digest = digests[attempt.user_id] = UserDigest(
+                user_id=attempt.user_id,
+                fullname=user.fullname if user else "Student",
+                email=user.email if user else None
+            )
+        digest.items.append(DigestItem(
+            test_name=attempt.test.test_name if attempt.test else "Assessment",
+            taken_at=attempt.taken_at.strftime('%I:%M %p') if attempt.taken_at else 'N/A',
+            questions_answered=attempt.questions_answered or 0,
+            confidence_score=attempt.confidence_score or 0,
+            courses=courses_by_attempt.get(attempt.attempt_id, [])
+        ))
+    return digests
+
+
+# ---------------- rendering ----------------
+
+_DIGEST_HEAD = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <style>
+            body { font-family: 'Segoe UI', Arial, sans-serif; background: #f0f4f8; margin: 0; padding: 20px; }
+            .container { max-width: 650px; margin: 0 auto; background: #ffffff; border-radius: 16px; overflow: hidden; box-shadow: 0 4px 20px rgba(0,0,0,0.1); }
+            .header { background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 50%, #a855f7 100%); padding: 40px 30px; text-align: center; }
+            .header h1 { color: #ffffff; margin: 0; font-size: 28px; font-weight: 700; }
+            .header p { color: rgba(255,255,255,0.9); margin: 10px 0 0 0; font-size: 14px; }
+            .content { padding: 30px; }
+            .greeting { font-size: 18px; color: #1e293b; margin-bottom: 20px; }
+            .summary-box { background: linear-gradient(135deg, rgba(99, 102, 241, 0.1) 0%, rgba(139, 92, 246, 0.1) 100%); border-radius: 12px; padding: 20px; margin-bottom: 25px; text-align: center; }
+            .summary-stat { display: inline-block; margin: 0 20px; }
+            .summary-stat .value { font-size: 32px; font-weight: 700; color: #6366f1; display: block; }
+            .summary-stat .label { font-size: 12px; color: #64748b; text-transform: uppercase; }
+            .assessment { background: #f8fafc; border-radius: 12px; padding: 20px; margin-bottom: 20px; border-left: 4px solid #6366f1; }
+            .assessment h3 { color: #1e293b; margin: 0 0 8px 0; font-size: 18px; }
+            .assessment-meta { color: #64748b; font-size: 13px; margin-bottom: 15px; }
+            .assessment-meta span { margin-right: 15px; }
+            .course { background: #ffffff; border: 1px solid #e2e8f0; border-radius: 8px; padding: 15px; margin-top: 12px; }
+            .course h4 { color: #6366f1; margin: 0 0 6px 0; font-size: 15px; }
+            .course p { color: #64748b; margin: 0; font-size: 13px; line-height: 1.5; }
+            .course .reasoning { margin-top: 8px; padding-top: 8px; border-top: 1px solid #e2e8f0; font-style: italic; color: #94a3b8; }
+            .footer { background: #f8fafc; padding: 25px 30px; text-align: center; border-top: 1px solid #e2e8f0; }
+            .footer p { color: #64748b; margin: 5px 0; font-size: 12px; }
+            .no-courses { color: #94a3b8; font-style: italic; margin-top: 10px; }
+        </style>
+    </head>"""
+
+_DIGEST_INTRO = Template("""
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>📊 Daily Digest</h1>
+                <p>$day</p>
+            </div>
+            <div class="content">
+                <p class="greeting">Hello <strong>$fullname</strong>! 👋</p>
+                <p style="color: #64748b; margin-bottom: 25px;">Here's a summary of your assessment activity today:</p>
+
+                <div class="summary-box">
+                    <div class="summary-stat">
+                        <span class="value">$assessments</span>
+                        <span class="label">Assessments</span>
+                    </div>
+                    <div class="summary-stat">
+                        <span class="value">$questions</span>
+                        <span class="label">Questions</span>
+                    </div>
+                    <div class="summary-stat">
+                        <span class="value">$recommendations</span>
+                        <span class="label">Recommendations</span>
+                    </div>
+                </div>
+    """)
+
+_DIGEST_ASSESSMENT = Template("""
+                <div class="assessment">
+                    <h3>📋 $test_name</h3>
+                    <div class="assessment-meta">
+                        <span>🕐 $taken_at</span>
+                        <span>❓ $questions_answered questions</span>
+                        <span>📊 $confidence% confidence</span>
+                    </div>
+                    <strong style="color: #1e293b; font-size: 14px;">Recommended Courses:</strong>
+        """)
+
+_DIGEST_COURSE = Template("""
+                    <div class="course">
+                        <h4>#$rank $name</h4>
+                        <p>$description</p>
+                        $reasoning
+                    </div>
+                """)
+
+_DIGEST_NO_COURSES = '<p class="no-courses">No course recommendations for this assessment.</p>'
+
+_DIGEST_FOOTER = Template("""
+            </div>
+            <div class="footer">
+                <p><strong>CoursePro</strong> - Your AI-Powered Course Recommendation System</p>
+                <p>Generated on $generated_at</p>
+                <p style="margin-top: 15px; color: #94a3b8;">Keep exploring and discovering your perfect career path! 🚀</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """)
+
+
+def digest_subject(day: datetime.date) -> str:
+    return f"📊 Your CoursePro Daily Digest - {day.strftime('%B %d, %Y')}"
+
+
+def render_digest(digest: UserDigest, day: datetime.date, generated_at: Optional[datetime.datetime] = None) -> str:
+    generated_at = generated_at or datetime.datetime.now()
+    parts = [_DIGEST_HEAD, _DIGEST_INTRO.substitute(
+        day=day.strftime('%B %d, %Y'),
+        fullname=digest.fullname,
+        assessments=len(digest.items),
+        questions=sum(item.questions_answered for item in digest.items),
+        recommendations=sum(len(item.courses) for item in digest.items)
+    )]
+    for item in digest.items:
+        parts.append(_DIGEST_ASSESSMENT.substitute(
+            test_name=item.test_name,
+            taken_at=item.taken_at,
+            questions_answered=item.questions_answered,
+            confidence=round(item.confidence_score)
+        ))
+        if item.courses:
+            for rank, course in enumerate(item.courses[:5], 1):  # Limit to top 5 courses
+                parts.append(_DIGEST_COURSE.substitute(
+                    rank=rank,
+                    name=course["name"],
+                    description=course["description"] or "",
+                    reasoning=f'<p class="reasoning">{course["reasoning"]}</p>' if course.get("reasoning") else ""
+                ))
+        else:
+            parts.append(_DIGEST_NO_COURSES)
+        parts.append("</div>")
+    parts.append(_DIGEST_FOOTER.substitute(generated_at=generated_at.strftime('%B %d, %Y at %I:%M %p')))
+    return "".join(parts)
+
+
+# ---------------- batch job ----------------
+
+def run_daily_digest(db, day: Optional[datetime.date] = None, dry_run: bool = False,
+                     output_dir: Optional[str] = None, email_queue=None) -> dict:
+    """
+    Render (and send, unless dry_run) the digest of every user with attempts on `day`
+    (today by default). Returns counts plus the queued job ids.
+    """
+    day = day or datetime.datetime.now().date()
+    started = time.perf_counter()
+    digests = load_digests(db, day)
+    generated_at = datetime.datetime.now()
+    subject = digest_subject(day)
+
+    if dry_run:
+        target_dir = os.path.join(output_dir or os.getenv("DAILY_DIGEST_DRY_RUN_DIR", "digest_preview"), day.isoformat())
+        os.makedirs(target_dir, exist_ok=True)
+
+    if email_queue is None and not dry_run:
+        from email_queue import email_queue
+
+    result = {"date": day.isoformat(), "dry_run": dry_run, "users": len(digests),
+              "rendered": 0, "queued": 0, "skipped_no_email": 0, "job_ids": []}
+    for digest in digests.values():
+        html_content = render_digest(digest, day, generated_at)
+        result["rendered"] += 1
+        if dry_run:
+            with open(os.path.join(target_dir, f"{digest.user_id}.html"), "w", encoding="utf-8") as f:
+                f.write(html_content)
+            continue
+        if not digest.email:
+            result["skipped_no_email"] += 1
+            continue
+        job = email_queue.submit(digest.email, subject, html_content, kind="daily_digest")
+        result["job_ids"].append(job.job_id)
+        result["queued"] += 1
+
+    if dry_run:
+        result["output_dir"] = target_dir
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"[DIGEST] {day}: {result['rendered']} digests rendered, {result['queued']} queued"
+          f"{' (dry run)' if dry_run else ''} in {result['seconds']}s")
+    return result
+
+
+def claim_run(db, day: datetime.date) -> bool:
+    """Record that `day`'s digest is being sent. False if another process already claimed it."""
+    db.add(models.DailyDigestRun(run_date=day))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def start_scheduler(session_factory: Callable, at: Optional[str] = None) -> Optional[threading.Thread]:
+    """Run the digest daily at `at` (HH:MM local time, default DAILY_DIGEST_TIME). No-op when unset."""
+    at = at or os.getenv("DAILY_DIGEST_TIME", "")
+    if not at:
+        return None
+    try:
+        hour, minute = (int(part) for part in at.split(":"))
+        run_time = datetime.time(hour, minute)
+    except ValueError:
+        print(f"[WARN] Ignoring invalid DAILY_DIGEST_TIME={at!r} (expected HH:MM)")
+        return None
+
+    def loop():
+        while True:
+            now = datetime.datetime.now()
+            next_run = datetime.datetime.combine(now.date(), run_time)
+            if next_run <= now:
+                next_run += datetime.timedelta(days=1)
+            time.sleep((next_run - now).total_seconds())
+            db = session_factory()
+            try:
+                if claim_run(db, next_run.date()):
+                    run_daily_digest(db, day=next_run.date())
+                else:
+                    print(f"[DIGEST] {next_run.date()} already sent by another worker")
+            except Exception as e:
+                print(f"[ERROR] Daily digest run failed: {e}")
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=loop, name="daily-digest-scheduler", daemon=True)
+    thread.start()
+    print(f"[DIGEST] Daily digest scheduled at {run_time.strftime('%H:%M')}")
+    return thread
+
+
+if __name__ == "__main__":
+    import argparse
+    import database
+    from email_queue import email_queue as shared_queue
+
+    parser = argparse.ArgumentParser(description="Send (or preview) the CoursePro daily digests")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=None, help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--dry-run", metavar="OUTPUT_DIR", default=None, help="Write HTML files instead of sending")
+    parser.add_argument("--force", action="store_true", help="Send even if this date's digest was already sent")
+    args = parser.parse_args()
+    day = args.date or datetime.datetime.now().date()
+    dry_run = args.dry_run is not None
+
+    db = database.SessionLocal()
+    try:
+        if not dry_run and not claim_run(db, day) and not args.force:
+            raise SystemExit(f"[DIGEST] {day} was already sent (daily_digest_runs); use --force to send again")
+        run_daily_digest(db, day=day, dry_run=dry_run, output_dir=args.dry_run)
+    finally:
+        db.close()
+    shared_queue.stop(timeout=600)  # Deliver everything, including retries, before the process exits
@@ -0,0 +1,418 @@
+# email_queue.py
+"""
+Outbound Email Queue
+
+send_email_html used to call Resend (or open an SMTP session) inside the
+request handler, holding a threadpool worker for up to 30 seconds per send;
+a slow provider could stall unrelated requests.
+
+Endpoints now submit() a job and return its id right away:
+- A small pool of worker threads delivers jobs through an EmailTransport,
+  optionally throttled to EMAIL_RATE_PER_SECOND (provider rate limits)
+- Transports keep connections open per worker (HTTP keep-alive for Resend,
+  one logged-in SMTP session per worker) so bulk sends such as the nightly
+  digest do not reconnect for every message
+- Transient failures (network errors, 429 / 5xx) are retried with
+  exponential backoff; permanent ones (unverified domain, other 4xx,
+  missing configuration) fail immediately
+- Job status (queued / sending / retrying / sent / failed) is kept in memory
+  for GET /email/jobs/{job_id}; stop() waits for queued jobs and scheduled
+  retries to finish (up to its timeout) before stopping the workers
+- Once Resend rejects a send because the domain is unverified, the queue
+  remembers it (domain_not_verified) until a send succeeds, so endpoints can
+  answer 503 right away instead of queueing jobs that are bound to fail
+
+Transports:
+- ResendTransport: Resend HTTP API (RESEND_API_KEY, RESEND_FROM)
+- SMTPTransport: SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASSWORD
+- FakeTransport: records messages in memory (EMAIL_TRANSPORT=fake, for tests)
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+class PermanentEmailError(Exception):
+    """Delivery failed in a way retrying will not fix."""
+    pass
+
+
+class EmailDomainNotVerifiedError(PermanentEmailError):
+    """Raised when Resend domain is not verified (free tier limitation)."""
+    pass
+
+
+# ---------------- transports ----------------
+
+class EmailTransport:
+    name = "base"
+
+    def is_configured(self) -> bool:
+        return True
+
+    def send(self, to_email: str, subject: str, html_content: str, from_name: str = "CoursePro"):
+        raise NotImplementedError
+
+
+class ResendTransport(EmailTransport):
+    """Resend HTTP API (works on Railway/cloud platforms)."""
+    name = "resend"
+
+    def __init__(self, api_key: str, sender: str, timeout: float = 30):
+        self.api_key = api_key
+        self.sender = sender
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _session(self):
+        # One keep-alive HTTP session per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests as _requests
+            session = self._local.session = _requests.Session()
+        return session
+
+    def send(self, to_email: str, subject: str, html_content: str, from_name: str = "CoursePro"):
+        import requests as _requests
+        try:
+            resp = self._session().post(
+                "https://api.resend.com/emails",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={"from": self.sender, "to": [to_email], "subject": subject, "html": html_content},
+                timeout=self.timeout
+            )
+        except _requests.exceptions.RequestException as e:
+            print(f"[EMAIL] Resend request error: {e}")
+            raise Exception(f"Resend API error: {str(e)}")
+
+        if resp.status_code in (200, 201):
+            print(f"[EMAIL] Resend success: {resp.json()}")
+            return
+        if resp.status_code == 403 and "verify a domain" in resp.text:
+            print(f"[EMAIL] Resend domain not verified (free tier). Cannot send to {to_email}")
+            raise EmailDomainNotVerifiedError(
+                "Email service is in testing mode. To enable sending emails to all users, "
+                "a verified domain must be configured. Please download your results as PDF instead."
+            )
+        print(f"[EMAIL] Resend HTTP error {resp.status_code}: {resp.text}")
+        error = f"Resend API error ({resp.status_code}): {resp.text}"
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise Exception(error)
+        raise PermanentEmailError(error)
+
+
+class SMTPTransport(EmailTransport):
+    """SMTP fallback (works locally, may be blocked on some cloud platforms)."""
+    name = "smtp"
+
+    def __init__(self, host: str, port: int, user: str, password: str, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def is_configured(self) -> bool:
+        return bool(self.user and self.password and self.user != "your-email@gmail.com")
+
+    def build_message(self, to_email: str, subject: str, html_content: str, from_name: str):
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = f"{from_name} <{self.user}>"
+        msg["To"] = to_email
+        msg.attach(MIMEText(html_content, "html"))
+        return msg
+
+    def _connection(self):
+        # One logged-in SMTP session per worker thread, reused across messages
+        server = getattr(self._local, "server", None)
+        if server is None:
+            import smtplib
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.starttls()
+            server.login(self.user, self.password)
+            self._local.server = server
+        return server
+
+    def _drop_connection(self):
+        server = getattr(self._local, "server", None)
+        self._local.server = None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+    def send(self, to_email: str, subject: str, html_content: str, from_name: str = "CoursePro"):
+        import smtplib
+        if not self.is_configured():
+            raise PermanentEmailError("No email service configured. Set RESEND_API_KEY or SMTP_USER/SMTP_PASSWORD.")
+        msg = self.build_message(to_email, subject, html_content, from_name)
+        reused = getattr(self._local, "server", None) is not None
+        try:
+            self._connection().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._drop_connection()
+            if not reused:
+                raise
+            self._connection().send_message(msg)  # Pooled session had gone stale: reconnect once
+        print(f"[EMAIL] SMTP success: sent to {to_email}")
+
+
+class FakeTransport(EmailTransport):
+    """In-memory transport for tests; fail_times makes the first N sends raise."""
+    name = "fake"
+
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.sent: List[dict] = []
+        self._lock = threading.Lock()
+
+    def send(self, to_email: str, subject: str, html_content: str, from_name: str = "CoursePro"):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise Exception("Fake transport failure")
+            self.sent.append({"to": to_email, "subject": subject, "html": html_content, "from_name": from_name})
+
+
+def create_transport_from_env() -> EmailTransport:
+    """Resend when RESEND_API_KEY is set, else SMTP (EMAIL_TRANSPORT=fake forces the fake one)."""
+    if os.getenv("EMAIL_TRANSPORT", "").lower() == "fake":
+        return FakeTransport()
+    resend_api_key = os.getenv("RESEND_API_KEY", "")
+    if resend_api_key:
+        return ResendTransport(resend_api_key, os.getenv("RESEND_FROM", "CoursePro <onboarding@resend.dev>"))
+    return SMTPTransport(
+        os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        int(os.getenv("SMTP_PORT", "587")),
+        os.getenv("SMTP_USER", ""),
+        os.getenv("SMTP_PASSWORD", "")
+    )
+
+
+# ---------------- queue ----------------
+
+class RateLimiter:
+    """Spaces calls at least 1/per_second apart across all worker threads."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+@dataclass
+class EmailJob:
+    to_email: str
+    subject: str
+    html_content: str
+    from_name: str = "CoursePro"
+    kind: str = "email"  # e.g. "recommendations", "daily_digest"
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    sent_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "email": self.to_email,
+            "subject": self.subject,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "sent_at": self.sent_at
+        }
+
+
+class EmailQueue:
+    """Worker pool that delivers EmailJobs with retry and backoff."""
+
+    def __init__(self, transport: Optional[EmailTransport] = None, workers: int = 4, max_attempts: int = 4,
+                 base_delay_seconds: float = 2.0, max_tracked_jobs: int = 10000,
+                 rate_per_second: Optional[float] = None):
+        self._transport = transport
+        self.rate_limiter = RateLimiter(rate_per_second) if rate_per_second else None
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.max_tracked_jobs = max_tracked_jobs
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._jobs: "OrderedDict[str, EmailJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)  # Notified when no job is queued, sending or retrying
+        self._pending = 0
+        self._threads: List[threading.Thread] = []
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retried": 0}
+        self.domain_not_verified: Optional[str] = None  # Last EmailDomainNotVerifiedError message
+
+    @property
+    def transport(self) -> EmailTransport:
+        # Resolved on first use so .env changes before startup are honored
+        if self._transport is None:
+            self._transport = create_transport_from_env()
+        return self._transport
+
+    # ---------------- lifecycle ----------------
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"email-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        """Wait (up to `timeout`) for queued jobs and scheduled retries to finish, then stop the workers."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending and self._threads:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._idle.wait(remaining)
+            pending = self._pending
+        threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if pending:
+            print(f"[WARN] Email queue stopped with {pending} job(s) still queued or retrying")
+        if threads:
+            print(f"[EMAIL] Email queue stopped ({self.stats['sent']} sent, {self.stats['failed']} failed)")
+
+    # ---------------- jobs ----------------
+
+    def submit(self, to_email: str, subject: str, html_content: str, from_name: str = "CoursePro",
+               kind: str = "email") -> EmailJob:
+        job = EmailJob(to_email, subject, html_content, from_name=from_name, kind=kind)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim()
+            self._pending += 1
+            self.stats["queued"] += 1
+        self.start()
+        self._queue.put(job.job_id)
+        print(f"[EMAIL] Queued {kind} job {job.job_id} for {to_email}")
+        return job
+
+    def get(self, job_id: str) -> Optional[EmailJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim(self):
+        # Forget the oldest finished jobs once we track too many
+        excess = len(self._jobs) - self.max_tracked_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job.status in ("sent", "failed")][:excess]:
+            del self._jobs[job_id]
+
+    # ---------------- worker ----------------
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is not None:
+                self._deliver(job)
+
+    def _deliver(self, job: EmailJob):
+        job.status = "sending"
+        job.attempts += 1
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        try:
+            self.transport.send(job.to_email, job.subject, job.html_content, job.from_name)
+        except PermanentEmailError as e:
+            if isinstance(e, EmailDomainNotVerifiedError):
+                self.domain_not_verified = str(e)
+            self._fail(job, e)
+            return
+        except Exception as e:
+            if job.attempts >= self.max_attempts:
+                self._fail(job, e)
+                return
+            delay = self.base_delay_seconds * (2 ** (job.attempts - 1))
+            job.status = "retrying"
+            job.error = str(e)
+            self.stats["retried"] += 1
+            print(f"[EMAIL] Job {job.job_id} attempt {job.attempts} failed ({e}), retrying in {delay:.0f}s")
+            timer = threading.Timer(delay, self._queue.put, args=(job.job_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        job.status = "sent"
+        job.error = None
+        job.sent_at = time.time()
+        self.domain_not_verified = None
+        self.stats["sent"] += 1
+        self._finished()
+
+    def _fail(self, job: EmailJob, error: Exception):
+        job.status = "failed"
+        job.error = str(error)
+        self.stats["failed"] += 1
+        self._finished()
+        print(f"[EMAIL] Job {job.job_id} to {job.to_email} failed after {job.attempts} attempt(s): {error}")
+
+    def _finished(self):
+        with self._idle:
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            **self.stats,
+            "transport": self.transport.name,
+            "workers": self.workers,
+            "backlog": self._queue.qsize(),
+            "domain_not_verified": self.domain_not_verified is not None,
+            "jobs_by_status": by_status
+        }
+
+
+# Shared instance (EMAIL_WORKERS / EMAIL_MAX_ATTEMPTS / EMAIL_RATE_PER_SECOND tune the pool, retries and throttle)
+email_queue = EmailQueue(
+    workers=int(os.getenv("EMAIL_WORKERS", "4")),
+    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "4")),
+    rate_per_second=float(os.getenv("EMAIL_RATE_PER_SECOND", "0")) or None
+)
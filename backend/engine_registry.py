@@ -0,0 +1,262 @@
+# engine_registry.py
+"""
+Versioned Adaptive Engine Snapshots
+
+The adaptive engine is built from the course and question tables. It used to
+be built once per process, so admin edits only showed up after a restart
+(which also dropped every live session).
+
+AdaptiveEngineRegistry keeps immutable engine snapshots keyed by catalog
+version:
+- Admin mutations call invalidate(), which bumps the version and rebuilds the
+  engine on a background thread (off the request path)
+- New sessions are created on the newest built snapshot
+- Existing sessions carry the catalog_version they started with and keep
+  being served by that snapshot until they finish
+- Old snapshots are dropped once no unfinished session references them
+- A failed rebuild is retried with backoff; if it keeps failing, the version
+  falls back to the one being served and metrics() shows last_rebuild_error
+
+All snapshots share one SessionStore, so session lookups do not depend on
+which engine created the session. The catalog version itself lives in that
+store too (bump_catalog_version), so with several workers an admin edit in
+one of them is picked up by the others: current() re-reads the shared
+version at most every version_check_seconds and rebuilds when it moved.
+
+Startup: warm_up() builds the first engine during FastAPI lifespan so the
+first student does not pay for it. With snapshot_path set, the catalog data
+is written to a JSON file after every DB build and read back on the next
+start, skipping the course/question queries. Delete the file (or leave the
+setting unset) if the tables are edited by something other than this app.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from adaptive_assessment import AdaptiveAssessmentEngine
+
+
+# loader(db) -> (courses_data, questions_data) in the shape AdaptiveAssessmentEngine expects
+CatalogLoader = Callable[[object], Tuple[List[dict], List[dict]]]
+
+
+class AdaptiveEngineRegistry:
+    """Current engine plus the older snapshots that live sessions still use."""
+
+    REBUILD_ATTEMPTS = 4
+    REBUILD_RETRY_SECONDS = 2.0  # Doubled after every failed attempt (capped at a minute)
+
+    def __init__(self, loader: CatalogLoader, session_factory: Callable, session_store=None,
+                 snapshot_path: Optional[str] = None, version_check_seconds: float = 5.0,
+                 on_shared_change: Optional[Callable[[], None]] = None):
+        self.loader = loader
+        self.on_shared_change = on_shared_change  # Drop this process's other catalog caches
+        self.session_factory = session_factory
+        self.session_store = session_store
+        self.snapshot_path = snapshot_path
+        self.version_check_seconds = version_check_seconds
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_source: Optional[str] = None
+        self.last_rebuild_error: Optional[str] = None
+        self._shared_version = session_store is not None  # Otherwise the version is process-local
+        self.version = session_store.catalog_version() if self._shared_version else 0
+        self._version_checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._engines: Dict[int, AdaptiveAssessmentEngine] = {}
+        self._current: Optional[AdaptiveAssessmentEngine] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+    def _build(self, db, version: int, catalog: Tuple[List[dict], List[dict]] = None) -> AdaptiveAssessmentEngine:
+        if catalog is None:
+            catalog = self.loader(db)
+            self._write_snapshot(catalog)
+        courses_data, questions_data = catalog
+        engine = AdaptiveAssessmentEngine(
+            courses_data, questions_data,
+            session_store=self.session_store, catalog_version=version
+        )
+        if self.session_store is None:
+            self.session_store = engine.sessions  # Later snapshots share the first engine's store
+        return engine
+
+    def _publish(self, engine: AdaptiveAssessmentEngine):
+        with self._lock:
+            self._engines[engine.catalog_version] = engine
+            if self._current is None or engine.catalog_version >= self._current.catalog_version:
+                self._current = engine
+        print(f"[ENGINE] Published adaptive engine snapshot v{engine.catalog_version}")
+
+    def _write_snapshot(self, catalog: Tuple[List[dict], List[dict]]):
+        if not self.snapshot_path:
+            return
+        try:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"courses": catalog[0], "questions": catalog[1]}, f, default=float)
+            os.replace(tmp_path, self.snapshot_path)
+        except (OSError, TypeError) as e:
+            print(f"[WARN] Could not write adaptive engine snapshot {self.snapshot_path}: {e}")
+
+    def _read_snapshot(self) -> Optional[Tuple[List[dict], List[dict]]]:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data["courses"], data["questions"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] Ignoring unreadable adaptive engine snapshot {self.snapshot_path}: {e}")
+            return None
+
+    def warm_up(self, db) -> AdaptiveAssessmentEngine:
+        """Build the first engine now (from the snapshot file if there is one, else the DB)."""
+        started = time.perf_counter()
+        with self._build_lock:
+            if self._current is None:
+                catalog = self._read_snapshot()
+                self.warmup_source = "snapshot" if catalog else "database"
+                self._publish(self._build(db, self.version, catalog))
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        print(f"[ENGINE] Adaptive engine warm ({self.warmup_source}, {self.warmup_seconds}s)")
+        return self._current
+
+    def current(self, db) -> AdaptiveAssessmentEngine:
+        """Engine for new sessions (built synchronously only the very first time)."""
+        engine = self._current
+        if engine is not None:
+            self._check_shared_version()
+            return engine
+        with self._build_lock:
+            if self._current is None:
+                self._publish(self._build(db, self.version))
+        return self._current
+
+    def for_session(self, db, session_id: str) -> AdaptiveAssessmentEngine:
+        """Engine snapshot the session was started on (current engine if unknown)."""
+        current = self.current(db)
+        session = current.sessions.get(session_id)
+        if session is None:
+            return current
+        engine = self._engines.get(session.catalog_version)
+        if engine is None:
+            # Started on a snapshot this process does not have (built by another worker,
+            # or from before a restart): scores may shift under the new catalog
+            print(f"[ERROR] Session {session_id} uses catalog v{session.catalog_version}, not built in this "
+                  f"process (live: {sorted(self._engines)}); serving it from v{current.catalog_version}")
+            return current
+        return engine
+
+    @contextmanager
+    def session_scope(self, db, session_id: str):
+        """
+        for_session() with the session locked for the duration of a request, so
+        concurrent requests for one session run one after the other. The store
+        reuses the session it loaded here for the engine's own lookups.
+        """
+        store = self.current(db).sessions
+        with store.lock(session_id):
+            yield self.for_session(db, session_id)
+
+    def _check_shared_version(self):
+        """Start a rebuild when another process bumped the shared catalog version."""
+        if not self._shared_version:
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_seconds:
+            return
+        self._version_checked_at = now
+        try:
+            shared = self.session_store.catalog_version()
+        except Exception as e:
+            print(f"[WARN] Could not read the shared adaptive catalog version: {e}")
+            return
+        if shared > self.version:
+            if self.on_shared_change is not None:
+                self.on_shared_change()
+            self._start_rebuild(shared)
+
+    def invalidate(self):
+        """Catalog changed: bump the (shared) version and rebuild in the background."""
+        self._start_rebuild(self.session_store.bump_catalog_version() if self._shared_version else None)
+
+    def _start_rebuild(self, version: Optional[int] = None):
+        """Move to `version` (default: the next local one) and rebuild unless already there."""
+        with self._lock:
+            if version is None:
+                version = self.version + 1
+            elif version <= self.version:
+                return  # Already built (or being built) at this version
+            self.version = version
+            if self._current is None:
+                return  # Nothing built yet; the first request builds the latest catalog
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return  # The running rebuild picks up the newest version before it exits
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild_loop, name="adaptive-engine-rebuild", daemon=True
+            )
+            self._rebuild_thread.start()
+        print(f"[ENGINE] Catalog version bumped to v{version}, rebuilding engine in background")
+
+    def _rebuild_loop(self):
+        failures = 0
+        while True:
+            target = self.version
+            db = self.session_factory()
+            try:
+                with self._build_lock:
+                    self._publish(self._build(db, target))
+            except Exception as e:
+                failures += 1
+                self.last_rebuild_error = f"v{target}: {e}"
+                print(f"[ERROR] Adaptive engine rebuild v{target} failed (attempt {failures}): {e}")
+                import traceback
+                traceback.print_exc()
+                if failures < self.REBUILD_ATTEMPTS:
+                    time.sleep(min(self.REBUILD_RETRY_SECONDS * 2 ** (failures - 1), 60))
+                    continue
+                with self._lock:
+                    if self.version != target:
+                        failures = 0  # A newer edit arrived meanwhile: build that instead
+                        continue
+                    # Report the version actually being served; a later invalidate()
+                    # (or the shared-version check) tries again
+                    self.version = self._current.catalog_version
+                    self._rebuild_thread = None
+                print(f"[ERROR] Giving up on adaptive engine v{target}; still serving v{self.version}")
+                return
+            finally:
+                db.close()
+            failures = 0
+            self.last_rebuild_error = None
+            self._prune()
+            with self._lock:
+                if self.version == target:
+                    self._rebuild_thread = None
+                    return
+
+    def _prune(self):
+        """Drop snapshots that no unfinished session uses anymore."""
+        in_use = self.session_store.live_catalog_versions()
+        with self._lock:
+            for version in list(self._engines):
+                if version != self._current.catalog_version and version not in in_use:
+                    del self._engines[version]
+                    print(f"[ENGINE] Retired adaptive engine snapshot v{version}")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._current is not None,
+                "warmup_source": self.warmup_source,
+                "warmup_seconds": self.warmup_seconds,
+                "catalog_version": self.version,
+                "current_engine_version": self._current.catalog_version if self._current else None,
+                "live_engine_versions": sorted(self._engines),
+                "rebuilding": self._rebuild_thread is not None and self._rebuild_thread.is_alive(),
+                "last_rebuild_error": self.last_rebuild_error
+            }
@@ -2,8 +2,9 @@ import os
 import datetime
 import re
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -79,8 +80,20 @@ from sqlalchemy import func, text
 from sqlalchemy.orm import Session, joinedload
 from trait_mapping import apply_trait_mapping
 from assessment_service import AssessmentService
-from recommendation_engine import HybridRecommendationEngine
+from recommendation_engine import HybridRecommendationEngine, create_result_cache_from_env
 from adaptive_assessment import AdaptiveAssessmentEngine, initialize_adaptive_engine, get_adaptive_engine
+from session_store import SessionLockTimeout, create_session_store_from_env
+from adaptive_persistence import AdaptiveResultWriter, CompletedAssessment
+from catalog_cache import course_catalog
+from engine_registry import AdaptiveEngineRegistry
+from report_cache import report_cache
+from catalog_import import import_catalog
+from email_queue import email_queue
+from pdf_reports import pdf_service, report_entries, report_filename, stream_zip, unique_names
+from cohort_export import load_cohort_reports, manifest_csv
+from daily_digest import claim_run as claim_digest_run, digest_subject, load_digests, render_digest, run_daily_digest, start_scheduler as start_digest_scheduler
+from admin_exports import EXPORT_FORMATS, MAX_PAGE_SIZE, decode_cursor, fetch_page, iter_rows, stream_export
+import trait_rollups
 import json
 
 load_dotenv()
@@ -132,12 +145,33 @@ async def lifespan(app: FastAPI):
         
         print("[START] Schema migration complete")
         seed_database()
+        
+        db = database.SessionLocal()
+        try:
+            try:
+                course_catalog.warm(db)
+                adaptive_engines.warm_up(db)
+            except Exception as e:
+                # Not fatal: the engine is built on the first adaptive request instead
+                db.rollback()
+                print(f"[WARN] Adaptive engine warm-up failed: {e}")
+            start_digest_scheduler(database.SessionLocal)
+            try:
+                trait_rollups.backfill_if_empty(db)
+            except Exception as e:
+                db.rollback()
+                print(f"[WARN] Trait rollup backfill failed: {e}")
+        finally:
+            db.close()
     except Exception as e:
         print(f"[ERROR] Error during startup: {e}")
         import traceback
         traceback.print_exc()
         raise
     yield
+    adaptive_result_writer.stop()
+    email_queue.stop()
+    pdf_service.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
@@ -179,61 +213,11 @@ def seed_database():
         db.flush()
         print(f"[SEED] Created default test with ID: {default_test.test_id}")
 
-        if COURSES_POOL:
-            print(f"[SEED] Seeding {len(COURSES_POOL)} courses...")
-            for c in COURSES_POOL:
-                tags = c.get("trait_tag", [])
-                tag_str = ", ".join(tags) if isinstance(tags, list) else str(tags)
-                db.add(models.Course(
-                    course_name=c.get("course_name"), 
-                    description=c.get("description"), 
-                    minimum_gwa=c.get("minimum_gwa"), 
-                    required_strand=c.get("recommended_strand"),  # Map from recommended_strand to required_strand
-                    trait_tag=tag_str
-                ))
-
-        if QUESTIONS_POOL:
-            print(f"[SEED] Seeding {len(QUESTIONS_POOL)} questions...")
-            for q in QUESTIONS_POOL:
-                question_type = q.get("question_type", "standard")
-                # Support both old format ("question") and new format ("question_text")
-                question_text = q.get("question_text") or q.get("question")
-                new_q = models.Question(
-                    test_id=default_test.test_id,
-                    question_text=question_text, 
-                    category=q.get("category"),
-                    question_type=question_type
-                )
-                db.add(new_q)
-                db.flush()
-                options_list = q.get("options", [])
-                if options_list:
-                    for opt in options_list:
-                        # Handle different question types
-                        trait_tags_json = None
-                        recommended_courses_json = None
-                        weight = opt.get("weight", 1)
-                        
-                        # For career_path, extracurricular, and situational_mapped questions
-                        if question_type in ["career_path", "extracurricular", "situational_mapped"]:
-                            trait_tags_json = json.dumps(opt.get("trait_tags", []))
-                            recommended_courses_json = json.dumps(opt.get("recommended_courses", []))
-                        
-                        # Support both old format ("text"/"tag") and new format ("option_text"/"trait_tag")
-                        option_text = opt.get("option_text") or opt.get("text")
-                        trait_tag = opt.get("trait_tag") or opt.get("tag")
-                        
-                        db.add(models.Option(
-                            question_id=new_q.question_id, 
-                            option_text=option_text, 
-                            trait_tag=trait_tag,
-                            weight=weight,
-                            trait_tags_json=trait_tags_json,
-                            recommended_courses_json=recommended_courses_json
-                        ))
-                else:
-                    db.add(models.Option(question_id=new_q.question_id, option_text="Yes", trait_tag=q.get("tag")))
-                    db.add(models.Option(question_id=new_q.question_id, option_text="No", trait_tag="None"))
+        # Courses, questions and options in a handful of bulk statements
+        print(f"[SEED] Seeding {len(COURSES_POOL)} courses and {len(QUESTIONS_POOL)} questions...")
+        stats = import_catalog(db, COURSES_POOL, QUESTIONS_POOL, test_id=default_test.test_id, commit=False)
+        print(f"[SEED] Inserted {stats['courses']['inserted']} courses, {stats['questions']['inserted']} questions, "
+              f"{stats['options']['inserted']} options")
         db.commit()
         print("[OK] DATABASE SUCCESSFULLY INITIALIZED AND SEEDED!")
         print("[DATA] All data is now permanent!")
@@ -316,6 +300,10 @@ class OptionUpdate(BaseModel):
     option_text: Optional[str] = None
     trait_tag: Optional[str] = None
 
+class CatalogImport(BaseModel):
+    courses: List[dict] = []  # COURSES_POOL format
+    questions: List[dict] = []  # QUESTIONS_POOL format (with nested options)
+
 
 # ========== FEEDBACK SYSTEM SCHEMAS ==========
 class FeedbackSubmit(BaseModel):
@@ -379,6 +367,7 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     )
     db.add(new_user)
     db.commit()
+    report_cache.record_user()
     return {"message": "Success"}
 
 @app.post("/login")
@@ -479,6 +468,7 @@ def google_register(user: dict, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    report_cache.record_user()
     return {"user": new_user.fullname, "user_id": new_user.user_id}
 
 @app.post("/user/{user_id}/update-activity")
@@ -666,7 +656,8 @@ def change_email(user_id: int, request: EmailChangeRequest, db: Session = Depend
     }
 
 # Initialize the Hybrid Recommendation Engine (Rule-Based + Decision Tree)
-recommendation_engine = HybridRecommendationEngine()
+# Results for identical profiles are cached (RECOMMENDATION_CACHE_ENTRIES / RECOMMENDATION_CACHE_TTL)
+recommendation_engine = HybridRecommendationEngine(result_cache=create_result_cache_from_env())
 
 # OLD RECOMMENDATION ENDPOINT DEPRECATED - Use adaptive assessment instead
 @app.post("/recommend_deprecated")
@@ -742,6 +733,7 @@ def recommend_deprecated(data: AssessmentSubmit, db: Session = Depends(get_db)):
     # Extract traits from user's answers
     trait_scores = {}
     career_path_courses = []  # Direct course preferences from career path questions
+    chosen_traits = []  # For the trait rollups / report cache
     
     for ans in data.answers:
         option = db.query(models.Option).filter(
@@ -759,6 +751,7 @@ def recommend_deprecated(data: AssessmentSubmit, db: Session = Depends(get_db)):
                 question_id=ans.questionId,
                 chosen_option_id=ans.chosenOptionId
             ))
+            chosen_traits.append(option.trait_tag)
             
             question_type = question.question_type if question else "standard"
             
@@ -826,7 +819,7 @@ def recommend_deprecated(data: AssessmentSubmit, db: Session = Depends(get_db)):
     print(f"🌈 Top 7 Traits: {[t[0] for t in top_traits]}")
     
     # ==================== STEP 4: FETCH ALL COURSES ====================
-    all_courses = db.query(models.Course).all()
+    all_courses = course_catalog.all(db)
     print(f"📚 Total courses in database: {len(all_courses)}")
     
     # ==================== STEP 5: RUN HYBRID RECOMMENDATION ENGINE ====================
@@ -857,6 +850,9 @@ def recommend_deprecated(data: AssessmentSubmit, db: Session = Depends(get_db)):
     # CRITICAL: Commit test attempt and student answers FIRST, separately
     # This ensures they're saved even if recommendation saving fails
     try:
+        chosen_traits = trait_rollups.record_answers(
+            db, chosen_traits, user_strand, default_test.test_type, test_attempt.attempt_id
+        )
         db.commit()
         attempt_id = test_attempt.attempt_id
         print(f"[OK] Saved test attempt {attempt_id} and {len(data.answers)} student answers to database")
@@ -897,11 +893,10 @@ def recommend_deprecated(data: AssessmentSubmit, db: Session = Depends(get_db)):
     # Now save recommendations (separately)
     try:
         saved_count = 0
+        saved_course_ids = []
         for rec in recommendations:
             print(f"[DEBUG] Looking for course: '{rec['course_name']}'")
-            course = db.query(models.Course).filter(
-                models.Course.course_name == rec["course_name"]
-            ).first()
+            course = course_catalog.find_by_name(db, rec["course_name"])
             
             if course:
                 print(f"   [OK] Found course ID: {course.course_id}")
@@ -913,10 +908,12 @@ def recommend_deprecated(data: AssessmentSubmit, db: Session = Depends(get_db)):
                     score=rec.get("confidence_score", None)  # Store the compatibility score
                 ))
                 saved_count += 1
+                saved_course_ids.append(course.course_id)
             else:
                 print(f"   ✗ Course NOT FOUND in database!")
         
         db.commit()
+        report_cache.record_attempts(1, saved_course_ids, chosen_traits)
         print(f"[OK] Saved {saved_count}/{len(recommendations)} recommendations to database")
     except Exception as e:
         print(f"[ERROR] Error saving recommendations: {e}")
@@ -1178,22 +1175,33 @@ def get_assessment_questions_deprecated(tier: str, strand: str = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.exception_handler(SessionLockTimeout)
+def session_busy(request, exc: SessionLockTimeout):
+    """Another request held the adaptive session for longer than the lock timeout"""
+    return JSONResponse(status_code=409, content={"detail": "This assessment is busy with another request. Please retry."})
+
 @app.get("/")
 def home(): return {"status": "online"}
 
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once the adaptive engine is built, 503 while it is not"""
+    status = adaptive_engines.metrics()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **status})
+    return {"status": "ready", **status}
+
 # ========== PUBLIC STATS ==========
 
 @app.get("/public/stats")
 def get_public_stats(db: Session = Depends(get_db)):
     """Get public system statistics - real data only"""
-    total_courses = db.query(models.Course).count()
-    total_questions = db.query(models.Question).count()
-    total_assessments = db.query(models.TestAttempt).count()
+    counts = report_cache.counts(db)
     
     return {
-        "total_courses": total_courses,
-        "total_questions": total_questions,
-        "total_assessments": total_assessments
+        "total_courses": counts["courses"],
+        "total_questions": counts["questions"],
+        "total_assessments": counts["test_attempts"]
     }
 
 # ========== ADMIN: COURSE MANAGEMENT ==========
@@ -1225,6 +1233,7 @@ def create_course(course: CourseCreate, db: Session = Depends(get_db)):
     db.add(new_course)
     db.commit()
     db.refresh(new_course)
+    invalidate_adaptive_catalog(courses_changed=True)
     return {"message": "Course created successfully", "course": new_course}
 
 @app.put("/admin/courses/{course_id}")
@@ -1247,6 +1256,7 @@ def update_course(course_id: int, course: CourseUpdate, db: Session = Depends(ge
     
     db.commit()
     db.refresh(db_course)
+    invalidate_adaptive_catalog(courses_changed=True)
     return {"message": "Course updated successfully", "course": db_course}
 
 @app.delete("/admin/courses/{course_id}")
@@ -1258,6 +1268,7 @@ def delete_course(course_id: int, db: Session = Depends(get_db)):
     
     db.delete(course)
     db.commit()
+    invalidate_adaptive_catalog(courses_changed=True)
     return {"message": f"Course '{course.course_name}' deleted successfully"}
 
 # ========== ADMIN: QUESTION MANAGEMENT ==========
@@ -1298,6 +1309,7 @@ def create_question(question: QuestionCreate, db: Session = Depends(get_db)):
     
     db.commit()
     db.refresh(new_question)
+    invalidate_adaptive_catalog()
     return {"message": "Question created successfully", "question_id": new_question.question_id}
 
 @app.put("/admin/questions/{question_id}")
@@ -1313,6 +1325,7 @@ def update_question(question_id: int, question: QuestionUpdate, db: Session = De
         db_question.category = question.category
     
     db.commit()
+    invalidate_adaptive_catalog()
     return {"message": "Question updated successfully"}
 
 @app.delete("/admin/questions/{question_id}")
@@ -1324,6 +1337,7 @@ def delete_question(question_id: int, db: Session = Depends(get_db)):
     
     db.delete(question)
     db.commit()
+    invalidate_adaptive_catalog()
     return {"message": "Question deleted successfully"}
 
 # ========== ADMIN: OPTION MANAGEMENT ==========
@@ -1343,6 +1357,7 @@ def add_option(question_id: int, option: OptionCreate, db: Session = Depends(get
     db.add(new_option)
     db.commit()
     db.refresh(new_option)
+    invalidate_adaptive_catalog()
     return {"message": "Option added successfully", "option": new_option}
 
 @app.put("/admin/options/{option_id}")
@@ -1358,6 +1373,7 @@ def update_option(option_id: int, option: OptionUpdate, db: Session = Depends(ge
         db_option.trait_tag = option.trait_tag
     
     db.commit()
+    invalidate_adaptive_catalog()
     return {"message": "Option updated successfully"}
 
 @app.delete("/admin/options/{option_id}")
@@ -1369,42 +1385,104 @@ def delete_option(option_id: int, db: Session = Depends(get_db)):
     
     db.delete(option)
     db.commit()
+    invalidate_adaptive_catalog()
     return {"message": "Option deleted successfully"}
 
+@app.post("/admin/catalog/import")
+def import_catalog_data(data: CatalogImport, db: Session = Depends(get_db)):
+    """Admin: Bulk upsert courses and questions/options (matched by name/text, nothing is deleted)"""
+    try:
+        stats = import_catalog(db, data.courses, data.questions)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Catalog import failed: {str(e)}")
+    invalidate_adaptive_catalog(courses_changed=bool(data.courses))
+    return {"message": "Catalog imported", "stats": stats}
+
 # ========== ADMIN: USER MANAGEMENT ==========
 
 @app.get("/admin/users")
-def get_all_users(db: Session = Depends(get_db)):
-    """Admin: Get all users with their info and online status"""
+def get_all_users(
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "user_id",
+    order: str = "asc",
+    status: Optional[str] = None,
+    is_active: Optional[int] = None,
+    fields: str = "full",
+    db: Session = Depends(get_db)
+):
+    """Admin: Get all users with their info and online status
+    
+    Test counts come from one grouped query. Optional: limit/offset paging,
+    sort (created_at, last_active, name, email, tests_taken) with order asc/desc,
+    status=online|offline, is_active=0|1, and fields=summary to skip academic_info.
+    """
+    from sqlalchemy.orm import load_only
+    
     try:
-        users = db.query(models.User).all()
-        user_list = []
+        attempt_counts = db.query(
+            models.TestAttempt.user_id,
+            func.count(models.TestAttempt.attempt_id).label("tests_taken")
+        ).group_by(models.TestAttempt.user_id).subquery()
+        tests_taken_col = func.coalesce(attempt_counts.c.tests_taken, 0)
+        
+        query = db.query(models.User, tests_taken_col).outerjoin(
+            attempt_counts, attempt_counts.c.user_id == models.User.user_id
+        )
         
-        for user in users:
-            # Count test attempts for this user
-            tests_taken = db.query(models.TestAttempt).filter(
-                models.TestAttempt.user_id == user.user_id
-            ).count()
-            
+        if status:
+            query = query.filter(models.User.is_online == (1 if status.lower() == "online" else 0))
+        if is_active is not None:
+            query = query.filter(models.User.is_active == is_active)
+        
+        if fields == "summary":
+            query = query.options(load_only(
+                models.User.user_id, models.User.username, models.User.first_name, models.User.last_name,
+                models.User.email, models.User.created_at, models.User.last_active,
+                models.User.is_online, models.User.is_active
+            ))
+        
+        total = query.count() if limit else None
+        
+        sort_columns = {
+            "created_at": models.User.created_at,
+            "last_active": models.User.last_active,
+            "name": models.User.first_name,
+            "email": models.User.email,
+            "tests_taken": tests_taken_col,
+        }
+        sort_column = sort_columns.get(sort, models.User.user_id)
+        sort_column = sort_column.desc() if order.lower() == "desc" else sort_column.asc()
+        query = query.order_by(sort_column, models.User.user_id)
+        if limit:
+            query = query.offset(offset).limit(limit)
+        
+        user_list = []
+        for user, tests_taken in query.all():
             # Determine status based on is_online flag
-            status = "Online" if user.is_online == 1 else "Offline"
+            status_label = "Online" if user.is_online == 1 else "Offline"
             
-            user_list.append({
+            entry = {
                 "user_id": user.user_id,
                 "fullname": user.fullname,
                 "email": user.email,
-                "academic_info": user.academic_info,
                 "created_at": str(user.created_at) if user.created_at else None,
                 "tests_taken": tests_taken,
                 "is_online": user.is_online,
-                "status": status,
+                "status": status_label,
                 "last_active": str(user.last_active) if user.last_active else None,
-                "is_active": user.is_active if hasattr(user, 'is_active') else 1
-            })
+                "is_active": user.is_active
+            }
+            if fields != "summary":
+                entry["academic_info"] = user.academic_info
+            user_list.append(entry)
         
     except Exception as e:
         return {"error": str(e)}
     
+    if limit:
+        return {"users": user_list, "total": total, "limit": limit, "offset": offset}
     return {"users": user_list}
 
 @app.get("/admin/users/{user_id}")
@@ -1473,6 +1551,8 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     # Delete related data (cascade will handle most)
     db.query(models.Recommendation).filter(models.Recommendation.user_id == user_id).delete()
     
+    trait_rollups.remove_user_answers(db, user_id)
+    
     # Get all test attempts for user
     attempts = db.query(models.TestAttempt).filter(models.TestAttempt.user_id == user_id).all()
     for attempt in attempts:
@@ -1481,6 +1561,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     
     db.delete(user)
     db.commit()
+    report_cache.invalidate()
     return {"message": f"User '{user.fullname}' and all related data deleted successfully"}
 
 # ========== ADMIN: REPORTS & ANALYTICS ==========
@@ -1488,80 +1569,59 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 @app.get("/admin/reports/overview")
 def get_system_overview(db: Session = Depends(get_db)):
     """Admin: Get system-wide statistics"""
-    total_users = db.query(models.User).count()
-    total_courses = db.query(models.Course).count()
-    total_questions = db.query(models.Question).count()
-    total_test_attempts = db.query(models.TestAttempt).count()
-    total_recommendations = db.query(models.Recommendation).count()
-    total_tests = db.query(models.Test).count()
+    counts = report_cache.counts(db)
     
     return {
-        "total_users": total_users,
-        "total_courses": total_courses,
-        "total_questions": total_questions,
-        "total_tests": total_tests,
-        "total_test_attempts": total_test_attempts,
-        "total_recommendations_generated": total_recommendations
+        "total_users": counts["users"],
+        "total_courses": counts["courses"],
+        "total_questions": counts["questions"],
+        "total_tests": counts["tests"],
+        "total_test_attempts": counts["test_attempts"],
+        "total_recommendations_generated": counts["recommendations"]
     }
 
 @app.get("/admin/reports/popular-courses")
 def get_popular_courses(db: Session = Depends(get_db)):
     """Admin: Get most recommended courses"""
-    from sqlalchemy import func as sql_func
-    
-    popular_courses = db.query(
-        models.Course.course_name,
-        models.Course.course_id,
-        sql_func.count(models.Recommendation.recommendation_id).label('recommendation_count')
-    ).join(
-        models.Recommendation,
-        models.Course.course_id == models.Recommendation.course_id
-    ).group_by(
-        models.Course.course_id,
-        models.Course.course_name
-    ).order_by(
-        sql_func.count(models.Recommendation.recommendation_id).desc()
-    ).limit(10).all()
-    
-    return {
-        "popular_courses": [
-            {
-                "course_name": course.course_name,
-                "course_id": course.course_id,
-                "times_recommended": course.recommendation_count
-            } for course in popular_courses
-        ]
-    }
+    return {"popular_courses": report_cache.popular_courses(db, limit=10)}
 
 @app.get("/admin/reports/trait-distribution")
-def get_trait_distribution(db: Session = Depends(get_db)):
-    """Admin: Get distribution of personality traits from assessments"""
-    from sqlalchemy import func as sql_func
-    
-    trait_counts = db.query(
-        models.Option.trait_tag,
-        sql_func.count(models.StudentAnswer.answer_id).label('count')
-    ).join(
-        models.StudentAnswer,
-        models.Option.option_id == models.StudentAnswer.chosen_option_id
-    ).filter(
-        models.Option.trait_tag.isnot(None),
-        models.Option.trait_tag != '',
-        models.Option.trait_tag != 'None'
-    ).group_by(
-        models.Option.trait_tag
-    ).order_by(
-        sql_func.count(models.StudentAnswer.answer_id).desc()
-    ).all()
+def get_trait_distribution(
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    strand: Optional[str] = None,
+    test_type: Optional[str] = None,
+    interval: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Admin: Get distribution of personality traits from assessments
     
-    return {
-        "trait_distribution": [
-            {
-                "trait": trait.trait_tag,
-                "count": trait.count
-            } for trait in trait_counts
-        ]
-    }
+    Answered from the daily trait rollups. Optional: from/to (YYYY-MM-DD,
+    inclusive), strand, test_type, and interval=day|week for a trend series.
+    """
+    if interval is not None and interval not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="interval must be 'day' or 'week'")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    filters = {"date_from": date_from, "date_to": date_to, "strand": strand, "test_type": test_type}
+    if any(value is not None for value in filters.values()):
+        distribution = trait_rollups.distribution(db, **filters)
+    else:
+        distribution = report_cache.trait_distribution(db)  # Unfiltered totals are polled by the dashboard
+
+    response = {"trait_distribution": distribution}
+    if interval:
+        response["interval"] = interval
+        response["trend"] = trait_rollups.trend(db, interval=interval, **filters)
+    return response
+
+@app.post("/admin/reports/trait-distribution/rebuild")
+def rebuild_trait_distribution(db: Session = Depends(get_db)):
+    """Admin: Recompute the trait rollups from all saved answers (e.g. after retagging options)"""
+    rows = trait_rollups.rebuild(db)
+    report_cache.invalidate("traits")
+    return {"message": "Trait rollups rebuilt", "rollup_rows": rows}
 
 @app.get("/admin/reports/user-activity")
 def get_user_activity(db: Session = Depends(get_db)):
@@ -1610,9 +1670,7 @@ def get_user_recommendations(user_id: int, db: Session = Depends(get_db)):
     
     result = []
     for rec in recommendations:
-        course = db.query(models.Course).filter(
-            models.Course.course_id == rec.course_id
-        ).first()
+        course = course_catalog.get(db, rec.course_id)
         
         if course:
             result.append({
@@ -1627,71 +1685,109 @@ def get_user_recommendations(user_id: int, db: Session = Depends(get_db)):
     return {"user_id": user_id, "recommendations": result}
 
 @app.get("/user/{user_id}/assessment-history")
-def get_assessment_history(user_id: int, db: Session = Depends(get_db)):
-    """Get user's test attempts history with recommendations and answered questions (D5 - Test Attempt Database)"""
+def get_assessment_history(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_answers: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Get user's test attempts history with recommendations and answered questions (D5 - Test Attempt Database)
+    
+    limit/cursor page through attempts newest first (pass back next_cursor);
+    include_answers=false omits answered_questions for list views.
+    """
+    from sqlalchemy import bindparam
+    from sqlalchemy.orm import selectinload
+    
     user = db.query(models.User).filter(models.User.user_id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get all test attempts for this user with recommendations
-    attempts = db.query(models.TestAttempt).filter(
-        models.TestAttempt.user_id == user_id
-    ).order_by(models.TestAttempt.taken_at.desc()).all()
+    # Attempts with their test, answers and recommendations in 4 queries total (selectin loading)
+    query = db.query(models.TestAttempt).options(
+        selectinload(models.TestAttempt.test),
+        selectinload(models.TestAttempt.student_answers),
+        selectinload(models.TestAttempt.recommendations)
+    ).filter(models.TestAttempt.user_id == user_id)
+    
+    # Same keyset paging as the admin listings (newest first, '<taken_at>|<attempt_id>' cursors)
+    attempts, next_cursor = fetch_page(
+        query, models.TestAttempt.taken_at, models.TestAttempt.attempt_id,
+        _parse_listing_cursor(cursor), limit, _test_attempt_key
+    )
+    
+    # Questions and chosen options for every answer on the page, one query each
+    question_ids = {a.question_id for attempt in attempts for a in attempt.student_answers}
+    option_ids = {a.chosen_option_id for attempt in attempts for a in attempt.student_answers}
+    options_by_id = {}
+    if option_ids:
+        options_by_id = {
+            o.option_id: o for o in db.query(
+                models.Option.option_id, models.Option.option_text, models.Option.trait_tag
+            ).filter(models.Option.option_id.in_(option_ids)).all()
+        }
+    questions_by_id = {}
+    if question_ids:
+        questions_by_id = {
+            q.question_id: q for q in db.query(
+                models.Question.question_id, models.Question.question_text, models.Question.category
+            ).filter(models.Question.question_id.in_(question_ids)).all()
+        }
+    
+    # Tracking data kept in the legacy user_test_attempts table, one query for the page
+    tracking_by_attempt = {}
+    if attempts:
+        try:
+            # Savepoint: a missing legacy table only rolls back this query, not the
+            # session (a full rollback would expire the attempts loaded above)
+            with db.begin_nested():
+                rows = db.execute(text('''
+                    SELECT attempt_id, max_questions, confidence_score, traits_found
+                    FROM user_test_attempts
+                    WHERE attempt_id IN :attempt_ids
+                ''').bindparams(bindparam("attempt_ids", expanding=True)),
+                    {"attempt_ids": [attempt.attempt_id for attempt in attempts]}).fetchall()
+            tracking_by_attempt = {row[0]: row for row in rows}
+        except Exception as e:
+            print(f"[WARN] Could not fetch from user_test_attempts: {e}")
     
     history = []
     for attempt in attempts:
-        # Count answers for this attempt
-        answer_count = db.query(models.StudentAnswer).filter(
-            models.StudentAnswer.attempt_id == attempt.attempt_id
-        ).count()
-        
-        # Get test name
-        test = db.query(models.Test).filter(
-            models.Test.test_id == attempt.test_id
-        ).first()
-        
-        # Get all student answers with questions and options
-        student_answers = db.query(models.StudentAnswer).filter(
-            models.StudentAnswer.attempt_id == attempt.attempt_id
-        ).all()
+        test = attempt.test
         
         answered_questions = []
         discovered_traits = set()  # Collect unique traits
         
-        for answer in student_answers:
-            question = db.query(models.Question).filter(
-                models.Question.question_id == answer.question_id
-            ).first()
-            
-            chosen_option = db.query(models.Option).filter(
-                models.Option.option_id == answer.chosen_option_id
-            ).first()
+        for answer in attempt.student_answers:
+            question = questions_by_id.get(answer.question_id)
+            chosen_option = options_by_id.get(answer.chosen_option_id)
             
             if question and chosen_option:
-                answered_questions.append({
-                    "question_id": question.question_id,
-                    "question_text": question.question_text,
-                    "category": question.category,
-                    "chosen_option_id": chosen_option.option_id,
-                    "chosen_option_text": chosen_option.option_text,
-                    "trait_tag": chosen_option.trait_tag
-                })
+                if include_answers:
+                    answered_questions.append({
+                        "question_id": question.question_id,
+                        "question_text": question.question_text,
+                        "category": question.category,
+                        "chosen_option_id": chosen_option.option_id,
+                        "chosen_option_text": chosen_option.option_text,
+                        "trait_tag": chosen_option.trait_tag
+                    })
                 # Collect trait for counting
                 if chosen_option.trait_tag:
                     discovered_traits.add(chosen_option.trait_tag)
         
-        # Get recommendations for this attempt (ordered by creation time to get first/top one)
-        recommendations = db.query(models.Recommendation).filter(
-            models.Recommendation.attempt_id == attempt.attempt_id
-        ).order_by(models.Recommendation.recommended_at.asc()).all()
+        # Recommendations in creation order (first one is the top course)
+        recommendations = sorted(
+            attempt.recommendations,
+            key=lambda r: (r.recommended_at is None, r.recommended_at or datetime.datetime.min, r.recommendation_id)
+        )
         
         recommended_courses = []
         top_course = None
         
         for idx, rec in enumerate(recommendations):
-            course = db.query(models.Course).filter(
-                models.Course.course_id == rec.course_id
-            ).first()
+            course = course_catalog.get(db, rec.course_id)
             if course:
                 course_data = {
                     "course_id": course.course_id,
@@ -1706,65 +1802,55 @@ def get_assessment_history(user_id: int, db: Session = Depends(get_db)):
                 if idx == 0:
                     top_course = course_data
         
-        # Get tracking data from test_attempts table (new columns)
-        max_questions = getattr(attempt, 'max_questions', None)
-        confidence_score = getattr(attempt, 'confidence_score', None)
-        traits_found_db = getattr(attempt, 'traits_found', None)  # NEW: Get from test_attempts
-        
-        # Try to get from user_test_attempts if not in test_attempts
-        if max_questions is None or confidence_score is None or traits_found_db is None:
-            try:
-                from sqlalchemy import text
-                uta_result = db.execute(text('''
-                    SELECT max_questions, confidence_score, traits_found 
-                    FROM user_test_attempts 
-                    WHERE attempt_id = :attempt_id
-                '''), {'attempt_id': attempt.attempt_id}).fetchone()
-                
-                if uta_result:
-                    max_questions = uta_result[0] if max_questions is None else max_questions
-                    confidence_score = uta_result[1] if confidence_score is None else confidence_score
-                    traits_found_db = uta_result[2] if traits_found_db is None else traits_found_db
-            except Exception as e:
-                print(f"[WARN] Could not fetch from user_test_attempts: {e}")
-                # Rollback the failed transaction to allow subsequent queries to work
-                db.rollback()
+        # Get tracking data from test_attempts table, falling back to user_test_attempts
+        max_questions = attempt.max_questions
+        confidence_score = attempt.confidence_score
+        traits_found_db = None
+        uta_result = tracking_by_attempt.get(attempt.attempt_id)
+        if uta_result:
+            max_questions = uta_result[1] if max_questions is None else max_questions
+            confidence_score = uta_result[2] if confidence_score is None else confidence_score
+            traits_found_db = uta_result[3]
         
         # Use the stored traits_found value (matches what was shown during assessment)
         traits_found = traits_found_db if traits_found_db is not None else len(discovered_traits)
         
-        # Build traits list safely
-        traits_list = []
-        if discovered_traits:
-            sample = next(iter(discovered_traits), None)
-            if isinstance(sample, str):
-                traits_list = list(discovered_traits)
-        
-        history.append({
+        entry = {
             "attempt_id": attempt.attempt_id,
             "test_name": test.test_name if test else "Assessment",
             "test_type": test.test_type if test else "assessment",
             "taken_at": attempt.taken_at,
-            "questions_answered": answer_count,
+            "questions_answered": len(attempt.student_answers),
             "max_questions": max_questions,  # Quiz length selected (30, 50, 60)
             "confidence_score": round(confidence_score, 1) if confidence_score else None,  # Final confidence %
             "traits_found": traits_found,  # Number of unique traits discovered
-            "traits_list": traits_list,  # List of trait names
+            "traits_list": list(discovered_traits),  # List of trait names
             "answered_questions": answered_questions,
             "recommended_courses": recommended_courses,
             "top_course": top_course,
             "recommendation_count": len(recommended_courses),
-            "user_gwa": getattr(attempt, 'user_gwa', None),  # GWA at time of assessment
-            "user_strand": getattr(attempt, 'user_strand', None)  # Strand at time of assessment
-        })
+            "user_gwa": attempt.user_gwa,  # GWA at time of assessment
+            "user_strand": attempt.user_strand  # Strand at time of assessment
+        }
+        if not include_answers:
+            del entry["answered_questions"]
+        history.append(entry)
     
     # Show all attempts (including those without recommendations for debugging)
     # Previously we filtered: completed_history = [h for h in history if h["recommendation_count"] > 0]
     
+    if limit or cursor:
+        total_attempts = db.query(func.count(models.TestAttempt.attempt_id)).filter(
+            models.TestAttempt.user_id == user_id
+        ).scalar()
+    else:
+        total_attempts = len(history)
+    
     return {
         "user_id": user_id,
-        "total_attempts": len(history),
-        "history": history
+        "total_attempts": total_attempts,
+        "history": history,
+        "next_cursor": next_cursor
     }
 
 # ========== ADMIN: TEST MANAGEMENT ==========
@@ -1775,25 +1861,82 @@ def get_all_tests(db: Session = Depends(get_db)):
     tests = db.query(models.Test).all()
     return {"tests": tests}
 
+TEST_ATTEMPT_EXPORT_FIELDS = ["attempt_id", "user_name", "user_email", "test_name", "taken_at"]
+
+
+def _parse_listing_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _check_listing_format(format: str):
+    if format != "json" and format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: json, {', '.join(EXPORT_FORMATS)}")
+
+
+def _test_attempts_query(db: Session, date_from: Optional[datetime.date] = None,
+                         date_to: Optional[datetime.date] = None):
+    query = db.query(models.TestAttempt).options(
+        joinedload(models.TestAttempt.user),
+        joinedload(models.TestAttempt.test)
+    )
+    if date_from:
+        query = query.filter(models.TestAttempt.taken_at >= datetime.datetime.combine(date_from, datetime.time.min))
+    if date_to:
+        next_day = datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min)
+        query = query.filter(models.TestAttempt.taken_at < next_day)
+    return query
+
+
+def _test_attempt_key(attempt):
+    return attempt.taken_at, attempt.attempt_id
+
+
+def _test_attempt_row(attempt) -> dict:
+    user, test = attempt.user, attempt.test
+    return {
+        "attempt_id": attempt.attempt_id,
+        "user_name": user.fullname if user else "Unknown",
+        "user_email": user.email if user else "Unknown",
+        "test_name": test.test_name if test else "Unknown",
+        "taken_at": attempt.taken_at
+    }
+
+
 @app.get("/admin/test-attempts")
-def get_all_test_attempts(db: Session = Depends(get_db)):
-    """Admin: Get all test attempts with user info"""
-    attempts = db.query(models.TestAttempt).order_by(models.TestAttempt.taken_at.desc()).limit(50).all()
+def get_all_test_attempts(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    format: str = "json",
+    db: Session = Depends(get_db)
+):
+    """Admin: Get all test attempts with user info
     
-    result = []
-    for attempt in attempts:
-        user = db.query(models.User).filter(models.User.user_id == attempt.user_id).first()
-        test = db.query(models.Test).filter(models.Test.test_id == attempt.test_id).first()
-        
-        result.append({
-            "attempt_id": attempt.attempt_id,
-            "user_name": user.fullname if user else "Unknown",
-            "user_email": user.email if user else "Unknown",
-            "test_name": test.test_name if test else "Unknown",
-            "taken_at": attempt.taken_at
-        })
+    Newest first; limit/cursor page through them (pass back next_cursor).
+    from/to (YYYY-MM-DD, inclusive) filter on taken_at. format=ndjson|csv
+    streams every matching attempt instead of one page.
+    """
+    _check_listing_format(format)
+    if format in EXPORT_FORMATS:
+        rows = iter_rows(
+            lambda export_db: _test_attempts_query(export_db, date_from, date_to),
+            models.TestAttempt.taken_at, models.TestAttempt.attempt_id,
+            _test_attempt_key, _test_attempt_row
+        )
+        return stream_export(rows, format, TEST_ATTEMPT_EXPORT_FIELDS, "test_attempts")
     
-    return {"test_attempts": result}
+    attempts, next_cursor = fetch_page(
+        _test_attempts_query(db, date_from, date_to),
+        models.TestAttempt.taken_at, models.TestAttempt.attempt_id,
+        _parse_listing_cursor(cursor), limit, _test_attempt_key
+    )
+    return {"test_attempts": [_test_attempt_row(a) for a in attempts], "next_cursor": next_cursor}
 
 # ========== FEEDBACK SYSTEM ENDPOINTS ==========
 
@@ -1830,6 +1973,7 @@ def submit_recommendation_feedback(
             existing_feedback.rating = feedback.rating
             existing_feedback.feedback_text = feedback.feedback_text
             db.commit()
+            report_cache.invalidate("feedback")
             return {
                 "success": True,
                 "message": "Feedback updated successfully",
@@ -1848,6 +1992,8 @@ def submit_recommendation_feedback(
             db.add(new_feedback)
             db.commit()
             db.refresh(new_feedback)
+            course = course_catalog.get(db, recommendation.course_id)
+            report_cache.record_feedback(feedback.rating, course.course_name if course else None)
             print(f"[FEEDBACK] Successfully saved specific feedback: feedback_id={new_feedback.feedback_id}, rec_id={feedback.recommendation_id}")
             
             return {
@@ -1873,6 +2019,7 @@ def submit_recommendation_feedback(
             db.add(new_feedback)
             db.commit()
             db.refresh(new_feedback)
+            report_cache.record_feedback(feedback.rating)
             print(f"[FEEDBACK] Successfully saved overall feedback: feedback_id={new_feedback.feedback_id}")
             
             return {
@@ -1964,131 +2111,152 @@ def get_user_feedback_history(
 @app.get("/admin/feedback/stats")
 def get_feedback_statistics(db: Session = Depends(get_db)):
     """Admin: Get overall feedback statistics"""
-    
-    total_feedbacks = db.query(models.RecommendationFeedback).count()
-    
-    # Average rating
-    avg_rating_query = db.query(
-        func.avg(models.RecommendationFeedback.rating)
-    ).scalar()
-    avg_rating = round(float(avg_rating_query) if avg_rating_query else 0, 2)
-    
-    # Rating distribution
-    rating_dist = {}
-    for rating in range(1, 6):
-        count = db.query(models.RecommendationFeedback).filter(
-            models.RecommendationFeedback.rating == rating
-        ).count()
-        rating_dist[str(rating)] = count
-    
-    # Most feedback on courses (top 10)
-    top_courses = db.query(
-        models.Course.course_name,
-        func.count(models.RecommendationFeedback.feedback_id).label('feedback_count'),
-        func.avg(models.RecommendationFeedback.rating).label('avg_rating')
-    ).join(
-        models.Recommendation,
-        models.Course.course_id == models.Recommendation.course_id
-    ).join(
-        models.RecommendationFeedback,
-        models.Recommendation.recommendation_id == models.RecommendationFeedback.recommendation_id
-    ).group_by(models.Course.course_name).order_by(
-        func.count(models.RecommendationFeedback.feedback_id).desc()
-    ).limit(10).all()
-    
-    top_courses_list = [
-        {
-            "course_name": course[0],
-            "feedback_count": course[1],
-            "avg_rating": round(float(course[2]), 2) if course[2] else 0
-        }
-        for course in top_courses
-    ]
-    
+    return report_cache.feedback_stats(db)
+
+
+FEEDBACK_EXPORT_FIELDS = ["feedback_id", "rating", "feedback_text", "created_at", "user_name"]
+LOW_RATED_EXPORT_FIELDS = FEEDBACK_EXPORT_FIELDS + ["course_name", "recommendation_reasoning"]
+
+
+def _feedback_key(feedback):
+    return feedback.created_at, feedback.feedback_id
+
+
+def _feedback_row(feedback) -> dict:
     return {
-        "total_feedbacks": total_feedbacks,
-        "average_rating": avg_rating,
-        "rating_distribution": rating_dist,
-        "top_courses": top_courses_list
+        "feedback_id": feedback.feedback_id,
+        "rating": feedback.rating,
+        "feedback_text": feedback.feedback_text,
+        "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
+        "user_name": feedback.user.fullname if feedback.user else "Anonymous"
     }
 
 
+def _course_feedback_query(db: Session, course_id: int):
+    return db.query(models.RecommendationFeedback).options(
+        joinedload(models.RecommendationFeedback.user)
+    ).join(
+        models.Recommendation,
+        models.RecommendationFeedback.recommendation_id == models.Recommendation.recommendation_id
+    ).filter(
+        models.Recommendation.course_id == course_id
+    )
+
+
 @app.get("/admin/feedback/courses/{course_id}")
 def get_course_feedback_detailed(
     course_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = "json",
     db: Session = Depends(get_db)
 ):
-    """Admin: Get detailed feedback for a specific course"""
+    """Admin: Get detailed feedback for a specific course
     
-    course = db.query(models.Course).filter(models.Course.course_id == course_id).first()
+    Stats cover all of the course's feedback; the feedbacks list is newest
+    first and can be paged with limit/cursor. format=ndjson|csv streams the
+    full list instead.
+    """
+    _check_listing_format(format)
+    course = course_catalog.get(db, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    feedbacks = db.query(models.RecommendationFeedback).join(
-        models.Recommendation,
-        models.RecommendationFeedback.recommendation_id == models.Recommendation.recommendation_id
-    ).filter(
-        models.Recommendation.course_id == course_id
-    ).order_by(models.RecommendationFeedback.created_at.desc()).all()
-    
-    feedback_list = [
-        {
-            "feedback_id": f.feedback_id,
-            "rating": f.rating,
-            "feedback_text": f.feedback_text,
-            "created_at": f.created_at.isoformat(),
-            "user_name": f.user.fullname
-        }
-        for f in feedbacks
-    ]
-    
-    # Calculate stats
-    total = len(feedback_list)
-    avg_rating = sum([f["rating"] for f in feedback_list]) / total if total > 0 else 0
+    if format in EXPORT_FORMATS:
+        rows = iter_rows(
+            lambda export_db: _course_feedback_query(export_db, course_id),
+            models.RecommendationFeedback.created_at, models.RecommendationFeedback.feedback_id,
+            _feedback_key, _feedback_row
+        )
+        return stream_export(rows, format, FEEDBACK_EXPORT_FIELDS, f"course_{course_id}_feedback")
+    
+    # Calculate stats in the database
+    by_rating = dict(
+        db.query(
+            models.RecommendationFeedback.rating,
+            func.count(models.RecommendationFeedback.feedback_id)
+        ).join(
+            models.Recommendation,
+            models.RecommendationFeedback.recommendation_id == models.Recommendation.recommendation_id
+        ).filter(
+            models.Recommendation.course_id == course_id
+        ).group_by(models.RecommendationFeedback.rating).all()
+    )
+    total = sum(by_rating.values())
+    avg_rating = sum(rating * count for rating, count in by_rating.items()) / total if total > 0 else 0
     
-    rating_breakdown = {}
-    for rating in range(1, 6):
-        rating_breakdown[str(rating)] = len([f for f in feedback_list if f["rating"] == rating])
+    feedbacks, next_cursor = fetch_page(
+        _course_feedback_query(db, course_id),
+        models.RecommendationFeedback.created_at, models.RecommendationFeedback.feedback_id,
+        _parse_listing_cursor(cursor), limit, _feedback_key
+    )
     
     return {
         "course_id": course_id,
         "course_name": course.course_name,
         "total_feedbacks": total,
         "average_rating": round(avg_rating, 2),
-        "rating_breakdown": rating_breakdown,
-        "feedbacks": feedback_list
+        "rating_breakdown": {str(rating): by_rating.get(rating, 0) for rating in range(1, 6)},
+        "feedbacks": [_feedback_row(f) for f in feedbacks],
+        "next_cursor": next_cursor
+    }
+
+
+def _low_rated_query(db: Session, min_rating: int):
+    return db.query(models.RecommendationFeedback).options(
+        joinedload(models.RecommendationFeedback.recommendation).joinedload(models.Recommendation.course),
+        joinedload(models.RecommendationFeedback.user)
+    ).filter(
+        models.RecommendationFeedback.rating < min_rating
+    )
+
+
+def _low_rated_row(feedback) -> dict:
+    recommendation = feedback.recommendation
+    course = recommendation.course if recommendation else None
+    return {
+        **_feedback_row(feedback),
+        "course_name": course.course_name if course else None,
+        "recommendation_reasoning": recommendation.reasoning if recommendation else None
     }
 
 
 @app.get("/admin/feedback/low-rated")
 def get_low_rated_recommendations(
     min_rating: int = 3,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = "json",
     db: Session = Depends(get_db)
 ):
-    """Admin: Get recommendations that received ratings below threshold (alerts for improvement)"""
+    """Admin: Get recommendations that received ratings below threshold (alerts for improvement)
     
-    # Get feedback with ratings below threshold
-    low_rated = db.query(models.RecommendationFeedback).filter(
-        models.RecommendationFeedback.rating < min_rating
-    ).order_by(models.RecommendationFeedback.created_at.desc()).all()
+    Latest `limit` alerts (20 by default), pageable with cursor/next_cursor;
+    format=ndjson|csv streams all of them.
+    """
+    _check_listing_format(format)
+    if format in EXPORT_FORMATS:
+        rows = iter_rows(
+            lambda export_db: _low_rated_query(export_db, min_rating),
+            models.RecommendationFeedback.created_at, models.RecommendationFeedback.feedback_id,
+            _feedback_key, _low_rated_row
+        )
+        return stream_export(rows, format, LOW_RATED_EXPORT_FIELDS, "low_rated_feedback")
     
-    alerts = [
-        {
-            "feedback_id": f.feedback_id,
-            "course_name": f.recommendation.course.course_name,
-            "rating": f.rating,
-            "feedback_text": f.feedback_text,
-            "user_name": f.user.fullname,
-            "created_at": f.created_at.isoformat(),
-            "recommendation_reasoning": f.recommendation.reasoning
-        }
-        for f in low_rated
-    ]
+    total = db.query(func.count(models.RecommendationFeedback.feedback_id)).filter(
+        models.RecommendationFeedback.rating < min_rating
+    ).scalar() or 0
+    low_rated, next_cursor = fetch_page(
+        _low_rated_query(db, min_rating),
+        models.RecommendationFeedback.created_at, models.RecommendationFeedback.feedback_id,
+        _parse_listing_cursor(cursor), limit, _feedback_key
+    )
     
     return {
         "threshold": min_rating,
-        "total_low_rated": len(alerts),
-        "alerts": alerts[:20]  # Return latest 20
+        "total_low_rated": total,
+        "alerts": [_low_rated_row(f) for f in low_rated],
+        "next_cursor": next_cursor
     }
 
 
@@ -2108,6 +2276,7 @@ def delete_feedback(
     
     db.delete(feedback)
     db.commit()
+    report_cache.invalidate("feedback")
     
     return {"success": True, "message": "Feedback deleted successfully"}
 
@@ -2121,49 +2290,63 @@ if __name__ == "__main__":
 # These endpoints implement an intelligent question-by-question assessment
 # that selects the BEST next question based on previous answers
 
-# Global adaptive engine (initialized after database is seeded)
-_adaptive_engine: AdaptiveAssessmentEngine = None
+def load_adaptive_catalog(db: Session):
+    """Load courses and questions from the DB in the shape the adaptive engine expects"""
+    courses_data = [
+        {
+            "course_name": c.course_name,
+            "description": c.description,
+            "minimum_gwa": c.minimum_gwa,
+            "required_strand": c.required_strand,
+            "trait_tag": c.trait_tag
+        }
+        for c in course_catalog.all(db)
+    ]
+    
+    # Load questions from database
+    questions = db.query(models.Question).options(joinedload(models.Question.options)).all()
+    questions_data = [
+        {
+            "question_id": q.question_id,
+            "question_text": q.question_text,
+            "category": q.category,
+            "options": [
+                {
+                    "option_id": opt.option_id,
+                    "option_text": opt.option_text,
+                    "trait_tag": opt.trait_tag
+                }
+                for opt in q.options
+            ]
+        }
+        for q in questions
+    ]
+    return courses_data, questions_data
+
+
+# Versioned adaptive engine snapshots (rebuilt in the background after admin edits)
+adaptive_engines = AdaptiveEngineRegistry(
+    load_adaptive_catalog, database.SessionLocal,
+    session_store=create_session_store_from_env(),
+    snapshot_path=os.getenv("ADAPTIVE_ENGINE_SNAPSHOT"),  # e.g. ./adaptive_engine_snapshot.json
+    # Another worker edited the catalog: drop this worker's copies too
+    on_shared_change=lambda: (course_catalog.invalidate(), report_cache.invalidate())
+)
+
+# Background writer for completed adaptive sessions (history tables)
+adaptive_result_writer = AdaptiveResultWriter()
 
 def get_or_init_adaptive_engine(db: Session) -> AdaptiveAssessmentEngine:
-    """Get or initialize the adaptive engine with courses and questions from DB"""
-    global _adaptive_engine
-    
-    if _adaptive_engine is None:
-        # Load courses from database
-        courses = db.query(models.Course).all()
-        courses_data = [
-            {
-                "course_name": c.course_name,
-                "description": c.description,
-                "minimum_gwa": c.minimum_gwa,
-                "required_strand": c.required_strand,
-                "trait_tag": c.trait_tag
-            }
-            for c in courses
-        ]
-        
-        # Load questions from database
-        questions = db.query(models.Question).options(joinedload(models.Question.options)).all()
-        questions_data = [
-            {
-                "question_id": q.question_id,
-                "question_text": q.question_text,
-                "category": q.category,
-                "options": [
-                    {
-                        "option_id": opt.option_id,
-                        "option_text": opt.option_text,
-                        "trait_tag": opt.trait_tag
-                    }
-                    for opt in q.options
-                ]
-            }
-            for q in questions
-        ]
-        
-        _adaptive_engine = AdaptiveAssessmentEngine(courses_data, questions_data)
-    
-    return _adaptive_engine
+    """Get the adaptive engine for new sessions (built from the DB on first use)"""
+    return adaptive_engines.current(db)
+
+
+def invalidate_adaptive_catalog(courses_changed: bool = False):
+    """Admin edited courses/questions: refresh caches and rebuild the adaptive engine off the request path"""
+    if courses_changed:
+        course_catalog.invalidate()
+    report_cache.invalidate()
+    adaptive_engines.invalidate()
 
 
 class AdaptiveSessionStart(BaseModel):
@@ -2235,189 +2418,9 @@ def start_adaptive_assessment(data: AdaptiveSessionStart, db: Session = Depends(
     }
 
 
-def save_adaptive_session_to_db(db: Session, engine, session_id: str, recommendations: list, user_id: int = None, answered_questions: dict = None):
-    """Helper function to save adaptive assessment results to database for history tracking"""
-    import os
-    log_dir = os.environ.get("TEMP", ".")
-    log_file = os.path.join(log_dir, "adaptive_debug.log")
-    try:
-        with open(log_file, "a") as f:
-            f.write(f"\n=== SAVE_ADAPTIVE_SESSION CALLED ===\n")
-            f.write(f"session_id: {session_id}\n")
-            f.write(f"user_id: {user_id}\n")
-            f.write(f"recommendations type: {type(recommendations)}\n")
-            f.write(f"recommendations length: {len(recommendations) if recommendations else 0}\n")
-            if recommendations:
-                for idx, rec in enumerate(recommendations[:2]):
-                    f.write(f"  [{idx}] type={type(rec)}, keys={list(rec.keys()) if isinstance(rec, dict) else 'N/A'}\n")
-    except Exception as log_err:
-        pass  # Ignore logging errors
-    
-    print(f"[REC_SAVE] ENTERING save_adaptive_session_to_db - session_id: {session_id}")
-    try:
-        # Get session from engine if available
-        session = engine.sessions.get(session_id)
-        if session:
-            user_id = session.user_id
-            answered_questions = session.answered_questions
-            print(f"[DEBUG] Session found: round_number={session.round_number}, answered_questions={len(session.answered_questions)}, excluded_ids={len(session.excluded_question_ids)}")
-        
-        # If we still don't have user_id, we can't save
-        if not user_id:
-            print(f"[ERROR] No user_id available for session {session_id}")
-            raise Exception(f"Cannot save adaptive session {session_id}: No user_id available")
-        
-        print(f"[DEBUG] Saving adaptive session {session_id} - User: {user_id}, Questions answered: {len(answered_questions) if answered_questions else 0}, Recs: {len(recommendations) if recommendations else 0}")
-        if recommendations and len(recommendations) > 0:
-            print(f"    First rec course_name: '{recommendations[0].get('course_name')}'")
-            print(f"    All rec course names: {[r.get('course_name') for r in recommendations]}")
-        else:
-            print(f"    [WARN] Recommendations list is empty or None: {recommendations}")
-        
-        # Get or create adaptive test type
-        adaptive_test = db.query(models.Test).filter(models.Test.test_type == "adaptive").first()
-        if not adaptive_test:
-            adaptive_test = models.Test(
-                test_name="Smart Assessment (Adaptive)",
-                test_type="adaptive",
-                description="Akinator-style adaptive assessment"
-            )
-            db.add(adaptive_test)
-            db.flush()
-            print(f"🆕 Created new adaptive test with ID: {adaptive_test.test_id}")
-        
-        # Extract quiz config from session for tracking
-        max_questions_selected = session.max_questions if session else None
-        questions_presented = session.round_number if session else None  # Total rounds = questions shown
-        questions_answered = len(answered_questions) if answered_questions else 0
-        # Use 1 decimal place to match what student app displays
-        confidence_score = round(session.confidence * 100, 1) if session else None
-        
-        # Create test attempt with full tracking data
-        test_attempt = models.TestAttempt(
-            user_id=user_id,
-            test_id=adaptive_test.test_id,
-            max_questions=max_questions_selected,  # Quiz length selected (30, 50, 60)
-            questions_presented=questions_presented,  # How many questions were shown
-            questions_answered=questions_answered,  # How many were actually answered
-            confidence_score=confidence_score,  # Final confidence %
-            user_gwa=session.user_gwa if session else None,  # User's GWA at time of assessment
-            user_strand=session.user_strand if session else None  # User's strand at time of assessment
-        )
-        db.add(test_attempt)
-        db.flush()
-        attempt_id = test_attempt.attempt_id  # CACHE THE ATTEMPT ID BEFORE COMMIT!
-        print(f"[OK] Created test attempt: {attempt_id} for user {user_id}")
-        print(f"[TRACKING] max_questions={max_questions_selected}, presented={questions_presented}, answered={questions_answered}, confidence={confidence_score}%")
-        
-        # Save answered questions
-        if answered_questions:
-            for question_id, option_id in answered_questions.items():
-                db.add(models.StudentAnswer(
-                    attempt_id=attempt_id,
-                    question_id=question_id,
-                    chosen_option_id=option_id
-                ))
-        
-        # 🔑 COMMIT TestAttempt and StudentAnswers FIRST
-        db.commit()
-        print(f"[OK] Committed attempt and answers: attempt_id={attempt_id}")
-        
-        # Sync to user_test_attempts (per-user tracking table) with FULL quiz tracking data
-        try:
-            from sqlalchemy import text
-            cursor_check = db.execute(text('''
-                SELECT attempt_id FROM user_test_attempts WHERE attempt_id = :attempt_id
-            '''), {'attempt_id': attempt_id})
-            
-            # Calculate traits found from session
-            traits_found = len(session.trait_scores) if session and hasattr(session, 'trait_scores') else 0
-            
-            if not cursor_check.fetchone():
-                db.execute(text('''
-                    INSERT INTO user_test_attempts 
-                    (attempt_id, user_id, test_id, score, total_questions, attempt_date, time_taken, created_at,
-                     max_questions, confidence_score, traits_found)
-                    VALUES (:attempt_id, :user_id, :test_id, :score, :total_questions, :attempt_date, :time_taken, NOW(),
-                            :max_questions, :confidence_score, :traits_found)
-                '''), {
-                    'attempt_id': attempt_id,
-                    'user_id': user_id,
-                    'test_id': adaptive_test.test_id,
-                    'score': 0,
-                    'total_questions': questions_answered,  # Actual questions answered
-                    'attempt_date': test_attempt.taken_at,
-                    'time_taken': 0,
-                    'max_questions': max_questions_selected,  # Quiz length student selected (30, 50, 60)
-                    'confidence_score': confidence_score,  # Final confidence %
-                    'traits_found': traits_found  # Number of unique traits discovered
-                })
-                print(f"[OK] Synced to user_test_attempts with tracking: max_q={max_questions_selected}, conf={confidence_score}%, traits={traits_found}")
-            db.commit()
-        except Exception as sync_error:
-            print(f"[WARN] Could not sync to user_test_attempts: {sync_error}")
-            import traceback
-            traceback.print_exc()
-            # Rollback to clear the failed transaction state so subsequent queries work
-            db.rollback()
-        
-        # NOW save recommendations
-        if recommendations and len(recommendations) > 0:
-            try:
-                rec_count = 0
-                print(f"[REC_SAVE] Processing {len(recommendations)} recommendations for attempt {test_attempt.attempt_id}")
-                
-                for idx, rec in enumerate(recommendations):
-                    course_name = rec.get("course_name", "").strip()
-                    print(f"[REC_SAVE] [{idx}] Trying to match: '{course_name}'")
-                    if not course_name:
-                        print(f"[REC_SAVE] [{idx}] NO COURSE NAME - SKIPPING")
-                        continue
-                    
-                    # Try exact match first
-                    course = db.query(models.Course).filter(
-                        models.Course.course_name == course_name
-                    ).first()
-                    
-                    # If no exact match, try case-insensitive
-                    if not course:
-                        course = db.query(models.Course).filter(
-                            models.Course.course_name.ilike(f"%{course_name}%")
-                        ).first()
-                    
-                    if course:
-                        rec_obj = models.Recommendation(
-                            attempt_id=attempt_id,
-                            user_id=user_id,
-                            course_id=course.course_id,
-                            reasoning=f"{rec.get('description', '')} - Match: {rec.get('match_percentage', 75)}%",
-                            score=rec.get('match_percentage', 75)  # Store the match percentage as score
-                        )
-                        db.add(rec_obj)
-                        rec_count += 1
-                        print(f"[REC_SAVE] [+] Matched: {course.course_name}")
-                    else:
-                        print(f"[REC_SAVE] [-] NO MATCH for: '{course_name}'")
-                
-                if rec_count > 0:
-                    db.commit()
-                    print(f"[REC_SAVE] SUCCESS: Saved {rec_count} recommendations")
-                else:
-                    print(f"[REC_SAVE] WARNING: No recommendations matched (rec_count=0)")
-            except Exception as rec_error:
-                print(f"[REC_SAVE] ERROR: {rec_error}")
-                import traceback
-                traceback.print_exc()
-                db.rollback()
-        else:
-            print(f"[REC_SAVE] WARNING: Recommendations list empty or None")
-            
-    except Exception as e:
-        print(f"[ERROR] Error saving adaptive assessment: {e}")
-        import traceback
-        traceback.print_exc()
-        db.rollback()
-        raise
+def save_adaptive_session_to_db(session, recommendations: list):
+    """Queue a completed adaptive session for history tracking (written in the background)"""
+    adaptive_result_writer.submit(CompletedAssessment.from_session(session, recommendations))
 
 
 @app.post("/adaptive/answer")
@@ -2428,101 +2431,100 @@ def submit_adaptive_answer(data: AdaptiveAnswerSubmit, db: Session = Depends(get
     Processes your answer and intelligently selects the NEXT BEST question.
     Shows you how courses are narrowing down in real-time.
     """
-    engine = get_or_init_adaptive_engine(db)
-    
-    # Process the answer
-    result = engine.process_answer(data.sessionId, data.questionId, data.chosenOptionId)
-    print(f"[DEBUG] DEBUG /adaptive/answer: status={result.get('status')}, session_id={data.sessionId}")
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    # Handle duplicate answer (user clicked too fast on same question)
-    if result.get("status") == "duplicate":
-        print(f"[WARN] Duplicate answer detected for session {data.sessionId}, question {data.questionId}")
-        # Just return the current state without getting next question
+    with adaptive_engines.session_scope(db, data.sessionId) as engine:
+        # Process the answer
+        result = engine.process_answer(data.sessionId, data.questionId, data.chosenOptionId)
+        print(f"[DEBUG] DEBUG /adaptive/answer: status={result.get('status')}, session_id={data.sessionId}")
+        
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        # Handle duplicate answer (user clicked too fast on same question)
+        if result.get("status") == "duplicate":
+            print(f"[WARN] Duplicate answer detected for session {data.sessionId}, question {data.questionId}")
+            # Just return the current state without getting next question
+            return {
+                "success": True,
+                "is_complete": False,
+                "message": "Answer already recorded for this question",
+                "current_round": result.get("round"),
+                "confidence": result.get("confidence"),
+                "traits_discovered": result.get("traits_discovered"),
+                "courses_remaining": result.get("courses_remaining"),
+            }
+        
+        # If session is complete, return final results
+        if result.get("status") == "complete":
+            print(f"[OK] Assessment complete (status=complete)! Saving to database...")
+            recs = result.get('recommendations', [])
+            print(f"[DEBUG] DEBUG: status=complete has {len(recs) if recs else 0} recommendations")
+            if recs:
+                print(f"[DEBUG] DEBUG: Recommendation courses: {[r.get('course_name') for r in recs]}")
+            else:
+                print(f"[WARN] WARNING: No recommendations in result! result={result}")
+            # Get session to extract user_id and answered questions
+            session = engine.sessions.get(data.sessionId)
+            if session:
+                # Save to database for history
+                print(f"[DEBUG] DEBUG: Session user_id={session.user_id}, is_complete={session.is_complete}")
+                save_adaptive_session_to_db(session, recs)
+                print(f"[OK] Queued DB save for user_id={session.user_id}")
+            else:
+                print(f"[WARN] Could not find session {data.sessionId} to save")
+            return {
+                "success": True,
+                "is_complete": True,
+                "message": "Assessment complete! Here are your personalized recommendations.",
+                "traits_discovered": len(session.trait_scores) if session else 0,
+                "confidence": result.get("confidence", 0),
+                "recommendations": recs
+            }
+        
+        # Get next question
+        next_question = engine.get_next_question(data.sessionId)
+        
+        if next_question is None:
+            # Assessment complete
+            print(f"[OK] Assessment complete (no next question)! Saving to database...")
+            final_results = engine.get_final_results(data.sessionId)
+            recs = final_results.get('recommendations', [])
+            print(f"[DEBUG] DEBUG: Final results has {len(recs) if recs else 0} recommendations")
+            if recs:
+                print(f"[DEBUG] DEBUG: Recommendation courses: {[r.get('course_name') for r in recs]}")
+            else:
+                print(f"[WARN] WARNING: No recommendations in final_results! final_results={final_results}")
+            # Get session to extract user_id and answered questions
+            session = engine.sessions.get(data.sessionId)
+            if session:
+                # Save to database for history
+                print(f"[DEBUG] DEBUG: Session user_id={session.user_id}, is_complete={session.is_complete}, final_recs={len(session.final_recommendations) if session.final_recommendations else 0}")
+                save_adaptive_session_to_db(session, recs)
+                print(f"[OK] Queued DB save for user_id={session.user_id}")
+            else:
+                print(f"[WARN] Could not find session {data.sessionId} to save")
+            return {
+                "success": True,
+                "is_complete": True,
+                "message": f"Assessment complete after {result['round']} questions!",
+                "total_questions": result["round"],
+                "traits_discovered": final_results.get("traits_discovered", 0),
+                "confidence": final_results.get("confidence", 0),
+                "recommendations": recs
+            }
+        
+        print(f"⏳ Assessment in progress: round={result.get('round')}, confidence={result.get('confidence')}")
         return {
             "success": True,
             "is_complete": False,
-            "message": "Answer already recorded for this question",
-            "current_round": result.get("round"),
-            "confidence": result.get("confidence"),
-            "traits_discovered": result.get("traits_discovered"),
-            "courses_remaining": result.get("courses_remaining"),
-        }
-    
-    # If session is complete, return final results
-    if result.get("status") == "complete":
-        print(f"[OK] Assessment complete (status=complete)! Saving to database...")
-        recs = result.get('recommendations', [])
-        print(f"[DEBUG] DEBUG: status=complete has {len(recs) if recs else 0} recommendations")
-        if recs:
-            print(f"[DEBUG] DEBUG: Recommendation courses: {[r.get('course_name') for r in recs]}")
-        else:
-            print(f"[WARN] WARNING: No recommendations in result! result={result}")
-        # Get session to extract user_id and answered questions
-        session = engine.sessions.get(data.sessionId)
-        if session:
-            # Save to database for history
-            print(f"[DEBUG] DEBUG: Session user_id={session.user_id}, is_complete={session.is_complete}")
-            save_adaptive_session_to_db(db, engine, data.sessionId, recs, user_id=session.user_id, answered_questions=session.answered_questions)
-            print(f"[OK] Saved to DB with user_id={session.user_id}")
-        else:
-            print(f"[WARN] Could not find session {data.sessionId} to save")
-        return {
-            "success": True,
-            "is_complete": True,
-            "message": "Assessment complete! Here are your personalized recommendations.",
-            "traits_discovered": len(session.trait_scores) if session else 0,
-            "confidence": result.get("confidence", 0),
-            "recommendations": recs
-        }
-    
-    # Get next question
-    next_question = engine.get_next_question(data.sessionId)
-    
-    if next_question is None:
-        # Assessment complete
-        print(f"[OK] Assessment complete (no next question)! Saving to database...")
-        final_results = engine.get_final_results(data.sessionId)
-        recs = final_results.get('recommendations', [])
-        print(f"[DEBUG] DEBUG: Final results has {len(recs) if recs else 0} recommendations")
-        if recs:
-            print(f"[DEBUG] DEBUG: Recommendation courses: {[r.get('course_name') for r in recs]}")
-        else:
-            print(f"[WARN] WARNING: No recommendations in final_results! final_results={final_results}")
-        # Get session to extract user_id and answered questions
-        session = engine.sessions.get(data.sessionId)
-        if session:
-            # Save to database for history
-            print(f"[DEBUG] DEBUG: Session user_id={session.user_id}, is_complete={session.is_complete}, final_recs={len(session.final_recommendations) if session.final_recommendations else 0}")
-            save_adaptive_session_to_db(db, engine, data.sessionId, recs, user_id=session.user_id, answered_questions=session.answered_questions)
-            print(f"[OK] Saved to DB with user_id={session.user_id}")
-        else:
-            print(f"[WARN] Could not find session {data.sessionId} to save")
-        return {
-            "success": True,
-            "is_complete": True,
-            "message": f"Assessment complete after {result['round']} questions!",
-            "total_questions": result["round"],
-            "traits_discovered": final_results.get("traits_discovered", 0),
-            "confidence": final_results.get("confidence", 0),
-            "recommendations": recs
+            "current_round": next_question["round"],
+            "trait_recorded": result.get("trait_recorded"),
+            "courses_remaining": result["courses_remaining"],
+            "confidence": result["confidence"],
+            "top_courses_preview": result.get("top_courses_preview", []),
+            "traits_discovered": result.get("traits_discovered", 0),
+            "next_question": next_question,
+            "can_finish_early": next_question.get("can_finish_early", False)
         }
-    
-    print(f"⏳ Assessment in progress: round={result.get('round')}, confidence={result.get('confidence')}")
-    return {
-        "success": True,
-        "is_complete": False,
-        "current_round": next_question["round"],
-        "trait_recorded": result.get("trait_recorded"),
-        "courses_remaining": result["courses_remaining"],
-        "confidence": result["confidence"],
-        "top_courses_preview": result.get("top_courses_preview", []),
-        "traits_discovered": result.get("traits_discovered", 0),
-        "next_question": next_question,
-        "can_finish_early": next_question.get("can_finish_early", False)
-    }
 
 
 @app.post("/adaptive/finish")
@@ -2537,34 +2539,39 @@ def finish_adaptive_early(data: dict, db: Session = Depends(get_db)):
     if not session_id:
         raise HTTPException(status_code=400, detail="Session ID required")
     
-    engine = get_or_init_adaptive_engine(db)
-    result = engine.finish_early(session_id)
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    # Save to database for history using the helper function
-    try:
-        # Get session to extract user_id and answered questions
-        session = engine.sessions.get(session_id)
-        if session:
-            save_adaptive_session_to_db(db, engine, session_id, result.get("recommendations", []), user_id=session.user_id, answered_questions=session.answered_questions)
-            print(f"[OK] Saved adaptive assessment from /adaptive/finish endpoint with user_id={session.user_id}")
-        else:
-            print(f"[WARN] Could not find session {session_id} to save")
-            raise Exception(f"Session {session_id} not found")
-    except Exception as e:
-        print(f"[WARN] Error saving adaptive assessment: {e}")
-        raise HTTPException(status_code=500, detail=f"Error saving assessment: {str(e)}")
-    
-    return {
-        "success": True,
-        "message": f"Assessment finished early after {result['total_questions_asked']} questions!",
-        "total_questions": result["total_questions_asked"],
-        "confidence": result["confidence"],
-        "traits_discovered": result["traits_discovered"],
-        "recommendations": result["recommendations"]
-    }
+    with adaptive_engines.session_scope(db, session_id) as engine:
+        existing = engine.sessions.get(session_id)
+        already_complete = bool(existing and existing.is_complete)
+        result = engine.finish_early(session_id)
+        
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        # Save to database for history using the helper function (once - a repeated finish was already saved)
+        try:
+            if already_complete:
+                print(f"[WARN] Session {session_id} was already complete; not saving it again")
+            else:
+                # Get session to extract user_id and answered questions
+                session = engine.sessions.get(session_id)
+                if session:
+                    save_adaptive_session_to_db(session, result.get("recommendations", []))
+                    print(f"[OK] Queued adaptive assessment save from /adaptive/finish endpoint with user_id={session.user_id}")
+                else:
+                    print(f"[WARN] Could not find session {session_id} to save")
+                    raise Exception(f"Session {session_id} not found")
+        except Exception as e:
+            print(f"[WARN] Error saving adaptive assessment: {e}")
+            raise HTTPException(status_code=500, detail=f"Error saving assessment: {str(e)}")
+        
+        return {
+            "success": True,
+            "message": f"Assessment finished early after {result['total_questions_asked']} questions!",
+            "total_questions": result["total_questions_asked"],
+            "confidence": result["confidence"],
+            "traits_discovered": result["traits_discovered"],
+            "recommendations": result["recommendations"]
+        }
 
 
 @app.post("/adaptive/previous")
@@ -2578,123 +2585,86 @@ def go_to_previous_question(data: dict, db: Session = Depends(get_db)):
     if not session_id:
         raise HTTPException(status_code=400, detail="Session ID required")
     
-    engine = get_or_init_adaptive_engine(db)
-    result = engine.go_to_previous_question(session_id)
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    return {
-        "success": True,
-        "is_complete": False,
-        "current_round": result["round"],
-        "confidence": result["confidence"],
-        "traits_discovered": result["traits_discovered"],
-        "courses_remaining": result["courses_remaining"],
-        "next_question": result.get("question"),
-        "top_courses_preview": result.get("top_courses_preview", []),
-        "message": result.get("message")
-    }
+    with adaptive_engines.session_scope(db, session_id) as engine:
+        result = engine.go_to_previous_question(session_id)
+        
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return {
+            "success": True,
+            "is_complete": False,
+            "current_round": result["round"],
+            "confidence": result["confidence"],
+            "traits_discovered": result["traits_discovered"],
+            "courses_remaining": result["courses_remaining"],
+            "next_question": result.get("question"),
+            "top_courses_preview": result.get("top_courses_preview", []),
+            "message": result.get("message")
+        }
 
 
 @app.get("/adaptive/status/{session_id}")
 def get_adaptive_status(session_id: str, db: Session = Depends(get_db)):
     """Get current status of an adaptive assessment session"""
+    with adaptive_engines.session_scope(db, session_id) as engine:
+        session = engine.sessions.get(session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        return {
+            "session_id": session_id,
+            "is_complete": session.is_complete,
+            "round": session.round_number,
+            "confidence": round(session.confidence * 100, 1),
+            "traits_discovered": len(session.trait_scores),
+            "courses_remaining": session.final_courses_remaining if session.is_complete else len(session.active_courses),
+            "questions_answered": len(session.answered_questions)
+        }
+
+
+@app.get("/admin/adaptive/sessions/metrics")
+def get_adaptive_session_metrics(db: Session = Depends(get_db)):
+    """Live/expired/evicted/compacted counters for the adaptive session store"""
     engine = get_or_init_adaptive_engine(db)
-    
-    if not engine.sessions.get(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = engine.sessions[session_id]
-    
-    return {
-        "session_id": session_id,
-        "is_complete": session.is_complete,
-        "round": session.round_number,
-        "confidence": round(session.confidence * 100, 1),
-        "traits_discovered": len(session.trait_scores),
-        "courses_remaining": len(session.active_courses),
-        "questions_answered": len(session.answered_questions)
-    }
+    engine.sessions.purge_expired()
+    return {**engine.sessions.metrics(), "engines": adaptive_engines.metrics()}
+
+
+@app.get("/admin/recommendations/cache/metrics")
+def get_recommendation_cache_metrics():
+    """Hit rate and size of the hybrid recommendation result cache"""
+    cache = recommendation_engine.result_cache
+    return cache.metrics() if cache is not None else {"enabled": False}
 
 
 # ========== PDF EXPORT & EMAIL ENDPOINTS ==========
 
 from fastapi.responses import StreamingResponse
-from io import BytesIO
 import urllib.request
 import urllib.error
 
-class EmailDomainNotVerifiedError(Exception):
-    """Raised when Resend domain is not verified (free tier limitation)."""
-    pass
+def _require_email_service():
+    if not email_queue.transport.is_configured():
+        raise HTTPException(status_code=500, detail="Email service is not configured. Please set RESEND_API_KEY or SMTP credentials.")
+    if email_queue.domain_not_verified:
+        # A queued send already hit Resend's unverified-domain error; the frontend shows its PDF hint on 503
+        raise HTTPException(status_code=503, detail=email_queue.domain_not_verified)
 
-def send_email_html(to_email: str, subject: str, html_content: str, from_name: str = "CoursePro"):
-    """Send an HTML email using Resend HTTP API (preferred) or SMTP fallback."""
-    
-    # Try Resend HTTP API first (works on Railway/cloud platforms)
-    resend_api_key = os.getenv("RESEND_API_KEY", "")
-    resend_from = os.getenv("RESEND_FROM", "CoursePro <onboarding@resend.dev>")
-    
-    if resend_api_key:
-        import requests as _requests
-        try:
-            resp = _requests.post(
-                "https://api.resend.com/emails",
-                headers={
-                    "Authorization": f"Bearer {resend_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "from": resend_from,
-                    "to": [to_email],
-                    "subject": subject,
-                    "html": html_content
-                },
-                timeout=30
-            )
-            if resp.status_code in (200, 201):
-                print(f"[EMAIL] Resend success: {resp.json()}")
-                return True
-            elif resp.status_code == 403 and "verify a domain" in resp.text:
-                print(f"[EMAIL] Resend domain not verified (free tier). Cannot send to {to_email}")
-                raise EmailDomainNotVerifiedError(
-                    "Email service is in testing mode. To enable sending emails to all users, "
-                    "a verified domain must be configured. Please download your results as PDF instead."
-                )
-            else:
-                print(f"[EMAIL] Resend HTTP error {resp.status_code}: {resp.text}")
-                raise Exception(f"Resend API error ({resp.status_code}): {resp.text}")
-        except _requests.exceptions.RequestException as e:
-            print(f"[EMAIL] Resend request error: {e}")
-            raise Exception(f"Resend API error: {str(e)}")
-    
-    # Fallback: SMTP (works locally, may be blocked on some cloud platforms)
-    import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    
-    smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    
-    if not smtp_user or not smtp_password:
-        raise Exception("No email service configured. Set RESEND_API_KEY or SMTP_USER/SMTP_PASSWORD.")
-    
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = f"{from_name} <{smtp_user}>"
-    msg["To"] = to_email
-    msg.attach(MIMEText(html_content, "html"))
-    
-    with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-    
-    print(f"[EMAIL] SMTP success: sent to {to_email}")
-    return True
+
+@app.get("/email/jobs/{job_id}")
+def get_email_job_status(job_id: str):
+    """Delivery status of a queued email (queued, sending, retrying, sent, failed)"""
+    job = email_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Email job not found")
+    return job.to_dict()
+
+
+@app.get("/admin/email/metrics")
+def get_email_queue_metrics():
+    """Admin: Outbound email queue counters"""
+    return email_queue.metrics()
 
 class ExportRequest(BaseModel):
     user_name: str
@@ -2716,154 +2686,11 @@ class EmailRequest(BaseModel):
 def export_recommendations_pdf(data: ExportRequest):
     """Generate a PDF with the user's course recommendations"""
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#6366f1'),
-            alignment=TA_CENTER,
-            spaceAfter=20
-        )
-        
-        subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Normal'],
-            fontSize=12,
-            textColor=colors.HexColor('#64748b'),
-            alignment=TA_CENTER,
-            spaceAfter=30
-        )
-        
-        section_style = ParagraphStyle(
-            'SectionHeader',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#1e293b'),
-            spaceBefore=20,
-            spaceAfter=10
-        )
-        
-        course_title_style = ParagraphStyle(
-            'CourseTitle',
-            parent=styles['Heading3'],
-            fontSize=14,
-            textColor=colors.HexColor('#6366f1'),
-            spaceBefore=15,
-            spaceAfter=5
-        )
-        
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#334155'),
-            spaceAfter=8,
-            leading=14
-        )
-        
-        elements = []
-        
-        # Header
-        elements.append(Paragraph("CoursePro", title_style))
-        elements.append(Paragraph("Course Recommendation Report", subtitle_style))
-        
-        # User Info Section
-        elements.append(Paragraph("Student Profile", section_style))
-        elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#e2e8f0')))
-        elements.append(Spacer(1, 10))
-        
-        profile_data = [
-            ["Name:", data.user_name or "N/A"],
-            ["GWA:", str(data.user_gwa) if data.user_gwa else "N/A"],
-            ["Strand:", data.user_strand or "N/A"],
-        ]
-        
-        profile_table = Table(profile_data, colWidths=[1.5*inch, 4*inch])
-        profile_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#64748b')),
-            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1e293b')),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(profile_table)
-        
-        # Detected Traits
-        if data.detected_traits:
-            elements.append(Spacer(1, 15))
-            traits_text = ", ".join([t[0] if isinstance(t, (list, tuple)) else str(t) for t in data.detected_traits[:5]])
-            elements.append(Paragraph(f"<b>Detected Traits:</b> {traits_text}", body_style))
-        
-        elements.append(Spacer(1, 20))
-        
-        # Recommendations Section
-        elements.append(Paragraph("Recommended Courses", section_style))
-        elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#e2e8f0')))
-        
-        for idx, rec in enumerate(data.recommendations, 1):
-            course_name = rec.get('course_name', 'Unknown Course')
-            description = rec.get('description', '')
-            reasoning = rec.get('reasoning', '')
-            score = rec.get('compatibility_score') or rec.get('final_score') or rec.get('match_percentage') or 0
-            
-            elements.append(Paragraph(f"#{idx} - {course_name}", course_title_style))
-            
-            if description:
-                elements.append(Paragraph(f"<b>Description:</b> {description}", body_style))
-            
-            if reasoning:
-                elements.append(Paragraph(f"<b>Why this fits you:</b> {reasoning}", body_style))
-            
-            # Course requirements
-            min_gwa = rec.get('minimum_gwa')
-            strand = rec.get('recommended_strand')
-            if min_gwa or strand:
-                req_text = []
-                if min_gwa:
-                    req_text.append(f"Min GWA: {min_gwa}")
-                if strand:
-                    req_text.append(f"Recommended Strand: {strand}")
-                elements.append(Paragraph(f"<b>Requirements:</b> {' | '.join(req_text)}", body_style))
-            
-            elements.append(Spacer(1, 10))
-        
-        # Footer
-        elements.append(Spacer(1, 30))
-        elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#e2e8f0')))
-        
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#94a3b8'),
-            alignment=TA_CENTER,
-            spaceBefore=15
-        )
-        elements.append(Paragraph(f"Generated by CoursePro - {datetime.datetime.now().strftime('%B %d, %Y')}", footer_style))
-        elements.append(Paragraph("This report is based on your assessment responses and academic profile.", footer_style))
-        
-        doc.build(elements)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            buffer,
+        pdf = pdf_service.render(data.model_dump())
+        return Response(
+            content=pdf,
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=CoursePro_Recommendations_{data.user_name.replace(' ', '_')}.pdf"
-            }
+            headers={"Content-Disposition": f"attachment; filename={report_filename(data.user_name)}"}
         )
         
     except ImportError:
@@ -2872,10 +2699,77 @@ def export_recommendations_pdf(data: ExportRequest):
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
 
+class BatchExportRequest(BaseModel):
+    reports: List[ExportRequest]
+
+
+@app.post("/export/pdf/batch")
+def export_recommendations_pdf_batch(data: BatchExportRequest):
+    """Generate one PDF per student (same layout as /export/pdf) and stream them back as a ZIP"""
+    if not data.reports:
+        raise HTTPException(status_code=400, detail="No reports to export")
+    try:
+        import reportlab  # noqa: F401  (fail before the response starts streaming)
+    except ImportError:
+        raise HTTPException(status_code=500, detail="PDF generation library not installed. Run: pip install reportlab")
+    
+    names = unique_names(report_filename(r.user_name) for r in data.reports)
+    pdfs = pdf_service.render_many((r.model_dump() for r in data.reports), return_exceptions=True)
+    return StreamingResponse(
+        stream_zip(report_entries(names, pdfs)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=CoursePro_Recommendations_{len(names)}_students.zip"}
+    )
+
+
+class CohortExportRequest(BaseModel):
+    user_ids: Optional[List[int]] = None  # Explicit students; combined with the filters below
+    strand: Optional[str] = None  # Strand at assessment time (e.g. "STEM")
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+    latest_only: bool = True  # One report per student (latest attempt) instead of one per attempt
+
+
+@app.post("/admin/export/cohort")
+def export_cohort_pdfs(data: CohortExportRequest, db: Session = Depends(get_db)):
+    """Admin: Recommendation PDFs for a whole class / strand as a streamed ZIP (with an index.csv)"""
+    if data.user_ids is None and not data.strand and not data.date_from and not data.date_to:
+        raise HTTPException(status_code=400, detail="Select students with user_ids, strand or a date range")
+    if data.date_from and data.date_to and data.date_from > data.date_to:
+        raise HTTPException(status_code=400, detail="date_from must be on or before date_to")
+    try:
+        import reportlab  # noqa: F401  (fail before the response starts streaming)
+    except ImportError:
+        raise HTTPException(status_code=500, detail="PDF generation library not installed. Run: pip install reportlab")
+    
+    reports = load_cohort_reports(
+        db, user_ids=data.user_ids, strand=data.strand,
+        date_from=data.date_from, date_to=data.date_to, latest_only=data.latest_only
+    )
+    if not reports:
+        raise HTTPException(status_code=404, detail="No assessments match this cohort")
+    print(f"[REPORT] Cohort export: {len(reports)} reports")
+    
+    def entries():
+        yield "index.csv", manifest_csv(reports)
+        yield from report_entries(
+            (r.filename for r in reports),
+            pdf_service.render_many((r.payload for r in reports), return_exceptions=True)
+        )
+    
+    label = re.sub(r"[^A-Za-z0-9_-]", "_", data.strand) if data.strand else "cohort"
+    return StreamingResponse(
+        stream_zip(entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=CoursePro_{label}_{len(reports)}_reports.zip"}
+    )
+
+
 @app.post("/export/email")
 def email_recommendations(data: EmailRequest, db: Session = Depends(get_db)):
-    """Send course recommendations to user's email"""
+    """Queue course recommendations for the user's email (poll /email/jobs/{job_id} for delivery)"""
     
+    _require_email_service()
     try:
         # Build email content
         html_content = f"""
@@ -2939,21 +2833,17 @@ def email_recommendations(data: EmailRequest, db: Session = Depends(get_db)):
         """
         
         subject = f"Your CoursePro Recommendations - {data.user_name}"
-        send_email_html(data.email, subject, html_content)
+        job = email_queue.submit(data.email, subject, html_content, kind="recommendations")
         
         return {
             "success": True,
-            "message": f"Recommendations sent successfully to {data.email}"
+            "message": f"Recommendations queued for delivery to {data.email}",
+            "job_id": job.job_id,
+            "status": job.status
         }
         
-    except EmailDomainNotVerifiedError as e:
-        print(f"[EMAIL] Domain not verified: {str(e)}")
-        raise HTTPException(
-            status_code=503,
-            detail="Email service is currently in testing mode and cannot send to external addresses. Please download your results as PDF instead."
-        )
     except Exception as e:
-        print(f"[EMAIL] Failed to send recommendations: {str(e)}")
+        print(f"[EMAIL] Failed to queue recommendations: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error sending email: {str(e)}")
 
 
@@ -2973,173 +2863,52 @@ def send_daily_digest(data: DailyDigestRequest, db: Session = Depends(get_db)):
     if not user.email:
         raise HTTPException(status_code=400, detail="User email not found")
     
-    # Get today's date range (start of day to end of day)
+    # Today's attempts, tests and recommendations (two queries)
     today = datetime.datetime.now().date()
-    today_start = datetime.datetime.combine(today, datetime.time.min)
-    today_end = datetime.datetime.combine(today, datetime.time.max)
+    digest = load_digests(db, today, user_ids=[data.user_id]).get(data.user_id)
     
-    # Get all test attempts from today for this user
-    today_attempts = db.query(models.TestAttempt).filter(
-        models.TestAttempt.user_id == data.user_id,
-        models.TestAttempt.taken_at >= today_start,
-        models.TestAttempt.taken_at <= today_end
-    ).order_by(models.TestAttempt.taken_at.desc()).all()
-    
-    if not today_attempts:
+    if not digest:
         return {
             "success": False,
             "message": "No assessments found for today. Complete an assessment first!"
         }
     
-    # Build digest data
-    digest_items = []
-    for attempt in today_attempts:
-        # Get test name
-        test = db.query(models.Test).filter(models.Test.test_id == attempt.test_id).first()
-        test_name = test.test_name if test else "Assessment"
-        
-        # Get recommendations for this attempt
-        recommendations = db.query(models.Recommendation).filter(
-            models.Recommendation.attempt_id == attempt.attempt_id
-        ).order_by(models.Recommendation.recommended_at.asc()).all()
-        
-        courses = []
-        for rec in recommendations:
-            course = db.query(models.Course).filter(models.Course.course_id == rec.course_id).first()
-            if course:
-                courses.append({
-                    "name": course.course_name,
-                    "description": course.description,
-                    "reasoning": rec.reasoning
-                })
-        
-        digest_items.append({
-            "test_name": test_name,
-            "taken_at": attempt.taken_at.strftime('%I:%M %p') if attempt.taken_at else 'N/A',
-            "questions_answered": attempt.questions_answered or 0,
-            "confidence_score": attempt.confidence_score or 0,
-            "courses": courses
-        })
-    
-    # Build HTML email content
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <style>
-            body {{ font-family: 'Segoe UI', Arial, sans-serif; background: #f0f4f8; margin: 0; padding: 20px; }}
-            .container {{ max-width: 650px; margin: 0 auto; background: #ffffff; border-radius: 16px; overflow: hidden; box-shadow: 0 4px 20px rgba(0,0,0,0.1); }}
-            .header {{ background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 50%, #a855f7 100%); padding: 40px 30px; text-align: center; }}
-            .header h1 {{ color: #ffffff; margin: 0; font-size: 28px; font-weight: 700; }}
-            .header p {{ color: rgba(255,255,255,0.9); margin: 10px 0 0 0; font-size: 14px; }}
-            .content {{ padding: 30px; }}
-            .greeting {{ font-size: 18px; color: #1e293b; margin-bottom: 20px; }}
-            .summary-box {{ background: linear-gradient(135deg, rgba(99, 102, 241, 0.1) 0%, rgba(139, 92, 246, 0.1) 100%); border-radius: 12px; padding: 20px; margin-bottom: 25px; text-align: center; }}
-            .summary-stat {{ display: inline-block; margin: 0 20px; }}
-            .summary-stat .value {{ font-size: 32px; font-weight: 700; color: #6366f1; display: block; }}
-            .summary-stat .label {{ font-size: 12px; color: #64748b; text-transform: uppercase; }}
-            .assessment {{ background: #f8fafc; border-radius: 12px; padding: 20px; margin-bottom: 20px; border-left: 4px solid #6366f1; }}
-            .assessment h3 {{ color: #1e293b; margin: 0 0 8px 0; font-size: 18px; }}
-            .assessment-meta {{ color: #64748b; font-size: 13px; margin-bottom: 15px; }}
-            .assessment-meta span {{ margin-right: 15px; }}
-            .course {{ background: #ffffff; border: 1px solid #e2e8f0; border-radius: 8px; padding: 15px; margin-top: 12px; }}
-            .course h4 {{ color: #6366f1; margin: 0 0 6px 0; font-size: 15px; }}
-            .course p {{ color: #64748b; margin: 0; font-size: 13px; line-height: 1.5; }}
-            .course .reasoning {{ margin-top: 8px; padding-top: 8px; border-top: 1px solid #e2e8f0; font-style: italic; color: #94a3b8; }}
-            .footer {{ background: #f8fafc; padding: 25px 30px; text-align: center; border-top: 1px solid #e2e8f0; }}
-            .footer p {{ color: #64748b; margin: 5px 0; font-size: 12px; }}
-            .no-courses {{ color: #94a3b8; font-style: italic; margin-top: 10px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📊 Daily Digest</h1>
-                <p>{today.strftime('%B %d, %Y')}</p>
-            </div>
-            <div class="content">
-                <p class="greeting">Hello <strong>{user.fullname}</strong>! 👋</p>
-                <p style="color: #64748b; margin-bottom: 25px;">Here's a summary of your assessment activity today:</p>
-                
-                <div class="summary-box">
-                    <div class="summary-stat">
-                        <span class="value">{len(today_attempts)}</span>
-                        <span class="label">Assessments</span>
-                    </div>
-                    <div class="summary-stat">
-                        <span class="value">{sum(item['questions_answered'] for item in digest_items)}</span>
-                        <span class="label">Questions</span>
-                    </div>
-                    <div class="summary-stat">
-                        <span class="value">{sum(len(item['courses']) for item in digest_items)}</span>
-                        <span class="label">Recommendations</span>
-                    </div>
-                </div>
-    """
-    
-    for idx, item in enumerate(digest_items, 1):
-        html_content += f"""
-                <div class="assessment">
-                    <h3>📋 {item['test_name']}</h3>
-                    <div class="assessment-meta">
-                        <span>🕐 {item['taken_at']}</span>
-                        <span>❓ {item['questions_answered']} questions</span>
-                        <span>📊 {round(item['confidence_score'])}% confidence</span>
-                    </div>
-                    <strong style="color: #1e293b; font-size: 14px;">Recommended Courses:</strong>
-        """
-        
-        if item['courses']:
-            for cidx, course in enumerate(item['courses'][:5], 1):  # Limit to top 5 courses
-                html_content += f"""
-                    <div class="course">
-                        <h4>#{cidx} {course['name']}</h4>
-                        <p>{course['description'] or ''}</p>
-                        {f'<p class="reasoning">{course["reasoning"]}</p>' if course.get('reasoning') else ''}
-                    </div>
-                """
-        else:
-            html_content += '<p class="no-courses">No course recommendations for this assessment.</p>'
-        
-        html_content += "</div>"
-    
-    html_content += f"""
-            </div>
-            <div class="footer">
-                <p><strong>CoursePro</strong> - Your AI-Powered Course Recommendation System</p>
-                <p>Generated on {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-                <p style="margin-top: 15px; color: #94a3b8;">Keep exploring and discovering your perfect career path! 🚀</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = render_digest(digest, today)
     
     # Check if email service is configured
-    resend_key = os.getenv("RESEND_API_KEY", "")
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    if not resend_key and (not smtp_user or not smtp_password or smtp_user == "your-email@gmail.com"):
-        raise HTTPException(status_code=500, detail="Email service is not configured. Please set RESEND_API_KEY or SMTP credentials.")
+    _require_email_service()
     
     try:
-        subject = f"📊 Your CoursePro Daily Digest - {today.strftime('%B %d, %Y')}"
-        send_email_html(user.email, subject, html_content)
+        job = email_queue.submit(user.email, digest_subject(today), html_content, kind="daily_digest")
         
         return {
             "success": True,
-            "message": f"Daily digest sent successfully to {user.email}",
-            "digest_count": len(today_attempts),
-            "email": user.email
+            "message": f"Daily digest queued for delivery to {user.email}",
+            "digest_count": len(digest.items),
+            "email": user.email,
+            "job_id": job.job_id,
+            "status": job.status
         }
     
-    except EmailDomainNotVerifiedError as e:
-        print(f"[DAILY-DIGEST] Domain not verified: {str(e)}")
-        raise HTTPException(
-            status_code=503,
-            detail="Email service is currently in testing mode and cannot send to external addresses. Please download your results as PDF instead."
-        )
     except Exception as e:
         print(f"[DAILY-DIGEST] Failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+
+
+class DailyDigestBatchRequest(BaseModel):
+    date: Optional[datetime.date] = None  # Defaults to today
+    dry_run: bool = False  # Write HTML files under DAILY_DIGEST_DRY_RUN_DIR instead of sending
+    force: bool = False  # Send even if this date's digest was already sent
+
+
+@app.post("/admin/daily-digest/run")
+def run_daily_digest_batch(data: DailyDigestBatchRequest, db: Session = Depends(get_db)):
+    """Admin: Build the digest for every user with assessments on a day and queue (or preview) them"""
+    day = data.date or datetime.datetime.now().date()
+    if not data.dry_run:
+        _require_email_service()
+        if not claim_digest_run(db, day) and not data.force:
+            raise HTTPException(status_code=409, detail=f"The digest for {day} was already sent. Set force to send it again.")
+    result = run_daily_digest(db, day=day, dry_run=data.dry_run)
+    result.pop("job_ids")  # Can be thousands; each job's status stays available via /email/jobs/{job_id}
+    return result
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, Integer, String, Text, Float, ForeignKey, DateTime, Numeric
+from sqlalchemy import JSON, Column, Integer, String, Text, Float, ForeignKey, DateTime, Date, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -109,6 +109,28 @@ class StudentAnswer(Base):
     attempt = relationship("TestAttempt", back_populates="student_answers")
 
 
+# ========== TRAIT DAILY ROLLUPS TABLE (materialized report) ==========
+class TraitDailyRollup(Base):
+    __tablename__ = "trait_daily_rollups"
+    rollup_id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)  # Day the answers were saved
+    strand = Column(String(50), nullable=False)  # Upper-case SHS strand, "UNSPECIFIED" if unknown
+    test_type = Column(String(50), nullable=False)  # tests.test_type ("adaptive", "assessment", ...)
+    trait_tag = Column(String(100), nullable=False)  # Trait of the chosen option when it was answered
+    answer_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "strand", "test_type", "trait_tag", name="uq_trait_daily_rollup"),
+    )
+
+
+# ========== DAILY DIGEST RUNS TABLE (one scheduled run per day) ==========
+class DailyDigestRun(Base):
+    __tablename__ = "daily_digest_runs"
+    run_date = Column(Date, primary_key=True)  # Day whose digests were sent
+    started_at = Column(DateTime, server_default=func.now())
+
+
 # ========== COURSES TABLE (D3 - Course Database) ==========
 class Course(Base):
     __tablename__ = "courses"
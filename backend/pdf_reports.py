@@ -0,0 +1,385 @@
+# pdf_reports.py
+"""
+PDF Recommendation Reports
+
+/export/pdf used to import reportlab and rebuild every ParagraphStyle inside
+the handler, then render the document on the request thread. PDF rendering
+is CPU-bound, so exports for a whole section stalled other requests.
+
+- render_report_pdf(payload): renders one ExportRequest-shaped dict to PDF
+  bytes. Styles and table styles are built once per process and reused
+- PDFReportCache: LRU of rendered PDFs keyed by a hash of the payload (plus
+  the report date, which is printed in the footer)
+- PDFRenderService: cache in front of a process pool (spawned workers, so
+  rendering does not hold the API process's GIL); render_many() yields
+  results in input order as they complete
+- stream_zip(): builds a ZIP incrementally, yielding chunks as each entry
+  is written, for batch exports; report_entries() turns a report that
+  failed to render into a text entry instead of truncating the archive
+
+Payload fields (same as ExportRequest): user_name, user_gwa, user_strand,
+detected_traits, recommendations (course_name, description, reasoning,
+minimum_gwa, recommended_strand).
+"""
+
+import datetime
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# ---------------- rendering ----------------
+
+_STYLES = None
+
+
+def _styles() -> dict:
+    """Paragraph / table styles, built on first use in each process."""
+    global _STYLES
+    if _STYLES is not None:
+        return _STYLES
+
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.platypus import TableStyle
+
+    sample = getSampleStyleSheet()
+    _STYLES = {
+        "title": ParagraphStyle(
+            'CustomTitle', parent=sample['Heading1'], fontSize=24,
+            textColor=colors.HexColor('#6366f1'), alignment=TA_CENTER, spaceAfter=20
+        ),
+        "subtitle": ParagraphStyle(
+            'CustomSubtitle', parent=sample['Normal'], fontSize=12,
+            textColor=colors.HexColor('#64748b'), alignment=TA_CENTER, spaceAfter=30
+        ),
+        "section": ParagraphStyle(
+            'SectionHeader', parent=sample['Heading2'], fontSize=14,
+            textColor=colors.HexColor('#1e293b'), spaceBefore=20, spaceAfter=10
+        ),
+        "course_title": ParagraphStyle(
+            'CourseTitle', parent=sample['Heading3'], fontSize=14,
+            textColor=colors.HexColor('#6366f1'), spaceBefore=15, spaceAfter=5
+        ),
+        "body": ParagraphStyle(
+            'CustomBody', parent=sample['Normal'], fontSize=10,
+            textColor=colors.HexColor('#334155'), spaceAfter=8, leading=14
+        ),
+        "footer": ParagraphStyle(
+            'Footer', parent=sample['Normal'], fontSize=9,
+            textColor=colors.HexColor('#94a3b8'), alignment=TA_CENTER, spaceBefore=15
+        ),
+        "profile_table": TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#64748b')),
+            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1e293b')),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]),
+        "rule_color": colors.HexColor('#e2e8f0'),
+    }
+    return _STYLES
+
+
+def render_report_pdf(payload: dict, report_date: Optional[datetime.date] = None) -> bytes:
+    """One student's recommendation report as PDF bytes."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, HRFlowable
+
+    styles = _styles()
+    report_date = report_date or datetime.date.today()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+
+    elements = []
+
+    # Header
+    elements.append(Paragraph("CoursePro", styles["title"]))
+    elements.append(Paragraph("Course Recommendation Report", styles["subtitle"]))
+
+    # User Info Section
+    elements.append(Paragraph("Student Profile", styles["section"]))
+    elements.append(HRFlowable(width="100%", thickness=1, color=styles["rule_color"]))
+    elements.append(Spacer(1, 10))
+
+    user_gwa = payload.get("user_gwa")
+    profile_data = [
+        ["Name:", payload.get("user_name") or "N/A"],
+        ["GWA:", str(user_gwa) if user_gwa else "N/A"],
+        ["Strand:", payload.get("user_strand") or "N/A"],
+    ]
+    profile_table = Table(profile_data, colWidths=[1.5*inch, 4*inch])
+    profile_table.setStyle(styles["profile_table"])
+    elements.append(profile_table)
+
+    # Detected Traits
+    detected_traits = payload.get("detected_traits")
+    if detected_traits:
+        elements.append(Spacer(1, 15))
+        traits_text = ", ".join([t[0] if isinstance(t, (list, tuple)) else str(t) for t in detected_traits[:5]])
+        elements.append(Paragraph(f"<b>Detected Traits:</b> {traits_text}", styles["body"]))
+
+    elements.append(Spacer(1, 20))
+
+    # Recommendations Section
+    elements.append(Paragraph("Recommended Courses", styles["section"]))
+    elements.append(HRFlowable(width="100%", thickness=1, color=styles["rule_color"]))
+
+    for idx, rec in enumerate(payload.get("recommendations") or [], 1):
+        course_name = rec.get('course_name', 'Unknown Course')
+        description = rec.get('description', '')
+        reasoning = rec.get('reasoning', '')
+
+        elements.append(Paragraph(f"#{idx} - {course_name}", styles["course_title"]))
+
+        if description:
+            elements.append(Paragraph(f"<b>Description:</b> {description}", styles["body"]))
+
+        if reasoning:
+            elements.append(Paragraph(f"<b>Why this fits you:</b> {reasoning}", styles["body"]))
+
+        # Course requirements
+        min_gwa = rec.get('minimum_gwa')
+        strand = rec.get('recommended_strand')
+        if min_gwa or strand:
+            req_text = []
+            if min_gwa:
+                req_text.append(f"Min GWA: {min_gwa}")
+            if strand:
+                req_text.append(f"Recommended Strand: {strand}")
+            elements.append(Paragraph(f"<b>Requirements:</b> {' | '.join(req_text)}", styles["body"]))
+
+        elements.append(Spacer(1, 10))
+
+    # Footer
+    elements.append(Spacer(1, 30))
+    elements.append(HRFlowable(width="100%", thickness=1, color=styles["rule_color"]))
+    elements.append(Paragraph(f"Generated by CoursePro - {report_date.strftime('%B %d, %Y')}", styles["footer"]))
+    elements.append(Paragraph("This report is based on your assessment responses and academic profile.", styles["footer"]))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def report_filename(user_name: Optional[str]) -> str:
+    return f"CoursePro_Recommendations_{(user_name or 'Student').replace(' ', '_')}.pdf"
+
+
+# ---------------- cache ----------------
+
+def payload_key(payload: dict, report_date: datetime.date) -> str:
+    encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{report_date.isoformat()}|{encoded}".encode("utf-8")).hexdigest()
+
+
+class PDFReportCache:
+    """LRU of rendered PDFs, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return pdf
+
+    def put(self, key: str, pdf: bytes):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = pdf
+            self._bytes += len(pdf)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+# ---------------- service ----------------
+
+class PDFRenderService:
+    """Cached PDF rendering on a process pool (workers=0 renders in the calling thread)."""
+
+    def __init__(self, cache: Optional[PDFReportCache] = None, workers: Optional[int] = None):
+        self.cache = cache or PDFReportCache()
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")  # Forking a threaded server is unsafe
+                )
+            return self._pool
+
+    def _reset_pool(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def render(self, payload: dict) -> bytes:
+        return next(self.render_many([payload]))
+
+    def render_many(self, payloads: Iterable[dict], return_exceptions: bool = False) -> Iterator[bytes]:
+        """
+        PDF bytes for each payload, in order; cache misses render in parallel.
+        With return_exceptions=True a payload that fails to render yields its
+        exception instead of ending the iteration.
+        """
+        report_date = datetime.date.today()
+        payloads = list(payloads)
+        keys = [payload_key(p, report_date) for p in payloads]
+        results: List[Optional[bytes]] = [self.cache.get(k) for k in keys]
+
+        pool = self._get_pool()
+        futures = {}
+        if pool is not None:
+            try:
+                for i, pdf in enumerate(results):
+                    if pdf is None and keys[i] not in futures:
+                        futures[keys[i]] = pool.submit(render_report_pdf, payloads[i], report_date)
+            except BrokenProcessPool:
+                self._reset_pool()
+                futures = {}
+
+        rendered = {}  # Same payload twice in one batch renders once
+        for i, key in enumerate(keys):
+            pdf = results[i] or rendered.get(key)
+            if pdf is None:
+                try:
+                    pdf = self._render_one(futures.get(key), payloads[i], report_date)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    print(f"[ERROR] PDF report {i + 1} of {len(keys)} failed to render: {e}")
+                    yield e
+                    continue
+                self.cache.put(key, pdf)
+                rendered[key] = pdf
+            yield pdf
+
+    def _render_one(self, future, payload: dict, report_date: datetime.date) -> bytes:
+        try:
+            return future.result() if future is not None else render_report_pdf(payload, report_date)
+        except BrokenProcessPool:
+            self._reset_pool()
+            return render_report_pdf(payload, report_date)
+
+    def metrics(self) -> dict:
+        return {"workers": self.workers, "cache": self.cache.metrics()}
+
+
+# ---------------- ZIP streaming ----------------
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable sink that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_names(names: Iterable[str]) -> List[str]:
+    """Suffix repeated file names (_2, _3, ...) so ZIP entries do not collide."""
+    seen = {}
+    used = set()
+    result = []
+    for name in names:
+        name = re.sub(r'[\\/:*?"<>|]', "_", name)
+        base = name
+        count = seen.get(base, 1)
+        while name in used:
+            # "A.pdf", "A.pdf", "A_2.pdf" must not give "A_2.pdf" twice
+            count += 1
+            stem, dot, ext = base.rpartition(".")
+            name = f"{stem}_{count}.{ext}" if dot else f"{base}_{count}"
+        seen[base] = count
+        used.add(name)
+        result.append(name)
+    return result
+
+
+def report_entries(names: Iterable[str], pdfs: Iterable) -> Iterator[Tuple[str, bytes]]:
+    """
+    (name, pdf) ZIP entries from render_many(..., return_exceptions=True). A
+    report that failed to render becomes a "<name>_ERROR.txt" entry: the ZIP
+    is already streaming, so raising would truncate it for everyone else.
+    """
+    for name, pdf in zip(names, pdfs):
+        if isinstance(pdf, Exception):
+            stem = name[:-4] if name.lower().endswith(".pdf") else name
+            yield f"{stem}_ERROR.txt", f"Could not generate {name}: {pdf}\n".encode("utf-8")
+        else:
+            yield name, pdf
+
+
+def stream_zip(entries: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """ZIP archive bytes, yielded entry by entry."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+# Shared instance (PDF_RENDER_WORKERS: process pool size, 0 renders in-thread; PDF_CACHE_ENTRIES: LRU size)
+pdf_service = PDFRenderService(
+    cache=PDFReportCache(max_entries=int(os.getenv("PDF_CACHE_ENTRIES", "256"))),
+    workers=int(os.getenv("PDF_RENDER_WORKERS")) if os.getenv("PDF_RENDER_WORKERS") else None
+)
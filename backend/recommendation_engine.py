@@ -17,16 +17,21 @@
 # 
 # ================================================================================
 
-from typing import List, Dict, Any, Optional, Tuple, Set
+from typing import List, Dict, Any, Optional, Tuple, Set, Callable
 from dataclasses import dataclass, field
 from enum import Enum
+from collections import OrderedDict
+import copy
 import json
+import os
+import threading
+import time
 
 # Import enhanced trait system for accurate matching
 from trait_system import (
-    calculate_trait_match_score,
+    calculate_catalog_match_scores,
+    CourseTraitMatrix,
     get_trait_similarity,
-    get_user_profile_from_traits,
     EXPANDED_TRAIT_MAPPING,
     TRAIT_CATEGORIES
 )
@@ -145,6 +150,41 @@ QUALITATIVE_KEYWORD_MAPPING = {
 }
 
 
+def parse_course_traits(course: Any) -> List[str]:
+    """Trait tags of a course (comma-separated `trait_tag` column) as a list"""
+    return [t.strip() for t in (course.trait_tag or "").split(",")]
+
+
+def qualitative_keywords(interests: str, skills: str) -> List[Tuple[str, List[str]]]:
+    """
+    (keyword, lower-cased related traits) for every QUALITATIVE_KEYWORD_MAPPING
+    keyword the user selected, in mapping order. Depends only on the user, so
+    it is computed once and reused for every course.
+    """
+    interest_list = [i.strip().lower() for i in (interests or "").split(",") if i.strip()]
+    skill_list = [s.strip().lower() for s in (skills or "").split(",") if s.strip()]
+    user_selections = set(interest_list + skill_list)
+    
+    return [
+        (keyword, [trait.lower() for trait in related_traits])
+        for keyword, related_traits in QUALITATIVE_KEYWORD_MAPPING.items()
+        if keyword.lower() in user_selections
+    ]
+
+
+def qualitative_bonus_for(keywords: List[Tuple[str, List[str]]], course_traits_lower: List[str]) -> Tuple[int, List[str]]:
+    """Bonus points and matched keywords for one course (traits already lower-cased and stripped)"""
+    matched_keywords = []
+    for keyword, related_traits in keywords:
+        # Any related trait overlapping any course trait counts the keyword once
+        if any(trait_lower in course_trait or course_trait in trait_lower
+               for trait_lower in related_traits for course_trait in course_traits_lower):
+            matched_keywords.append(keyword)
+    
+    # 5 points per keyword match, capped at 25 points
+    return min(len(matched_keywords) * 5, 25), matched_keywords
+
+
 def calculate_qualitative_bonus(interests: str, skills: str, course_traits: List[str]) -> Tuple[int, List[str]]:
     """
     Calculate bonus points based on keyword matches between user's interests/skills and course traits
@@ -155,35 +195,10 @@ def calculate_qualitative_bonus(interests: str, skills: str, course_traits: List
     if not interests and not skills:
         return 0, []
     
-    # Parse comma-separated interests and skills into lists
-    interest_list = [i.strip().lower() for i in (interests or "").split(",") if i.strip()]
-    skill_list = [s.strip().lower() for s in (skills or "").split(",") if s.strip()]
-    user_selections = set(interest_list + skill_list)
-    
-    # Normalize course traits for matching
-    course_traits_lower = [t.lower().strip() for t in course_traits]
-    
-    matched_keywords = []
-    bonus_points = 0
-    
-    for keyword, related_traits in QUALITATIVE_KEYWORD_MAPPING.items():
-        keyword_lower = keyword.lower()
-        # Check if user selected this exact interest/skill
-        if keyword_lower in user_selections:
-            # Check if any related trait matches course traits
-            for trait in related_traits:
-                trait_lower = trait.lower()
-                for course_trait in course_traits_lower:
-                    if trait_lower in course_trait or course_trait in trait_lower:
-                        if keyword not in matched_keywords:
-                            matched_keywords.append(keyword)
-                            bonus_points += 5  # 5 points per keyword match
-                        break
-    
-    # Cap bonus at 25 points
-    bonus_points = min(bonus_points, 25)
-    
-    return bonus_points, matched_keywords
+    return qualitative_bonus_for(
+        qualitative_keywords(interests, skills),
+        [t.lower().strip() for t in course_traits]
+    )
 
 
 # ================================================================================
@@ -245,6 +260,127 @@ class FilteredCourse:
     boost_total: int = 0
 
 
+@dataclass
+class CourseFeatures:
+    """Per-course values the rules read, computed once per course instead of per rule x user"""
+    course: Any
+    traits: List[str]
+    trait_set: Set[str]
+    traits_lower: List[str]
+    min_gwa: float  # 0 when the course has no requirement
+    strand: str
+    name: str
+
+
+@dataclass
+class UserRuleInputs:
+    """Per-user values the rules read, bound into the compiled rules once per user"""
+    gwa: Optional[float]
+    strand: Optional[str]
+    primary_trait: Optional[str]
+    career_path_courses: Set[str]
+    work_environments: Set[str]
+    learning_styles: Set[str]
+    interests: str
+    skills: str
+
+
+class CourseCatalogIndex:
+    """
+    The user-independent side of scoring one course list: rule features per
+    course and the course x trait matrix for catalog-level trait matching.
+    
+    Trait match results are memoized per user trait list (bounded), so an
+    index shared across a batch matches each distinct trait list once.
+    """
+    
+    MAX_MEMOIZED_TRAIT_LISTS = 1024
+    
+    def __init__(self, features: List[CourseFeatures]):
+        self.features = features
+        self.matrix = CourseTraitMatrix([f.traits for f in features])
+        self._position = {id(f.course): i for i, f in enumerate(features)}
+        self._matches: Dict[Tuple[str, ...], List[Tuple[float, List[str], Dict]]] = {}
+        self._lock = threading.Lock()
+    
+    def match_all(self, user_traits: List[str]) -> List[Tuple[float, List[str], Dict]]:
+        """calculate_trait_match_score for every course (shared results - do not mutate)"""
+        key = tuple(user_traits)
+        results = self._matches.get(key)
+        if results is None:
+            results = calculate_catalog_match_scores(user_traits, self.matrix)
+            with self._lock:
+                if len(self._matches) >= self.MAX_MEMOIZED_TRAIT_LISTS:
+                    self._matches.pop(next(iter(self._matches)))
+                self._matches[key] = results
+        return results
+    
+    def features_for(self, course: Any) -> CourseFeatures:
+        return self.features[self._position[id(course)]]
+    
+    def match(self, user_traits: List[str], course: Any) -> Tuple[float, List[str], Dict]:
+        return self.match_all(user_traits)[self._position[id(course)]]
+    
+    @property
+    def memoized_trait_lists(self) -> int:
+        return len(self._matches)
+
+
+# A compiled rule: (course features, matched traits, match details) -> (passed, action_taken, points, explanation)
+CompiledRule = Callable[[CourseFeatures, List[str], Dict], Tuple[bool, str, int, str]]
+
+# A2 strand bonus: full bonus for the same strand, half for compatible strands
+BEST_STRANDS = {
+    'STEM': ['STEM'],
+    'ABM': ['ABM'],
+    'HUMSS': ['HUMSS'],
+    'GAS': ['GAS'],
+    'TVL': ['TVL'],
+    'Sports': ['Sports'],
+}
+COMPATIBLE_STRANDS = {
+    'STEM': ['GAS', 'TVL'],
+    'ABM': ['GAS', 'HUMSS'],
+    'HUMSS': ['GAS', 'ABM'],
+    'GAS': ['STEM', 'ABM', 'HUMSS', 'TVL', 'Sports'],
+    'TVL': ['GAS', 'STEM'],
+    'Sports': ['GAS', 'HUMSS'],
+}
+
+# P6: course traits that signal each work environment
+WORK_ENVIRONMENT_COURSE_TRAITS = {
+    'office': ['Office-based', 'Remote-friendly'],
+    'field': ['Field-work', 'Outdoor-enthusiast'],
+    'clinical': ['Clinical-setting', 'Patient-focused'],
+    'laboratory': ['Laboratory', 'Research-oriented'],
+    'studio': ['Studio-work', 'Creative-expression'],
+}
+
+# P7: course traits that signal each learning style
+LEARNING_STYLE_COURSE_TRAITS = {
+    'visual': ['Visual-learner', 'Aesthetic-sense', 'Digital-art'],
+    'hands_on': ['Hands-on', 'Practical', 'Field-work'],
+    'theoretical': ['Theoretical', 'Research-oriented', 'Abstract-thinking'],
+    'social': ['Collaborative', 'Team-centric', 'Extroverted'],
+    'independent': ['Independent', 'Introverted', 'Self-directed'],
+}
+
+# Retired checks kept so older rule definitions still evaluate (always skipped)
+DEPRECATED_CHECKS = {
+    "gwa_requirement": "GWA is now a bonus factor only",
+    "strand_alignment": "Strand is now a bonus factor only",
+    "gwa_excellence": "GWA excellence now handled by GWA Academic Bonus rule",
+    "strand_perfect_match": "Strand matching now handled by Strand Alignment Bonus rule",
+    "gwa_shortfall": "GWA shortfall now handled by GWA Academic Bonus rule",
+    "strand_mismatch": "Strand mismatch removed - all courses available regardless of strand",
+}
+
+
+def _constant(result: Tuple[bool, str, int, str]) -> CompiledRule:
+    """Compiled rule whose outcome does not depend on the course"""
+    return lambda features, matched_traits, match_details: result
+
+
 class RuleBasedFilter:
     """
     PHASE 1: Rule-Based Filtering System
@@ -261,6 +397,18 @@ class RuleBasedFilter:
     def __init__(self):
         self.rules: List[Rule] = []
         self._initialize_rules()
+        self._rule_compilers = {
+            "gwa_bonus": self._compile_gwa_bonus,
+            "strand_bonus": self._compile_strand_bonus,
+            "primary_trait_match": self._compile_primary_trait_match,
+            "trait_synergy": self._compile_trait_synergy,
+            "career_path_match": self._compile_career_path_match,
+            "work_environment_match": self._compile_work_environment_match,
+            "learning_style_match": self._compile_learning_style_match,
+            "no_trait_match": self._compile_no_trait_match,
+            "qualitative_bonus": self._compile_qualitative_bonus,
+        }
+        self._course_features: Dict[int, CourseFeatures] = {}
     
     def _initialize_rules(self):
         """Initialize the rule base with predefined IF-THEN rules"""
@@ -388,6 +536,49 @@ class RuleBasedFilter:
         # Sort rules by priority (higher priority first)
         self.rules.sort(key=lambda r: r.priority, reverse=True)
     
+    # ==================== COMPILED RULES ====================
+    # Each rule is compiled once per user into a closure over that user's
+    # inputs; the closure then runs against precomputed CourseFeatures for
+    # every course, so nothing is re-parsed or re-dispatched per rule x course.
+    
+    def course_features(self, courses: List[Any]) -> List[CourseFeatures]:
+        """Feature rows for `courses` (cached per course object)"""
+        cache = self._course_features
+        if len(cache) > 4 * max(len(courses), 256):
+            cache.clear()  # Catalog was reloaded; drop rows for the old course objects
+        rows = []
+        for course in courses:
+            features = cache.get(id(course))
+            if features is None or features.course is not course:
+                traits = parse_course_traits(course)
+                features = cache[id(course)] = CourseFeatures(
+                    course=course,
+                    traits=traits,
+                    trait_set=set(traits),
+                    traits_lower=[t.lower().strip() for t in traits],
+                    min_gwa=float(course.minimum_gwa) if course.minimum_gwa else 0,
+                    strand=course.required_strand or "",
+                    name=course.course_name
+                )
+            rows.append(features)
+        return rows
+    
+    def catalog_index(self, courses: List[Any]) -> CourseCatalogIndex:
+        return CourseCatalogIndex(self.course_features(courses))
+    
+    def compile_rules(self, user: UserRuleInputs) -> List[Tuple[Rule, CompiledRule]]:
+        """The rule base (in priority order) bound to one user's inputs"""
+        return [(rule, self._compile_rule(rule, user)) for rule in self.rules]
+    
+    def _compile_rule(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        check_type = rule.conditions.get("check")
+        compiler = self._rule_compilers.get(check_type)
+        if compiler is not None:
+            return compiler(rule, user)
+        if check_type in DEPRECATED_CHECKS:
+            return _constant((True, "skipped", 0, DEPRECATED_CHECKS[check_type]))
+        return _constant((True, "unknown_rule", 0, f"Unknown rule check: {check_type}"))
+    
     def evaluate_rule(self, rule: Rule, context: Dict[str, Any]) -> RuleEvaluationResult:
         """
         Evaluate a single rule against the given context
@@ -399,304 +590,20 @@ class RuleBasedFilter:
         Returns:
             RuleEvaluationResult with pass/fail status and explanation
         """
-        check_type = rule.conditions.get("check")
-        
-        # Extract context data
-        user_gwa = context.get("user_gwa")
-        user_strand = context.get("user_strand")
-        course = context.get("course")
-        user_traits = context.get("user_traits", [])
-        primary_trait = context.get("primary_trait")
-        career_path_courses = context.get("career_path_courses", [])
-        user_work_env = context.get("user_work_environment", set())
-        user_learning_style = context.get("user_learning_style", set())
-        matched_traits = context.get("matched_traits", [])
-        
-        course_min_gwa = float(course.minimum_gwa) if course.minimum_gwa else 0
-        course_strand = course.required_strand or ""
-        course_traits = [t.strip() for t in (course.trait_tag or "").split(",")]
-        
-        passed = True
-        action_taken = "none"
-        points = 0
-        explanation = ""
-        
-        # ==================== RULE EVALUATION LOGIC ====================
-        
-        if check_type == "gwa_bonus":
-            # A1: GWA Bonus/Penalty (SOFT CONSTRAINT - NEVER MARKS INELIGIBLE)
-            # All courses remain eligible regardless of GWA
-            if user_gwa is not None and course_min_gwa > 0:
-                if user_gwa >= course_min_gwa:
-                    # User meets or exceeds requirement - give bonus
-                    passed = True
-                    action_taken = "boost_applied"
-                    points = rule.boost_points
-                    explanation = f"GWA Bonus: Your GWA ({user_gwa}) meets the course requirement ({course_min_gwa}) +{points} points"
-                else:
-                    # User below requirement - apply small penalty but STILL ELIGIBLE
-                    gap = course_min_gwa - user_gwa
-                    passed = True  # ALWAYS ELIGIBLE
-                    action_taken = "penalty_applied"
-                    points = -min(int(gap * rule.penalty_points), 15)  # Cap penalty at -15 points
-                    explanation = f"GWA Note: Your GWA ({user_gwa}) is below requirement ({course_min_gwa}), but you can still pursue this course with extra effort. ({points} points)"
-            else:
-                passed = True
-                action_taken = "skipped"
-                explanation = "GWA check skipped (no requirement or user data)"
-        
-        elif check_type == "strand_bonus":
-            # A2: Strand Alignment Bonus (SOFT CONSTRAINT - NEVER MARKS INELIGIBLE)
-            # All courses remain eligible regardless of strand
-            if user_strand and course_strand:
-                # Define strand compatibility matrix for BONUS only (not restriction)
-                best_strands = {
-                    'STEM': ['STEM'],
-                    'ABM': ['ABM'],
-                    'HUMSS': ['HUMSS'],
-                    'GAS': ['GAS'],
-                    'TVL': ['TVL'],
-                    'Sports': ['Sports'],
-                }
-                compatible_strands = {
-                    'STEM': ['GAS', 'TVL'],
-                    'ABM': ['GAS', 'HUMSS'],
-                    'HUMSS': ['GAS', 'ABM'],
-                    'GAS': ['STEM', 'ABM', 'HUMSS', 'TVL', 'Sports'],
-                    'TVL': ['GAS', 'STEM'],
-                    'Sports': ['GAS', 'HUMSS'],
-                }
-                
-                user_best = best_strands.get(user_strand, [user_strand])
-                user_compatible = compatible_strands.get(user_strand, [])
-                
-                if course_strand in user_best or user_strand == course_strand:
-                    # Perfect match - give full bonus
-                    passed = True
-                    action_taken = "boost_applied"
-                    points = rule.boost_points
-                    explanation = f"Strand Bonus: Your strand ({user_strand}) perfectly matches the course +{points} points"
-                elif course_strand in user_compatible:
-                    # Compatible - give partial bonus
-                    passed = True
-                    action_taken = "boost_applied"
-                    points = rule.boost_points // 2
-                    explanation = f"Strand Bonus: Your strand ({user_strand}) is compatible with {course_strand} courses +{points} points"
-                else:
-                    # Different strand - NO PENALTY, just no bonus
-                    # User can still take ANY course regardless of strand!
-                    passed = True
-                    action_taken = "no_penalty"
-                    points = 0
-                    explanation = f"Your strand ({user_strand}) differs from {course_strand}, but you can still pursue this course based on your interests!"
-            else:
-                passed = True
-                action_taken = "skipped"
-                explanation = "Strand check skipped (no requirement or user data)"
-        
-        elif check_type == "gwa_requirement":
-            # DEPRECATED - Redirect to gwa_bonus for backward compatibility
-            passed = True
-            action_taken = "skipped"
-            explanation = "GWA is now a bonus factor only"
-        
-        elif check_type == "strand_alignment":
-            # DEPRECATED - Redirect to strand_bonus for backward compatibility
-            passed = True
-            action_taken = "skipped"
-            explanation = "Strand is now a bonus factor only"
-        
-        elif check_type == "primary_trait_match":
-            # P1: Check if primary trait matches (now with similarity matching)
-            if primary_trait:
-                # Check for exact match first
-                if primary_trait in course_traits:
-                    passed = True
-                    action_taken = "boost_applied"
-                    points = rule.boost_points
-                    explanation = f"Primary trait '{primary_trait}' matches course requirements"
-                else:
-                    # Check for similar trait match using enhanced system
-                    best_similarity = 0.0
-                    best_match = None
-                    for c_trait in course_traits:
-                        similarity = get_trait_similarity(primary_trait, c_trait)
-                        if similarity > best_similarity:
-                            best_similarity = similarity
-                            best_match = c_trait
-                    
-                    if best_similarity >= 0.7:  # Strong similarity threshold
-                        passed = True
-                        action_taken = "boost_applied"
-                        points = int(rule.boost_points * best_similarity)  # Partial boost
-                        explanation = f"Primary trait '{primary_trait}' is similar to course trait '{best_match}' ({int(best_similarity*100)}% match)"
-                    elif best_similarity >= 0.5:  # Moderate similarity
-                        passed = True
-                        action_taken = "boost_applied"
-                        points = int(rule.boost_points * 0.5)  # Half boost
-                        explanation = f"Primary trait '{primary_trait}' has moderate alignment with '{best_match}'"
-                    else:
-                        passed = True
-                        action_taken = "no_boost"
-                        explanation = f"Primary trait '{primary_trait}' not strongly aligned with course traits"
-            else:
-                passed = True
-                action_taken = "no_boost"
-                explanation = "No primary trait identified"
-        
-        elif check_type == "trait_synergy":
-            # P2: Check for multiple trait matches (using enhanced matching)
-            min_matches = rule.conditions.get("min_matches", 3)
-            # Count includes exact + similar matches
-            match_details = context.get("match_details", {})
-            exact_count = len(match_details.get("exact", []))
-            similar_count = len(match_details.get("similar", []))
-            total_meaningful_matches = exact_count + (similar_count * 0.5)  # Similar matches count as half
-            
-            if total_meaningful_matches >= min_matches:
-                passed = True
-                action_taken = "boost_applied"
-                points = rule.boost_points
-                explanation = f"Trait synergy: {exact_count} exact + {similar_count} similar matches ({', '.join(matched_traits[:3])}...)"
-            else:
-                passed = True
-                action_taken = "no_boost"
-                explanation = f"Trait synergy not met: {exact_count} exact + {similar_count} similar (need {min_matches} total)"
-        
-        elif check_type == "career_path_match":
-            # P3: Check if course is in user's career path preference
-            if course.course_name in career_path_courses:
-                passed = True
-                action_taken = "boost_applied"
-                points = rule.boost_points
-                explanation = f"Course matches user's stated career path preference"
-            else:
-                passed = True
-                action_taken = "no_boost"
-                explanation = "Course not in user's career path preferences"
-        
-        elif check_type == "gwa_excellence":
-            # DEPRECATED - GWA bonus handled by A1 rule now
-            passed = True
-            action_taken = "skipped"
-            explanation = "GWA excellence now handled by GWA Academic Bonus rule"
-        
-        elif check_type == "strand_perfect_match":
-            # DEPRECATED - Strand bonus handled by A2 rule now
-            passed = True
-            action_taken = "skipped"
-            explanation = "Strand matching now handled by Strand Alignment Bonus rule"
-        
-        elif check_type == "work_environment_match":
-            # P6: Work environment preference
-            work_env_traits = {
-                'office': ['Office-based', 'Remote-friendly'],
-                'field': ['Field-work', 'Outdoor-enthusiast'],
-                'clinical': ['Clinical-setting', 'Patient-focused'],
-                'laboratory': ['Laboratory', 'Research-oriented'],
-                'studio': ['Studio-work', 'Creative-expression'],
-            }
-            
-            env_match = False
-            for env in user_work_env:
-                env_traits = work_env_traits.get(env, [])
-                if any(t in course_traits for t in env_traits):
-                    env_match = True
-                    break
-            
-            if env_match:
-                passed = True
-                action_taken = "boost_applied"
-                points = rule.boost_points
-                explanation = "Work environment preference matches course setting"
-            else:
-                passed = True
-                action_taken = "no_boost"
-                explanation = "Work environment preference not matched"
-        
-        elif check_type == "learning_style_match":
-            # P7: Learning style compatibility
-            learning_traits = {
-                'visual': ['Visual-learner', 'Aesthetic-sense', 'Digital-art'],
-                'hands_on': ['Hands-on', 'Practical', 'Field-work'],
-                'theoretical': ['Theoretical', 'Research-oriented', 'Abstract-thinking'],
-                'social': ['Collaborative', 'Team-centric', 'Extroverted'],
-                'independent': ['Independent', 'Introverted', 'Self-directed'],
-            }
-            
-            style_match = False
-            for style in user_learning_style:
-                style_traits = learning_traits.get(style, [])
-                if any(t in course_traits for t in style_traits):
-                    style_match = True
-                    break
-            
-            if style_match:
-                passed = True
-                action_taken = "boost_applied"
-                points = rule.boost_points
-                explanation = "Learning style compatible with course teaching approach"
-            else:
-                passed = True
-                action_taken = "no_boost"
-                explanation = "Learning style preference not matched"
-        
-        elif check_type == "gwa_shortfall":
-            # DEPRECATED - GWA penalty now handled by A1 rule
-            passed = True
-            action_taken = "skipped"
-            explanation = "GWA shortfall now handled by GWA Academic Bonus rule"
-        
-        elif check_type == "strand_mismatch":
-            # DEPRECATED - No strand penalties anymore - all courses available
-            passed = True
-            action_taken = "skipped"
-            explanation = "Strand mismatch removed - all courses available regardless of strand"
-        
-        elif check_type == "no_trait_match":
-            # N3: Penalty for no trait matches
-            if len(matched_traits) == 0:
-                passed = True
-                action_taken = "penalty_applied"
-                points = -rule.penalty_points
-                explanation = f"No trait match penalty: -{rule.penalty_points} points"
-            else:
-                passed = True
-                action_taken = "no_penalty"
-                explanation = f"Has {len(matched_traits)} trait matches"
-        
-        elif check_type == "qualitative_bonus":
-            # P8: Qualitative interests/skills bonus
-            user_interests = context.get("user_interests", "")
-            user_skills = context.get("user_skills", "")
-            
-            if user_interests or user_skills:
-                bonus_points, matched_keywords = calculate_qualitative_bonus(
-                    user_interests, user_skills, course_traits
-                )
-                
-                if bonus_points > 0:
-                    passed = True
-                    action_taken = "boost_applied"
-                    points = bonus_points
-                    keywords_str = ", ".join(matched_keywords[:3])
-                    if len(matched_keywords) > 3:
-                        keywords_str += f" +{len(matched_keywords) - 3} more"
-                    explanation = f"Interests/skills bonus: Keywords '{keywords_str}' match course +{bonus_points} points"
-                else:
-                    passed = True
-                    action_taken = "no_boost"
-                    explanation = "No keyword matches found between your interests/skills and this course"
-            else:
-                passed = True
-                action_taken = "skipped"
-                explanation = "No interests/skills provided in profile"
-        
-        else:
-            passed = True
-            action_taken = "unknown_rule"
-            explanation = f"Unknown rule check: {check_type}"
-        
+        user = UserRuleInputs(
+            gwa=context.get("user_gwa"),
+            strand=context.get("user_strand"),
+            primary_trait=context.get("primary_trait"),
+            career_path_courses=set(context.get("career_path_courses", [])),
+            work_environments=set(context.get("user_work_environment", set())),
+            learning_styles=set(context.get("user_learning_style", set())),
+            interests=context.get("user_interests", ""),
+            skills=context.get("user_skills", "")
+        )
+        features = self.course_features([context.get("course")])[0]
+        passed, action_taken, points, explanation = self._compile_rule(rule, user)(
+            features, context.get("matched_traits", []), context.get("match_details", {})
+        )
         return RuleEvaluationResult(
             rule_id=rule.rule_id,
             rule_name=rule.rule_name,
@@ -706,12 +613,175 @@ class RuleBasedFilter:
             points_applied=points
         )
     
+    def _compile_gwa_bonus(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # A1: GWA Bonus/Penalty (SOFT CONSTRAINT - NEVER MARKS INELIGIBLE)
+        # All courses remain eligible regardless of GWA
+        user_gwa = user.gwa
+        skipped = (True, "skipped", 0, "GWA check skipped (no requirement or user data)")
+        if user_gwa is None:
+            return _constant(skipped)
+        
+        def check(features, matched_traits, match_details):
+            course_min_gwa = features.min_gwa
+            if course_min_gwa <= 0:
+                return skipped
+            if user_gwa >= course_min_gwa:
+                # User meets or exceeds requirement - give bonus
+                points = rule.boost_points
+                return True, "boost_applied", points, f"GWA Bonus: Your GWA ({user_gwa}) meets the course requirement ({course_min_gwa}) +{points} points"
+            # User below requirement - apply small penalty but STILL ELIGIBLE
+            gap = course_min_gwa - user_gwa
+            points = -min(int(gap * rule.penalty_points), 15)  # Cap penalty at -15 points
+            return True, "penalty_applied", points, f"GWA Note: Your GWA ({user_gwa}) is below requirement ({course_min_gwa}), but you can still pursue this course with extra effort. ({points} points)"
+        return check
+    
+    def _compile_strand_bonus(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # A2: Strand Alignment Bonus (SOFT CONSTRAINT - NEVER MARKS INELIGIBLE)
+        # All courses remain eligible regardless of strand
+        user_strand = user.strand
+        skipped = (True, "skipped", 0, "Strand check skipped (no requirement or user data)")
+        if not user_strand:
+            return _constant(skipped)
+        
+        user_best = set(BEST_STRANDS.get(user_strand, [user_strand])) | {user_strand}
+        user_compatible = set(COMPATIBLE_STRANDS.get(user_strand, []))
+        full = (True, "boost_applied", rule.boost_points,
+                f"Strand Bonus: Your strand ({user_strand}) perfectly matches the course +{rule.boost_points} points")
+        
+        def check(features, matched_traits, match_details):
+            course_strand = features.strand
+            if not course_strand:
+                return skipped
+            if course_strand in user_best:
+                # Perfect match - give full bonus
+                return full
+            if course_strand in user_compatible:
+                # Compatible - give partial bonus
+                points = rule.boost_points // 2
+                return True, "boost_applied", points, f"Strand Bonus: Your strand ({user_strand}) is compatible with {course_strand} courses +{points} points"
+            # Different strand - NO PENALTY, just no bonus
+            # User can still take ANY course regardless of strand!
+            return True, "no_penalty", 0, f"Your strand ({user_strand}) differs from {course_strand}, but you can still pursue this course based on your interests!"
+        return check
+    
+    def _compile_primary_trait_match(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # P1: Check if primary trait matches (now with similarity matching)
+        primary_trait = user.primary_trait
+        if not primary_trait:
+            return _constant((True, "no_boost", 0, "No primary trait identified"))
+        
+        exact = (True, "boost_applied", rule.boost_points, f"Primary trait '{primary_trait}' matches course requirements")
+        
+        def check(features, matched_traits, match_details):
+            # Check for exact match first
+            if primary_trait in features.trait_set:
+                return exact
+            # Check for similar trait match using enhanced system
+            best_similarity = 0.0
+            best_match = None
+            for c_trait in features.traits:
+                similarity = get_trait_similarity(primary_trait, c_trait)
+                if similarity > best_similarity:
+                    best_similarity = similarity
+                    best_match = c_trait
+            
+            if best_similarity >= 0.7:  # Strong similarity threshold
+                points = int(rule.boost_points * best_similarity)  # Partial boost
+                return True, "boost_applied", points, f"Primary trait '{primary_trait}' is similar to course trait '{best_match}' ({int(best_similarity*100)}% match)"
+            if best_similarity >= 0.5:  # Moderate similarity
+                points = int(rule.boost_points * 0.5)  # Half boost
+                return True, "boost_applied", points, f"Primary trait '{primary_trait}' has moderate alignment with '{best_match}'"
+            return True, "no_boost", 0, f"Primary trait '{primary_trait}' not strongly aligned with course traits"
+        return check
+    
+    def _compile_trait_synergy(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # P2: Check for multiple trait matches (using enhanced matching)
+        min_matches = rule.conditions.get("min_matches", 3)
+        
+        def check(features, matched_traits, match_details):
+            # Count includes exact + similar matches
+            exact_count = len(match_details.get("exact", []))
+            similar_count = len(match_details.get("similar", []))
+            total_meaningful_matches = exact_count + (similar_count * 0.5)  # Similar matches count as half
+            
+            if total_meaningful_matches >= min_matches:
+                return True, "boost_applied", rule.boost_points, f"Trait synergy: {exact_count} exact + {similar_count} similar matches ({', '.join(matched_traits[:3])}...)"
+            return True, "no_boost", 0, f"Trait synergy not met: {exact_count} exact + {similar_count} similar (need {min_matches} total)"
+        return check
+    
+    def _compile_career_path_match(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # P3: Check if course is in user's career path preference
+        career_path_courses = user.career_path_courses
+        matched = (True, "boost_applied", rule.boost_points, "Course matches user's stated career path preference")
+        not_matched = (True, "no_boost", 0, "Course not in user's career path preferences")
+        if not career_path_courses:
+            return _constant(not_matched)
+        return lambda features, matched_traits, match_details: (
+            matched if features.name in career_path_courses else not_matched
+        )
+    
+    def _compile_course_trait_overlap(self, wanted_traits: Set[str], matched: Tuple, not_matched: Tuple) -> CompiledRule:
+        if not wanted_traits:
+            return _constant(not_matched)
+        return lambda features, matched_traits, match_details: (
+            not_matched if wanted_traits.isdisjoint(features.trait_set) else matched
+        )
+    
+    def _compile_work_environment_match(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # P6: Work environment preference
+        wanted = {t for env in user.work_environments for t in WORK_ENVIRONMENT_COURSE_TRAITS.get(env, [])}
+        return self._compile_course_trait_overlap(
+            wanted,
+            (True, "boost_applied", rule.boost_points, "Work environment preference matches course setting"),
+            (True, "no_boost", 0, "Work environment preference not matched")
+        )
+    
+    def _compile_learning_style_match(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # P7: Learning style compatibility
+        wanted = {t for style in user.learning_styles for t in LEARNING_STYLE_COURSE_TRAITS.get(style, [])}
+        return self._compile_course_trait_overlap(
+            wanted,
+            (True, "boost_applied", rule.boost_points, "Learning style compatible with course teaching approach"),
+            (True, "no_boost", 0, "Learning style preference not matched")
+        )
+    
+    def _compile_no_trait_match(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # N3: Penalty for no trait matches
+        penalty = (True, "penalty_applied", -rule.penalty_points, f"No trait match penalty: -{rule.penalty_points} points")
+        
+        def check(features, matched_traits, match_details):
+            if len(matched_traits) == 0:
+                return penalty
+            return True, "no_penalty", 0, f"Has {len(matched_traits)} trait matches"
+        return check
+    
+    def _compile_qualitative_bonus(self, rule: Rule, user: UserRuleInputs) -> CompiledRule:
+        # P8: Qualitative interests/skills bonus
+        if not user.interests and not user.skills:
+            return _constant((True, "skipped", 0, "No interests/skills provided in profile"))
+        
+        keywords = qualitative_keywords(user.interests, user.skills)
+        no_match = (True, "no_boost", 0, "No keyword matches found between your interests/skills and this course")
+        if not keywords:
+            return _constant(no_match)
+        
+        def check(features, matched_traits, match_details):
+            bonus_points, matched_keywords = qualitative_bonus_for(keywords, features.traits_lower)
+            if bonus_points <= 0:
+                return no_match
+            keywords_str = ", ".join(matched_keywords[:3])
+            if len(matched_keywords) > 3:
+                keywords_str += f" +{len(matched_keywords) - 3} more"
+            return True, "boost_applied", bonus_points, f"Interests/skills bonus: Keywords '{keywords_str}' match course +{bonus_points} points"
+        return check
+    
     def filter_courses(
         self,
         courses: List[Any],
         user_profile: Dict[str, Any],
         trait_scores: Dict[str, float],
-        career_path_courses: List[str] = None
+        career_path_courses: List[str] = None,
+        catalog: Optional[CourseCatalogIndex] = None
     ) -> List[FilteredCourse]:
         """
         PHASE 1: Apply rule-based filtering to all courses
@@ -726,58 +796,37 @@ class RuleBasedFilter:
             user_profile: Dictionary with user's academic info (gwa, strand, etc.)
             trait_scores: Dictionary of trait -> score from assessment
             career_path_courses: List of course names from career path selections
+            catalog: catalog_index(courses), when the caller already has one
         
         Returns:
             List of FilteredCourse objects that passed filtering
         """
         filtered_courses = []
         
-        # Prepare user context
-        user_gwa = user_profile.get("gwa")
-        user_strand = user_profile.get("strand")
-        user_interests = user_profile.get("interests", "")
-        user_skills = user_profile.get("skills", "")
-        
         # Get top traits for matching - use more traits for better matching
         sorted_traits = sorted(trait_scores.items(), key=lambda x: x[1], reverse=True)
         top_traits = [t for t, _ in sorted_traits[:10]]  # Increased from 7 to 10
-        primary_trait = sorted_traits[0][0] if sorted_traits else None
-        secondary_trait = sorted_traits[1][0] if len(sorted_traits) > 1 else None
         
-        # Determine user's learning style and work environment preferences from traits
-        user_learning_style = self._determine_learning_style(top_traits)
-        user_work_env = self._determine_work_environment(top_traits)
+        # Bind the rule base to this user once
+        compiled_rules = self.compile_rules(UserRuleInputs(
+            gwa=user_profile.get("gwa"),
+            strand=user_profile.get("strand"),
+            primary_trait=sorted_traits[0][0] if sorted_traits else None,
+            career_path_courses=set(career_path_courses or []),
+            # User's learning style and work environment preferences from traits
+            work_environments=self._determine_work_environment(top_traits),
+            learning_styles=self._determine_learning_style(top_traits),
+            interests=user_profile.get("interests", ""),
+            skills=user_profile.get("skills", "")
+        ))
         
-        # Get user profile analysis for better matching
-        user_profile_analysis = get_user_profile_from_traits(trait_scores)
+        if catalog is None:
+            catalog = self.catalog_index(courses)
         
-        for course in courses:
-            # Calculate matched traits using ENHANCED trait matching
-            course_traits = [t.strip() for t in (course.trait_tag or "").split(",")]
-            
-            # Use enhanced trait matching with similarity scores
-            trait_match_score, matched_traits, match_details = calculate_trait_match_score(
-                top_traits, course_traits
-            )
-            
-            # Build context for rule evaluation
-            context = {
-                "user_gwa": user_gwa,
-                "user_strand": user_strand,
-                "user_interests": user_interests,
-                "user_skills": user_skills,
-                "course": course,
-                "user_traits": top_traits,
-                "primary_trait": primary_trait,
-                "secondary_trait": secondary_trait,
-                "career_path_courses": career_path_courses or [],
-                "user_work_environment": user_work_env,
-                "user_learning_style": user_learning_style,
-                "matched_traits": matched_traits,
-                "trait_match_score": trait_match_score,  # Enhanced score
-                "match_details": match_details,  # Detailed breakdown
-                "user_profile_analysis": user_profile_analysis,  # User's trait categories
-            }
+        # Use enhanced trait matching with similarity scores (whole catalog at once)
+        trait_matches = catalog.match_all(top_traits)
+        
+        for features, (trait_match_score, matched_traits, match_details) in zip(catalog.features, trait_matches):
             
             # Evaluate all rules
             passed_rules = []
@@ -788,35 +837,35 @@ class RuleBasedFilter:
             total_penalty = 0
             is_eligible = True
             
-            for rule in self.rules:
-                result = self.evaluate_rule(rule, context)
+            for rule, check in compiled_rules:
+                passed, action_taken, points, explanation = check(features, matched_traits, match_details)
                 
-                if result.passed:
-                    if result.action_taken == "boost_applied":
-                        total_boost += result.points_applied
+                if passed:
+                    if action_taken == "boost_applied":
+                        total_boost += points
                         passed_rules.append(f"{rule.rule_id}: {rule.rule_name}")
-                        explanations.append(f"[OK] {rule.rule_name}: {result.explanation}")
-                    elif result.action_taken == "penalty_applied":
-                        total_penalty += abs(result.points_applied)
-                        warnings.append(f"{rule.rule_id}: {result.explanation}")
-                        explanations.append(f"⚠ {rule.rule_name}: {result.explanation}")
-                    elif result.action_taken in ["passed", "no_boost", "no_penalty"]:
+                        explanations.append(f"[OK] {rule.rule_name}: {explanation}")
+                    elif action_taken == "penalty_applied":
+                        total_penalty += abs(points)
+                        warnings.append(f"{rule.rule_id}: {explanation}")
+                        explanations.append(f"⚠ {rule.rule_name}: {explanation}")
+                    elif action_taken in ["passed", "no_boost", "no_penalty"]:
                         pass  # Normal processing
-                    elif result.action_taken == "eligible_with_warning":
-                        warnings.append(result.explanation)
-                        explanations.append(f"⚠ {rule.rule_name}: {result.explanation}")
-                    elif result.action_taken == "eligible_with_penalty":
-                        warnings.append(result.explanation)
-                        explanations.append(f"⚠ {rule.rule_name}: {result.explanation}")
+                    elif action_taken == "eligible_with_warning":
+                        warnings.append(explanation)
+                        explanations.append(f"⚠ {rule.rule_name}: {explanation}")
+                    elif action_taken == "eligible_with_penalty":
+                        warnings.append(explanation)
+                        explanations.append(f"⚠ {rule.rule_name}: {explanation}")
                 else:
                     # Rule failed - check if it's an eligibility rule
                     if rule.rule_type == RuleType.ELIGIBILITY:
                         is_eligible = False
                         failed_rules.append(f"{rule.rule_id}: {rule.rule_name}")
-                        explanations.append(f"✗ {rule.rule_name}: {result.explanation}")
+                        explanations.append(f"✗ {rule.rule_name}: {explanation}")
                     else:
                         failed_rules.append(f"{rule.rule_id}: {rule.rule_name}")
-                        explanations.append(f"⚠ {rule.rule_name}: {result.explanation}")
+                        explanations.append(f"⚠ {rule.rule_name}: {explanation}")
             
             # Calculate eligibility score using ENHANCED trait matching
             # Base score now uses the comprehensive trait match score
@@ -831,7 +880,7 @@ class RuleBasedFilter:
                 eligibility_score += 5
             
             filtered_courses.append(FilteredCourse(
-                course=course,
+                course=features.course,
                 eligibility_score=eligibility_score,
                 passed_rules=passed_rules,
                 failed_rules=failed_rules,
@@ -1509,6 +1558,101 @@ CLASSIFICATION_TO_COURSES = {
 }
 
 
+# ================================================================================
+# RECOMMENDATION RESULT CACHE
+# ================================================================================
+
+def profile_fingerprint(
+    user_profile: Dict[str, Any],
+    trait_scores: Dict[str, float],
+    career_path_courses: List[str] = None,
+    top_n: int = 6
+) -> Tuple:
+    """
+    Canonical key for the generate_recommendations() inputs that affect its output:
+    - Top-10 traits in rank order (trait scores themselves are never shown)
+    - GWA and strand as given (GWA points and explanations use the exact value)
+    - The QUALITATIVE_KEYWORD_MAPPING keywords picked from interests/skills
+    - The set of career path courses, and top_n
+    """
+    sorted_traits = sorted(trait_scores.items(), key=lambda x: x[1], reverse=True)
+    interests = user_profile.get("interests", "")
+    skills = user_profile.get("skills", "")
+    return (
+        tuple(t for t, _ in sorted_traits[:10]),
+        repr(user_profile["gwa"]) if "gwa" in user_profile else None,
+        user_profile.get("strand"),
+        bool(interests or skills),
+        tuple(keyword for keyword, _ in qualitative_keywords(interests, skills)),
+        frozenset(career_path_courses or ()),
+        top_n
+    )
+
+
+class RecommendationResultCache:
+    """
+    LRU + TTL cache of generate_recommendations() payloads keyed by
+    profile_fingerprint(). The engine clears it whenever the course list or
+    the rule base changes.
+    """
+    
+    def __init__(self, max_entries: int = 2048, ttl_seconds: Optional[float] = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """A private copy of the cached payload, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            payload = entry[1]
+        return copy.deepcopy(payload)
+    
+    def put(self, key: Tuple, payload: Dict[str, Any]):
+        payload = copy.deepcopy(payload)  # Callers may modify the payload they were given
+        with self._lock:
+            self._entries[key] = (time.monotonic(), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+    
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+    
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None
+            }
+
+
+def create_result_cache_from_env() -> Optional[RecommendationResultCache]:
+    """RECOMMENDATION_CACHE_ENTRIES (0 disables, default 2048) and RECOMMENDATION_CACHE_TTL seconds (default 3600)"""
+    max_entries = int(os.getenv("RECOMMENDATION_CACHE_ENTRIES", "2048"))
+    if max_entries <= 0:
+        return None
+    return RecommendationResultCache(max_entries, float(os.getenv("RECOMMENDATION_CACHE_TTL", "3600")))
+
+
 # ================================================================================
 # HYBRID RECOMMENDATION ENGINE
 # ================================================================================
@@ -1533,9 +1677,47 @@ class HybridRecommendationEngine:
        - Rank courses and select top recommendations
     """
     
-    def __init__(self):
+    def __init__(self, result_cache: Optional[RecommendationResultCache] = None):
         self.rule_filter = RuleBasedFilter()
         self.decision_tree = DecisionTreeClassifier()
+        self.result_cache = result_cache
+        self._lock = threading.Lock()
+        self._catalog: Optional[CourseCatalogIndex] = None
+        self._catalog_courses: List[Any] = []  # Keeps the indexed course objects (and their ids) alive
+        self._generation: Optional[Tuple] = None
+    
+    def _rule_base_signature(self) -> Tuple:
+        return tuple(
+            (r.rule_id, r.rule_type, r.action, r.boost_points, r.penalty_points, r.priority,
+             json.dumps(r.conditions, sort_keys=True, default=str))
+            for r in self.rule_filter.rules
+        )
+    
+    def catalog_for(self, courses: List[Any]) -> CourseCatalogIndex:
+        """
+        The shared CourseCatalogIndex for `courses`. A different course list
+        (e.g. the catalog cache was reloaded) or a changed rule base rebuilds
+        it and clears the result cache.
+        """
+        generation = (tuple(id(course) for course in courses), self._rule_base_signature())
+        with self._lock:
+            if generation != self._generation:
+                if self._generation is not None and self.result_cache is not None:
+                    self.result_cache.invalidate()
+                    print("[ENGINE] Course list or rule base changed - recommendation cache cleared")
+                self._catalog = self.rule_filter.catalog_index(courses)
+                self._catalog_courses = list(courses)
+                self._generation = generation
+            return self._catalog
+    
+    def invalidate_cache(self):
+        """Drop cached results and the catalog index (e.g. after editing the decision tree)"""
+        with self._lock:
+            self._generation = None
+            self._catalog = None
+            self._catalog_courses = []
+        if self.result_cache is not None:
+            self.result_cache.invalidate()
     
     def generate_recommendations(
         self,
@@ -1543,7 +1725,8 @@ class HybridRecommendationEngine:
         user_profile: Dict[str, Any],
         trait_scores: Dict[str, float],
         career_path_courses: List[str] = None,
-        top_n: int = 6
+        top_n: int = 6,
+        verbose: bool = True
     ) -> Dict[str, Any]:
         """
         Generate course recommendations using the hybrid approach
@@ -1554,10 +1737,21 @@ class HybridRecommendationEngine:
             trait_scores: Dictionary of trait -> score from assessment
             career_path_courses: List of course names from career path selections
             top_n: Number of top recommendations to return
+            verbose: Print the per-phase progress log
         
         Returns:
             Dictionary with recommendations and detailed explanations
+            (served from result_cache when an identical profile was scored)
         """
+        catalog = self.catalog_for(courses)
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = profile_fingerprint(user_profile, trait_scores, career_path_courses, top_n)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                if verbose:
+                    print("[ENGINE] Recommendations served from cache")
+                return cached
         
         # Prepare user data for decision tree
         sorted_traits = sorted(trait_scores.items(), key=lambda x: x[1], reverse=True)
@@ -1576,35 +1770,41 @@ class HybridRecommendationEngine:
         }
         
         # ==================== PHASE 1: RULE-BASED FILTERING ====================
-        print("[FORM] PHASE 1: Applying Rule-Based Filtering...")
+        if verbose:
+            print("[FORM] PHASE 1: Applying Rule-Based Filtering...")
         
         filtered_courses = self.rule_filter.filter_courses(
             courses=courses,
             user_profile=user_profile,
             trait_scores=trait_scores,
-            career_path_courses=career_path_courses
+            career_path_courses=career_path_courses,
+            catalog=catalog
         )
         
         eligible_courses = [fc for fc in filtered_courses if fc.is_eligible]
         ineligible_courses = [fc for fc in filtered_courses if not fc.is_eligible]
         
-        print(f"   [OK] {len(eligible_courses)} eligible courses")
-        print(f"   ✗ {len(ineligible_courses)} ineligible courses")
+        if verbose:
+            print(f"   [OK] {len(eligible_courses)} eligible courses")
+            print(f"   ✗ {len(ineligible_courses)} ineligible courses")
         
         # ==================== PHASE 2: DECISION TREE CLASSIFICATION ====================
-        print("🌳 PHASE 2: Applying Decision Tree Classification...")
+        if verbose:
+            print("🌳 PHASE 2: Applying Decision Tree Classification...")
         
         classification, confidence, tree_modifier, decision_path = self.decision_tree.classify(tree_profile)
         
-        print(f"   → Classification: {classification}")
-        print(f"   → Confidence: {confidence:.0%}")
-        print(f"   → Decision Path: {' → '.join(decision_path)}")
+        if verbose:
+            print(f"   → Classification: {classification}")
+            print(f"   → Confidence: {confidence:.0%}")
+            print(f"   → Decision Path: {' → '.join(decision_path)}")
         
         # Get recommended course categories
         recommended_courses_in_category = CLASSIFICATION_TO_COURSES.get(classification, [])
         
         # ==================== COMBINE SCORES ====================
-        print("🔢 Combining scores from both phases...")
+        if verbose:
+            print("🔢 Combining scores from both phases...")
         
         final_scored_courses = []
         
@@ -1621,18 +1821,13 @@ class HybridRecommendationEngine:
                 tree_boost = tree_modifier
             
             # Calculate matched traits using enhanced system for display
-            course_traits = [t.strip() for t in (course.trait_tag or "").split(",")]
+            course_traits_list = catalog.features_for(course).traits
             
             # Use enhanced matching - get both exact and similar matches
-            trait_match_score, matched_traits_display, match_details = calculate_trait_match_score(
-                top_traits, course_traits
-            )
-            
-            # For backwards compatibility, also compute simple matches
-            simple_matched = [t for t in top_traits if t in course_traits]
+            trait_match_score, matched_traits_display, match_details = catalog.match(top_traits, course)
             
             # Use enhanced matched traits for display (shows "trait≈similar" format)
-            matched_traits = match_details.get("exact", [])  # Show only exact matches
+            matched_traits = list(match_details.get("exact", []))  # Show only exact matches (copy: results may be cached)
             
             # Final combined score (raw points)
             final_score = rule_score + tree_boost
@@ -1680,7 +1875,7 @@ class HybridRecommendationEngine:
             exact_match_count = len(match_details.get("exact", []))
             similar_match_count = len(match_details.get("similar", []))
             total_matches = exact_match_count + (similar_match_count * 0.6)  # Similar counts partially
-            trait_confidence = (total_matches / max(1, len(course_traits))) * 100
+            trait_confidence = (total_matches / max(1, len(course_traits_list))) * 100
             academic_confidence = 100 if fc.boost_total > fc.penalty_total else 50
             tree_confidence = confidence * 100 if in_predicted_category else 50
             
@@ -1774,7 +1969,7 @@ class HybridRecommendationEngine:
                 }
             })
         
-        return {
+        result = {
             "recommendations": recommendations,
             "algorithm_details": {
                 "phase1_rule_based": {
@@ -1797,6 +1992,52 @@ class HybridRecommendationEngine:
                 "predicted_career_category": classification.replace("_", " ").title()
             }
         }
+        if cache_key is not None:
+            self.result_cache.put(cache_key, result)
+        return result
+    
+    def generate_recommendations_batch(
+        self,
+        courses: List[Any],
+        profiles: List[Tuple],
+        top_n: int = 6
+    ) -> List[Dict[str, Any]]:
+        """
+        Score many users against the same catalog in one pass
+        
+        Used when a whole cohort is re-scored (e.g. after rule weights change).
+        Course features and the course x trait matrix are built once and shared
+        by every user (see catalog_for), trait matches are memoized per
+        distinct trait list and identical profiles hit the result cache,
+        instead of one independent full-catalog pass per user.
+        
+        Args:
+            courses: List of all courses from database
+            profiles: (user_profile, trait_scores) or
+                      (user_profile, trait_scores, career_path_courses) tuples
+            top_n: Number of top recommendations per user
+        
+        Returns:
+            One generate_recommendations() payload per profile, in input order
+        """
+        catalog = self.catalog_for(courses)
+        results = []
+        
+        for entry in profiles:
+            user_profile, trait_scores = entry[0], entry[1]
+            career_path_courses = entry[2] if len(entry) > 2 else None
+            results.append(self.generate_recommendations(
+                courses=courses,
+                user_profile=user_profile,
+                trait_scores=trait_scores,
+                career_path_courses=career_path_courses,
+                top_n=top_n,
+                verbose=False
+            ))
+        
+        print(f"[ENGINE] Batch scored {len(results)} profiles x {len(courses)} courses "
+              f"({catalog.memoized_trait_lists} trait lists memoized)")
+        return results
     
     def _select_diverse_recommendations(
         self,
@@ -0,0 +1,201 @@
+# report_cache.py
+"""
+Cached Report Aggregates for the Admin Dashboard
+
+The dashboard polls /admin/reports/*, /admin/feedback/stats and /public/stats,
+which used to run full-table COUNT / GROUP BY scans on every call. (Trait
+totals come from the trait_daily_rollups table, see trait_rollups.py.)
+
+ReportCache keeps each aggregate in memory:
+- Loaded from the database on first use (one query per aggregate)
+- Updated incrementally by the code that writes attempts, recommendations,
+  answers and feedback (record_* methods)
+- Reloaded once it is older than max_age_seconds, which bounds drift from
+  writes made by other workers and from deletes
+- Dropped explicitly (invalidate) when admins edit or delete rows
+
+Aggregates are stored untruncated (e.g. every course's recommendation count)
+so top-N lists stay correct as counts change.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+import models
+import trait_rollups
+from catalog_cache import course_catalog
+
+
+class ReportCache:
+    """In-process report aggregates with incremental updates and a staleness bound."""
+
+    def __init__(self, max_age_seconds: float = 60):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._entries: Dict[str, dict] = {}
+        self._loaded_at: Dict[str, float] = {}
+
+    # ---------------- cache plumbing ----------------
+
+    def _get(self, key: str, db, loader: Callable) -> dict:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - self._loaded_at[key] <= self.max_age_seconds:
+                return entry
+        entry = loader(db)
+        with self._lock:
+            self._entries[key] = entry
+            self._loaded_at[key] = time.time()
+        return entry
+
+    def _update(self, key: str, apply: Callable[[dict], None]):
+        """Apply an increment to a loaded aggregate (unloaded ones pick it up from the DB)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                apply(entry)
+
+    def invalidate(self, *keys: str):
+        """Drop the given aggregates (all of them when called without arguments)."""
+        with self._lock:
+            for key in keys or list(self._entries):
+                self._entries.pop(key, None)
+                self._loaded_at.pop(key, None)
+
+    # ---------------- loaders ----------------
+
+    @staticmethod
+    def _load_counts(db) -> dict:
+        # All table counts in a single round trip
+        row = db.execute(select(
+            select(func.count()).select_from(models.User).scalar_subquery(),
+            select(func.count()).select_from(models.Course).scalar_subquery(),
+            select(func.count()).select_from(models.Question).scalar_subquery(),
+            select(func.count()).select_from(models.Test).scalar_subquery(),
+            select(func.count()).select_from(models.TestAttempt).scalar_subquery(),
+            select(func.count()).select_from(models.Recommendation).scalar_subquery(),
+        )).one()
+        keys = ("users", "courses", "questions", "tests", "test_attempts", "recommendations")
+        return dict(zip(keys, row))
+
+    @staticmethod
+    def _load_course_recommendations(db) -> dict:
+        rows = db.query(
+            models.Recommendation.course_id,
+            func.count(models.Recommendation.recommendation_id)
+        ).group_by(models.Recommendation.course_id).all()
+        return {"by_course": Counter({course_id: count for course_id, count in rows})}
+
+    @staticmethod
+    def _load_traits(db) -> dict:
+        # Summed from the daily rollups rather than scanning student_answers
+        return {"by_trait": Counter(trait_rollups.totals(db))}
+
+    @staticmethod
+    def _load_feedback(db) -> dict:
+        by_rating = Counter({
+            rating: count for rating, count in db.query(
+                models.RecommendationFeedback.rating,
+                func.count(models.RecommendationFeedback.feedback_id)
+            ).group_by(models.RecommendationFeedback.rating).all()
+        })
+        course_rows = db.query(
+            models.Course.course_name,
+            func.count(models.RecommendationFeedback.feedback_id),
+            func.sum(models.RecommendationFeedback.rating)
+        ).join(
+            models.Recommendation,
+            models.Course.course_id == models.Recommendation.course_id
+        ).join(
+            models.RecommendationFeedback,
+            models.Recommendation.recommendation_id == models.RecommendationFeedback.recommendation_id
+        ).group_by(models.Course.course_name).all()
+        return {
+            "by_rating": by_rating,
+            "by_course": {name: [count, rating_sum or 0] for name, count, rating_sum in course_rows}
+        }
+
+    # ---------------- reads ----------------
+
+    def counts(self, db) -> dict:
+        return dict(self._get("counts", db, self._load_counts))
+
+    def popular_courses(self, db, limit: int = 10) -> List[dict]:
+        by_course = self._get("course_recommendations", db, self._load_course_recommendations)["by_course"]
+        with self._lock:
+            ranked = by_course.most_common()
+        result = []
+        for course_id, count in ranked:
+            course = course_catalog.get(db, course_id)
+            if course is None or count <= 0:
+                continue
+            result.append({"course_name": course.course_name, "course_id": course_id, "times_recommended": count})
+            if len(result) == limit:
+                break
+        return result
+
+    def trait_distribution(self, db) -> List[dict]:
+        by_trait = self._get("traits", db, self._load_traits)["by_trait"]
+        with self._lock:
+            ranked = by_trait.most_common()
+        return [{"trait": trait, "count": count} for trait, count in ranked]
+
+    def feedback_stats(self, db, top_n: int = 10) -> dict:
+        entry = self._get("feedback", db, self._load_feedback)
+        with self._lock:
+            by_rating = Counter(entry["by_rating"])
+            by_course = {name: list(stats) for name, stats in entry["by_course"].items()}
+        total = sum(by_rating.values())
+        rating_sum = sum(rating * count for rating, count in by_rating.items())
+        top_courses = sorted(by_course.items(), key=lambda item: item[1][0], reverse=True)[:top_n]
+        return {
+            "total_feedbacks": total,
+            "average_rating": round(rating_sum / total, 2) if total else 0,
+            "rating_distribution": {str(rating): by_rating.get(rating, 0) for rating in range(1, 6)},
+            "top_courses": [
+                {
+                    "course_name": name,
+                    "feedback_count": count,
+                    "avg_rating": round(rating_sum / count, 2) if count else 0
+                }
+                for name, (count, rating_sum) in top_courses
+            ]
+        }
+
+    # ---------------- incremental updates ----------------
+
+    def record_user(self, delta: int = 1):
+        self._update("counts", lambda e: e.__setitem__("users", e["users"] + delta))
+
+    def record_attempts(self, attempts: int, recommended_course_ids: Iterable[int] = (),
+                        chosen_traits: Iterable[str] = ()):
+        """Account for newly committed attempts with their recommendations and (reportable) answer traits."""
+        course_ids = list(recommended_course_ids)
+        traits = list(chosen_traits)
+
+        def apply_counts(e):
+            e["test_attempts"] += attempts
+            e["recommendations"] += len(course_ids)
+
+        self._update("counts", apply_counts)
+        self._update("course_recommendations", lambda e: e["by_course"].update(course_ids))
+        self._update("traits", lambda e: e["by_trait"].update(traits))
+
+    def record_feedback(self, rating: int, course_name: Optional[str] = None):
+        def apply(e):
+            e["by_rating"][rating] += 1
+            if course_name:
+                stats = e["by_course"].setdefault(course_name, [0, 0])
+                stats[0] += 1
+                stats[1] += rating
+
+        self._update("feedback", apply)
+
+
+# Shared instance (REPORT_CACHE_MAX_AGE: seconds an aggregate may be served before reloading)
+report_cache = ReportCache(float(os.getenv("REPORT_CACHE_MAX_AGE", "60")))
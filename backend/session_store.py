@@ -0,0 +1,627 @@
+# session_store.py
+"""
+Session Stores for the Adaptive Assessment Engine
+
+AdaptiveAssessmentEngine keeps its sessions in a SessionStore instead of a
+plain dict so that several uvicorn workers (or replicas) can serve the same
+assessment between /adaptive/start and /adaptive/answer.
+
+Backends:
+- InMemorySessionStore: the original per-process dict (default)
+- SQLiteSessionStore: file-backed, shared by every worker on one host
+- RedisSessionStore: shared across hosts; works with any redis-py compatible client
+
+Sessions are serialized as zlib-compressed compact JSON. Derived state that the
+engine can rebuild (active_trait_counts) is not stored.
+
+Concurrency: shared backends hand out copies, so two requests for the same
+session (a double-clicked answer) would both read, mutate and save, and the
+later save would win. Endpoints that change a session hold lock(session_id)
+for the whole request: a per-process lock plus, for SQLite and Redis, a
+short lease row/key that other workers wait on. While the lock is held the
+store also hands the same deserialized session to every get() in that
+thread, so a request decodes it once.
+
+Lifecycle: idle sessions expire after ttl_seconds, the in-memory store keeps at
+most max_sessions (least recently used are evicted first), and completed
+sessions are compacted down to their results before being stored.
+
+Select a backend with environment variables (see create_session_store_from_env):
+    ADAPTIVE_SESSION_STORE=memory|sqlite|redis
+    ADAPTIVE_SESSION_DB=./adaptive_sessions.db
+    REDIS_URL=redis://localhost:6379/0
+    ADAPTIVE_SESSION_TTL=86400
+    ADAPTIVE_MAX_SESSIONS=5000
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import fields
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Set
+
+from adaptive_assessment import AdaptiveSession
+
+
+# Fields rebuilt by the engine on demand - not worth the bytes
+_DERIVED_FIELDS = {"active_trait_counts"}
+
+# Dict fields whose keys are question ids (JSON turns them into strings)
+_INT_KEYED_FIELDS = {"answered_questions", "answer_trait_changes", "answer_rejection_data"}
+
+# Set fields (stored as lists)
+_SET_FIELDS = {"excluded_question_ids", "rejected_topics", "active_courses"}
+
+# Working state that is dead weight once a session has its final recommendations.
+# trait_scores and answered_questions stay: results and the DB save still read them.
+_COMPACTED_FIELDS = (
+    "course_scores", "initial_course_scores", "excluded_question_ids", "rejected_topics",
+    "question_history", "answer_trait_changes", "answer_rejection_data",
+    "active_courses", "active_trait_counts",
+)
+
+
+def compact_session(session: AdaptiveSession) -> bool:
+    """Drop the scoring state of a completed session. Returns True if anything was freed."""
+    if not session.is_complete:
+        return False
+    freed = False
+    for name in _COMPACTED_FIELDS:
+        value = getattr(session, name)
+        if value:
+            value.clear()
+            freed = True
+    return freed
+
+
+def _json_default(value):
+    # Numeric columns (e.g. Course.minimum_gwa in final_recommendations) come back as Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def serialize_session(session: AdaptiveSession) -> bytes:
+    """Encode a session as compressed compact JSON."""
+    data = {}
+    for f in fields(AdaptiveSession):
+        if f.name in _DERIVED_FIELDS:
+            continue
+        value = getattr(session, f.name)
+        if f.name in _SET_FIELDS:
+            value = sorted(value)
+        elif hasattr(value, "to_dict"):
+            value = value.to_dict()  # CourseScoreVector; the engine re-attaches it on load
+        data[f.name] = value
+    return zlib.compress(json.dumps(data, separators=(",", ":"), default=_json_default).encode("utf-8"))
+
+
+def deserialize_session(payload: bytes) -> AdaptiveSession:
+    """Decode a session produced by serialize_session."""
+    data = json.loads(zlib.decompress(payload).decode("utf-8"))
+    for name in _INT_KEYED_FIELDS:
+        if name in data:
+            data[name] = {int(k): v for k, v in data[name].items()}
+    for name in _SET_FIELDS:
+        if name in data:
+            data[name] = set(data[name])
+    return AdaptiveSession(**data)
+
+
+class SessionLockTimeout(Exception):
+    """Another request kept the session locked for longer than lock_timeout_seconds."""
+    pass
+
+
+class SessionStore:
+    """
+    Dict-like storage for AdaptiveSession objects.
+
+    Sessions read from a shared backend are copies, so the engine calls
+    save() after every mutation. Subclasses implement get/save/delete/keys.
+    """
+
+    LOCK_STRIPES = 64
+    lock_timeout_seconds = 10.0
+    lock_lease_seconds = 30.0  # A crashed worker's lock is taken over after this long
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"created": 0, "expired": 0, "evicted": 0, "compacted": 0, "deleted": 0}
+        self._lock_stripes = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+        self._held = threading.local()
+        self._catalog_version = 0  # Process-local default; shared backends override the accessors
+        self._version_lock = threading.Lock()
+
+    def _prepare(self, session: AdaptiveSession):
+        """Compact completed sessions before they are stored."""
+        if compact_session(session):
+            self.stats["compacted"] += 1
+
+    def get(self, session_id: str, default=None) -> Optional[AdaptiveSession]:
+        raise NotImplementedError
+
+    def save(self, session: AdaptiveSession):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def keys(self) -> List[str]:
+        raise NotImplementedError
+
+    def live_catalog_versions(self) -> Set[int]:
+        """
+        Catalog versions of unfinished sessions, without refreshing their idle
+        timers. Subclasses override this to avoid loading every session.
+        """
+        versions = set()
+        for session_id in self.keys():
+            session = self.get(session_id)
+            if session is not None and not session.is_complete:
+                versions.add(session.catalog_version)
+        return versions
+
+    # ---------------- per-session locking ----------------
+
+    def _held_sessions(self) -> Dict[str, list]:
+        """session_id -> [depth, loaded session or None] for locks held by this thread."""
+        held = getattr(self._held, "sessions", None)
+        if held is None:
+            held = self._held.sessions = {}
+        return held
+
+    @contextmanager
+    def lock(self, session_id: str):
+        """Hold session_id exclusively (re-entrant within a thread)."""
+        held = self._held_sessions()
+        if session_id in held:
+            held[session_id][0] += 1
+            try:
+                yield
+            finally:
+                held[session_id][0] -= 1
+            return
+        stripe = self._lock_stripes[hash(session_id) % self.LOCK_STRIPES]
+        if not stripe.acquire(timeout=self.lock_timeout_seconds):
+            raise SessionLockTimeout(session_id)
+        try:
+            token = self._acquire_shared_lock(session_id)
+            held[session_id] = [1, None]
+            try:
+                yield
+            finally:
+                del held[session_id]
+                self._release_shared_lock(session_id, token)
+        finally:
+            stripe.release()
+
+    def _acquire_shared_lock(self, session_id: str) -> Optional[str]:
+        """Cross-process part of lock(); process-local stores need none."""
+        return None
+
+    def _release_shared_lock(self, session_id: str, token: Optional[str]):
+        pass
+
+    def _wait_for_shared_lock(self, try_acquire, session_id: str) -> str:
+        """Poll try_acquire(token) until it succeeds or lock_timeout_seconds pass."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout_seconds
+        while not try_acquire(token):
+            if time.monotonic() > deadline:
+                raise SessionLockTimeout(session_id)
+            time.sleep(0.02)
+        return token
+
+    def _cached(self, session_id: str) -> Optional[AdaptiveSession]:
+        entry = self._held_sessions().get(session_id)
+        return entry[1] if entry else None
+
+    def _remember(self, session: AdaptiveSession):
+        entry = self._held_sessions().get(session.session_id)
+        if entry:
+            entry[1] = session
+
+    def _forget(self, session_id: str):
+        entry = self._held_sessions().get(session_id)
+        if entry:
+            entry[1] = None
+
+    def catalog_version(self) -> int:
+        """Adaptive catalog version shared by every process using this store."""
+        return self._catalog_version
+
+    def bump_catalog_version(self) -> int:
+        """Increment the shared catalog version (after an admin edit) and return it."""
+        with self._version_lock:
+            self._catalog_version += 1
+            return self._catalog_version
+
+    def purge_expired(self) -> int:
+        """Remove sessions idle for longer than ttl_seconds. Returns how many were removed."""
+        return 0
+
+    def metrics(self) -> dict:
+        """Live/evicted counters for monitoring."""
+        return {
+            "backend": type(self).__name__,
+            "live_sessions": len(self),
+            "ttl_seconds": self.ttl_seconds,
+            **self.stats,
+        }
+
+    def __getitem__(self, session_id: str) -> AdaptiveSession:
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id: str, session: AdaptiveSession):
+        if session.session_id != session_id:
+            raise ValueError(f"Session id mismatch: {session_id} != {session.session_id}")
+        self.stats["created"] += 1
+        self.save(session)
+
+    def __delitem__(self, session_id: str):
+        self.delete(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-process dict of live session objects (single worker only).
+
+    Entries are kept in least-recently-used order, so expired sessions sit at the
+    front and both TTL expiry and the max_sessions cap only touch evicted entries.
+    """
+
+    DEFAULT_TTL_SECONDS = 4 * 60 * 60  # Longest assessment (60 questions) with generous idle time
+    DEFAULT_MAX_SESSIONS = 5000
+
+    def __init__(self, ttl_seconds: Optional[int] = DEFAULT_TTL_SECONDS,
+                 max_sessions: Optional[int] = DEFAULT_MAX_SESSIONS):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._lock = threading.RLock()
+        self._sessions: "OrderedDict[str, AdaptiveSession]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+
+    def _touch(self, session_id: str, now: float):
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = now
+
+    def _drop(self, session_id: str, reason: str):
+        self._sessions.pop(session_id, None)
+        self._last_access.pop(session_id, None)
+        self.stats[reason] += 1
+
+    def get(self, session_id: str, default=None) -> Optional[AdaptiveSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return default
+            now = time.time()
+            if self.ttl_seconds and now - self._last_access[session_id] > self.ttl_seconds:
+                self._drop(session_id, "expired")
+                return default
+            self._touch(session_id, now)
+            return session
+
+    def save(self, session: AdaptiveSession):
+        self._prepare(session)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._touch(session.session_id, time.time())
+            self.purge_expired()
+            if self.max_sessions:
+                while len(self._sessions) > self.max_sessions:
+                    oldest_id = next(iter(self._sessions))
+                    self._drop(oldest_id, "evicted")
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id, "deleted")
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def live_catalog_versions(self) -> Set[int]:
+        with self._lock:
+            cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else None
+            return {
+                session.catalog_version for session_id, session in self._sessions.items()
+                if not session.is_complete and (cutoff is None or self._last_access[session_id] > cutoff)
+            }
+
+    def purge_expired(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        removed = 0
+        with self._lock:
+            cutoff = time.time() - self.ttl_seconds
+            while self._sessions:
+                oldest_id = next(iter(self._sessions))
+                if self._last_access[oldest_id] > cutoff:
+                    break
+                self._drop(oldest_id, "expired")
+                removed += 1
+        return removed
+
+    def metrics(self) -> dict:
+        metrics = super().metrics()
+        metrics["max_sessions"] = self.max_sessions
+        return metrics
+
+
+class SQLiteSessionStore(SessionStore):
+    """File-backed store shared by all workers on the same host."""
+
+    PURGE_EVERY_SAVES = 500
+
+    def __init__(self, path: str = "./adaptive_sessions.db", ttl_seconds: Optional[int] = None):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._saves_since_purge = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS adaptive_sessions ("
+                "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL, "
+                "catalog_version INTEGER NOT NULL DEFAULT 0, is_complete INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Files created before the snapshot columns existed
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(adaptive_sessions)")}
+            for column in ("catalog_version", "is_complete"):
+                if column not in columns:
+                    self._conn.execute(
+                        f"ALTER TABLE adaptive_sessions ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+                    )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS adaptive_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS adaptive_session_locks ("
+                "session_id TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        print(f"[SESSION] Using SQLite session store: {path}")
+
+    def get(self, session_id: str, default=None) -> Optional[AdaptiveSession]:
+        cached = self._cached(session_id)
+        if cached is not None:
+            return cached
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM adaptive_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if not row:
+            return default
+        if self.ttl_seconds and time.time() - row[1] > self.ttl_seconds:
+            with self._lock:
+                self._conn.execute("DELETE FROM adaptive_sessions WHERE session_id = ?", (session_id,))
+                self._conn.commit()
+            self.stats["expired"] += 1
+            return default
+        session = deserialize_session(row[0])
+        self._remember(session)
+        return session
+
+    def save(self, session: AdaptiveSession):
+        self._prepare(session)
+        payload = serialize_session(session)
+        self._remember(session)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO adaptive_sessions "
+                "(session_id, data, updated_at, catalog_version, is_complete) VALUES (?, ?, ?, ?, ?)",
+                (session.session_id, payload, time.time(), session.catalog_version, int(session.is_complete))
+            )
+            self._conn.commit()
+            self._saves_since_purge += 1
+        if self._saves_since_purge >= self.PURGE_EVERY_SAVES:
+            self.purge_expired()
+
+    def delete(self, session_id: str):
+        self._forget(session_id)
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM adaptive_sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+        if cursor.rowcount:
+            self.stats["deleted"] += 1
+
+    def _acquire_shared_lock(self, session_id: str) -> str:
+        def try_acquire(token):
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "DELETE FROM adaptive_session_locks WHERE session_id = ? AND expires_at < ?", (session_id, now)
+                )
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO adaptive_session_locks (session_id, token, expires_at) VALUES (?, ?, ?)",
+                    (session_id, token, now + self.lock_lease_seconds)
+                )
+                self._conn.commit()
+            return cursor.rowcount == 1
+        return self._wait_for_shared_lock(try_acquire, session_id)
+
+    def _release_shared_lock(self, session_id: str, token: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM adaptive_session_locks WHERE session_id = ? AND token = ?", (session_id, token)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            self._saves_since_purge = 0
+            cursor = self._conn.execute(
+                "DELETE FROM adaptive_sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+        self.stats["expired"] += cursor.rowcount
+        return cursor.rowcount
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT session_id FROM adaptive_sessions").fetchall()
+        return [r[0] for r in rows]
+
+    def catalog_version(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM adaptive_meta WHERE name = 'catalog_version'").fetchone()
+        return row[0] if row else 0
+
+    def bump_catalog_version(self) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO adaptive_meta (name, value) VALUES ('catalog_version', 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+            )
+            row = self._conn.execute("SELECT value FROM adaptive_meta WHERE name = 'catalog_version'").fetchone()
+            self._conn.commit()
+        return row[0]
+
+    def live_catalog_versions(self) -> Set[int]:
+        query = "SELECT DISTINCT catalog_version FROM adaptive_sessions WHERE is_complete = 0"
+        params = ()
+        if self.ttl_seconds:
+            query += " AND updated_at >= ?"
+            params = (time.time() - self.ttl_seconds,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return {r[0] for r in rows}
+
+
+class RedisSessionStore(SessionStore):
+    """Store backed by Redis (or any client exposing get/set(nx, px)/incr/delete/scan_iter)."""
+
+    KEY_PREFIX = "coursepro:adaptive:"
+    # "<catalog_version>:<is_complete>" per session, so snapshot pruning skips the payloads
+    META_PREFIX = "coursepro:adaptive-meta:"
+    CATALOG_VERSION_KEY = "coursepro:adaptive-catalog-version"
+    LOCK_PREFIX = "coursepro:adaptive-lock:"
+
+    def __init__(self, url: str = None, ttl_seconds: Optional[int] = 86400, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("Redis session store requires the redis package. Run: pip install redis")
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        super().__init__(ttl_seconds)
+        self.client = client
+        print(f"[SESSION] Using Redis session store (ttl={ttl_seconds}s)")
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    def get(self, session_id: str, default=None) -> Optional[AdaptiveSession]:
+        cached = self._cached(session_id)
+        if cached is not None:
+            return cached
+        payload = self.client.get(self._key(session_id))
+        if payload is None:
+            return default
+        session = deserialize_session(payload)
+        self._remember(session)
+        return session
+
+    def save(self, session: AdaptiveSession):
+        # Redis expires idle keys itself (ex= is refreshed on every save)
+        self._prepare(session)
+        self._remember(session)
+        self.client.set(self._key(session.session_id), serialize_session(session), ex=self.ttl_seconds)
+        self.client.set(
+            f"{self.META_PREFIX}{session.session_id}",
+            f"{session.catalog_version}:{int(session.is_complete)}", ex=self.ttl_seconds
+        )
+
+    def delete(self, session_id: str):
+        self._forget(session_id)
+        self.client.delete(f"{self.META_PREFIX}{session_id}")
+        if self.client.delete(self._key(session_id)):
+            self.stats["deleted"] += 1
+
+    def keys(self) -> List[str]:
+        keys = []
+        for key in self.client.scan_iter(match=f"{self.KEY_PREFIX}*"):
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            keys.append(key[len(self.KEY_PREFIX):])
+        return keys
+
+    def _acquire_shared_lock(self, session_id: str) -> str:
+        key = f"{self.LOCK_PREFIX}{session_id}"
+        lease_ms = int(self.lock_lease_seconds * 1000)
+        return self._wait_for_shared_lock(
+            lambda token: bool(self.client.set(key, token, nx=True, px=lease_ms)), session_id
+        )
+
+    def _release_shared_lock(self, session_id: str, token: str):
+        # Only delete our own lease; if it expired and someone else holds the key, leave it
+        key = f"{self.LOCK_PREFIX}{session_id}"
+        value = self.client.get(key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        if value == token:
+            self.client.delete(key)
+
+    def catalog_version(self) -> int:
+        value = self.client.get(self.CATALOG_VERSION_KEY)
+        return int(value) if value is not None else 0
+
+    def bump_catalog_version(self) -> int:
+        return int(self.client.incr(self.CATALOG_VERSION_KEY))
+
+    def live_catalog_versions(self) -> Set[int]:
+        versions = set()
+        for key in self.client.scan_iter(match=f"{self.META_PREFIX}*"):
+            value = self.client.get(key)
+            if value is None:
+                continue  # Expired between scan and get
+            if isinstance(value, bytes):
+                value = value.decode("utf-8")
+            version, complete = value.split(":")
+            if complete == "0":
+                versions.add(int(version))
+        return versions
+
+
+def create_session_store_from_env() -> SessionStore:
+    """Build the session store selected by ADAPTIVE_SESSION_STORE (default: memory)."""
+    backend = os.getenv("ADAPTIVE_SESSION_STORE", "memory").strip().lower()
+    ttl = os.getenv("ADAPTIVE_SESSION_TTL")
+    ttl_seconds = int(ttl) if ttl else None
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("ADAPTIVE_SESSION_DB", "./adaptive_sessions.db"), ttl_seconds)
+    if backend == "redis":
+        return RedisSessionStore(os.getenv("REDIS_URL"), ttl_seconds or 86400)
+    if backend != "memory":
+        print(f"[WARN] Unknown ADAPTIVE_SESSION_STORE '{backend}', using in-memory sessions")
+    max_sessions = os.getenv("ADAPTIVE_MAX_SESSIONS")
+    return InMemorySessionStore(
+        ttl_seconds or InMemorySessionStore.DEFAULT_TTL_SECONDS,
+        int(max_sessions) if max_sessions else InMemorySessionStore.DEFAULT_MAX_SESSIONS
+    )
@@ -0,0 +1,35 @@
+# conftest.py
+"""
+Shared pytest setup for the backend.
+
+Tests run against a throwaway SQLite file (DATABASE_URL is overridden before
+database.py is imported), with the backend directory on sys.path so the
+modules import the same way uvicorn loads them.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_DB_DIR = tempfile.mkdtemp(prefix="coursepro-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+
+@pytest.fixture
+def db():
+    """Session on a freshly created schema (dropped again after the test)."""
+    import database
+    import models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        models.Base.metadata.drop_all(bind=database.engine)
@@ -0,0 +1,64 @@
+# test_catalog_cache.py
+"""CourseCatalogCache: courses added behind the cache's back, and invalidation during a load."""
+
+from sqlalchemy import event
+
+import database
+import models
+from catalog_cache import CourseCatalogCache
+
+
+def _add_course(db, name):
+    course = models.Course(course_name=name, description="", trait_tag="Analytical", required_strand="STEM")
+    db.add(course)
+    db.commit()
+    return course
+
+
+def test_course_added_elsewhere_is_found_on_miss(db):
+    cache = CourseCatalogCache()
+    _add_course(db, "BS Mathematics")
+    assert len(cache.all(db)) == 1
+    version = cache.version
+
+    added = _add_course(db, "BS Statistics")  # e.g. another worker or catalog_import.py
+    assert cache.get(db, added.course_id).course_name == "BS Statistics"
+    assert cache.version > version  # Derived caches see the change
+    assert cache.find_by_name(db, "bs  statistics").course_id == added.course_id
+
+    newer = _add_course(db, "BS Applied Statistics")
+    assert cache.find_by_name(db, "Applied Stat", partial=True).course_id == newer.course_id
+
+
+def test_confirmed_misses_are_not_queried_again(db):
+    cache = CourseCatalogCache()
+    _add_course(db, "BS Mathematics")
+    cache.all(db)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(database.engine, "before_cursor_execute", listener)
+    try:
+        assert cache.get(db, 999) is None
+        assert cache.get(db, 999) is None
+        assert cache.find_by_name(db, "Nowhere") is None
+        assert cache.find_by_name(db, "Nowhere") is None
+    finally:
+        event.remove(database.engine, "before_cursor_execute", listener)
+    assert len(statements) == 2
+
+
+def test_invalidate_during_load_is_not_overwritten(db):
+    cache = CourseCatalogCache()
+    _add_course(db, "BS Mathematics")
+
+    class RacingSession:
+        """Admin edit (invalidate) lands between the version check and the SELECT."""
+        def query(self, *entities):
+            cache.invalidate()
+            return db.query(*entities)
+
+    assert [c.course_name for c in cache.all(RacingSession())] == ["BS Mathematics"]
+    assert cache._courses is None  # Stale read was served but not cached
+    assert len(cache.all(db)) == 1
+    assert cache._courses is not None
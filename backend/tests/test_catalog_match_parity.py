@@ -0,0 +1,101 @@
+# test_catalog_match_parity.py
+"""
+Catalog-level trait matching (CourseTraitMatrix / calculate_catalog_match_scores,
+and CourseCatalogIndex on top of them) must return exactly what the scalar
+calculate_trait_match_score returns course by course, rankings included.
+"""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from courses_specialized import COURSES_POOL_SPECIALIZED
+from recommendation_engine import RuleBasedFilter, parse_course_traits
+from trait_system import (
+    EXPANDED_TRAIT_MAPPING, TRAIT_CATEGORY_INDEX, TRAIT_RELATIONSHIPS,
+    CourseTraitMatrix, calculate_catalog_match_scores, calculate_trait_match_score
+)
+
+SEED = 20241018
+USERS = 150
+
+
+def _seed_courses():
+    return [
+        SimpleNamespace(
+            course_name=c["course_name"],
+            trait_tag=", ".join(c["trait_tag"]) if isinstance(c["trait_tag"], list) else c["trait_tag"],
+            minimum_gwa=c.get("minimum_gwa"),
+            required_strand=c.get("required_strand")
+        )
+        for c in COURSES_POOL_SPECIALIZED
+    ]
+
+
+def _vocabulary(courses):
+    traits = {t for c in courses for t in parse_course_traits(c)}
+    return sorted(traits | set(TRAIT_CATEGORY_INDEX) | set(TRAIT_RELATIONSHIPS) | set(EXPANDED_TRAIT_MAPPING))
+
+
+@pytest.fixture(scope="module")
+def courses():
+    rng = random.Random(SEED)
+    catalog = _seed_courses()
+    vocabulary = _vocabulary(catalog)
+    # Edge cases: no tags, duplicated tags, blank entries, unknown traits
+    extra = [None, "", "Helping-others, Helping-others", "Analytical, , Logical", "Not-a-trait, Empathetic"]
+    extra += [", ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 8))) for _ in range(60)]
+    catalog += [
+        SimpleNamespace(course_name=f"Random {i}", trait_tag=tags, minimum_gwa=None, required_strand=None)
+        for i, tags in enumerate(extra)
+    ]
+    return catalog
+
+
+def _user_trait_lists(courses):
+    rng = random.Random(SEED + 1)
+    vocabulary = _vocabulary(courses)
+    lists = [[], [""], ["Helping-others", "Helping-others"], ["Not-a-trait"]]
+    for _ in range(USERS):
+        traits = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+        if traits and rng.random() < 0.3:
+            traits.append(rng.choice(traits))  # Duplicate trait
+        lists.append(traits)
+    return lists
+
+
+def _ranking(results):
+    return sorted(range(len(results)), key=lambda i: results[i][0], reverse=True)
+
+
+def test_matrix_matches_scalar_scores_and_rankings(courses):
+    course_traits = [parse_course_traits(c) for c in courses]
+    matrix = CourseTraitMatrix(course_traits)
+    for user_traits in _user_trait_lists(courses):
+        expected = [calculate_trait_match_score(user_traits, traits) for traits in course_traits]
+        actual = calculate_catalog_match_scores(user_traits, matrix)
+        assert actual == expected, user_traits
+        assert _ranking(actual) == _ranking(expected)
+
+
+def test_catalog_index_matches_scalar_scores(courses):
+    index = RuleBasedFilter().catalog_index(courses)
+    for user_traits in _user_trait_lists(courses):
+        expected = [calculate_trait_match_score(user_traits, parse_course_traits(c)) for c in courses]
+        assert index.match_all(user_traits) == expected, user_traits
+        for course, result in zip(courses, expected):
+            assert index.match(user_traits, course) == result
+
+
+def test_catalog_index_memoized_results_are_stable(courses):
+    index = RuleBasedFilter().catalog_index(courses)
+    user_traits = ["Analytical", "Helping-others", "Creative-expression"]
+    first = index.match_all(user_traits)
+    assert index.match_all(list(user_traits)) is first
+    assert index.memoized_trait_lists == 1
+    assert first == [calculate_trait_match_score(user_traits, parse_course_traits(c)) for c in courses]
+
+
+def test_empty_catalog():
+    assert calculate_catalog_match_scores(["Analytical"], CourseTraitMatrix([])) == []
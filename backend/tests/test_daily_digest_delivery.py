@@ -0,0 +1,26 @@
+# test_daily_digest_delivery.py
+"""Digest runs are claimed once per day, and stopping the email queue waits for retries."""
+
+import datetime
+
+from daily_digest import claim_run
+from email_queue import EmailQueue, FakeTransport
+
+
+def test_claim_run_once_per_day(db):
+    day = datetime.date(2026, 3, 2)
+    assert claim_run(db, day)
+    assert not claim_run(db, day)
+    assert claim_run(db, day + datetime.timedelta(days=1))
+
+
+def test_stop_waits_for_scheduled_retries():
+    transport = FakeTransport(fail_times=2)
+    queue = EmailQueue(transport=transport, workers=2, base_delay_seconds=0.05)
+    job = queue.submit("student@example.com", "Digest", "<p>Hi</p>", kind="daily_digest")
+
+    queue.stop(timeout=5)
+
+    assert job.status == "sent"
+    assert job.attempts == 3
+    assert len(transport.sent) == 1
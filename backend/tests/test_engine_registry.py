@@ -0,0 +1,63 @@
+# test_engine_registry.py
+"""AdaptiveEngineRegistry rebuilds: failures must not leave the reported version ahead of the served one."""
+
+from engine_registry import AdaptiveEngineRegistry
+from session_store import InMemorySessionStore
+
+COURSES = [{"course_name": "BS Mathematics", "description": "", "minimum_gwa": None,
+            "required_strand": "STEM", "trait_tag": "Analytical"}]
+
+
+class _Session:
+    def close(self):
+        pass
+
+
+def _registry(loader, store=None):
+    registry = AdaptiveEngineRegistry(loader, _Session, session_store=store)
+    registry.REBUILD_RETRY_SECONDS = 0
+    registry.warm_up(_Session())
+    return registry
+
+
+def _wait(registry):
+    if registry._rebuild_thread is not None:
+        registry._rebuild_thread.join(10)
+
+
+def test_failed_rebuild_rolls_back_and_reports_error():
+    calls = {"n": 0}
+
+    def loader(db):
+        calls["n"] += 1
+        if calls["n"] > 1:
+            raise RuntimeError("database unavailable")
+        return COURSES, []
+
+    registry = _registry(loader)
+    registry.invalidate()
+    _wait(registry)
+
+    metrics = registry.metrics()
+    assert calls["n"] == 1 + registry.REBUILD_ATTEMPTS
+    assert metrics["catalog_version"] == metrics["current_engine_version"] == 0
+    assert "database unavailable" in metrics["last_rebuild_error"]
+    assert not metrics["rebuilding"]
+
+
+def test_rebuild_retries_until_it_succeeds():
+    calls = {"n": 0}
+
+    def loader(db):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("transient")
+        return COURSES, []
+
+    registry = _registry(loader, InMemorySessionStore())
+    registry.invalidate()
+    _wait(registry)
+
+    metrics = registry.metrics()
+    assert metrics["catalog_version"] == metrics["current_engine_version"] == 1
+    assert metrics["last_rebuild_error"] is None
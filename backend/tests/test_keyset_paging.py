@@ -0,0 +1,83 @@
+# test_keyset_paging.py
+"""
+Keyset paging over server-filled timestamps.
+
+taken_at comes from server_default now(), which SQLite stores without
+microseconds; the cursor must still move past the last row of every page.
+"""
+
+import datetime
+
+import pytest
+
+import models
+
+
+@pytest.fixture
+def attempts(db):
+    """One user with 7 attempts: several sharing a server-filled second, plus explicit timestamps."""
+    user = models.User(username="pager", password_hash="x", email="pager@example.com",
+                       first_name="Page", last_name="Walker")
+    test = models.Test(test_name="Assessment", test_type="assessment")
+    db.add_all([user, test])
+    db.flush()
+    for _ in range(5):
+        db.add(models.TestAttempt(user_id=user.user_id, test_id=test.test_id))
+    for day in (1, 2):
+        db.add(models.TestAttempt(user_id=user.user_id, test_id=test.test_id,
+                                  taken_at=datetime.datetime(2024, 1, day, 8, 30, 15, 250000)))
+    db.commit()
+    return user
+
+
+def _walk(fetch, limit):
+    """Follow next_cursor to the end; fails instead of looping forever."""
+    seen, cursor = [], None
+    for _ in range(50):
+        ids, cursor = fetch(limit, cursor)
+        seen.extend(ids)
+        if cursor is None:
+            return seen
+    pytest.fail(f"Paging did not terminate: {seen[:20]}")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 10])
+def test_assessment_history_pages_cover_every_attempt_once(db, attempts, limit):
+    import main
+
+    def fetch(limit, cursor):
+        page = main.get_assessment_history(attempts.user_id, limit=limit, cursor=cursor,
+                                           include_answers=False, db=db)
+        return [entry["attempt_id"] for entry in page["history"]], page["next_cursor"]
+
+    everything = main.get_assessment_history(attempts.user_id, limit=None, cursor=None,
+                                             include_answers=False, db=db)
+    expected = [entry["attempt_id"] for entry in everything["history"]]
+    seen = _walk(fetch, limit)
+    assert len(seen) == len(set(seen)) == 7
+    assert seen == expected
+
+
+def test_admin_test_attempts_pages_cover_every_attempt_once(db, attempts):
+    import main
+
+    def fetch(limit, cursor):
+        page = main.get_all_test_attempts(limit=limit, cursor=cursor, date_from=None, date_to=None,
+                                          format="json", db=db)
+        return [row["attempt_id"] for row in page["test_attempts"]], page["next_cursor"]
+
+    seen = _walk(fetch, 1)
+    assert sorted(seen) == sorted(a.attempt_id for a in db.query(models.TestAttempt))
+    assert len(seen) == len(set(seen))
+
+
+def test_export_batches_do_not_repeat_rows(db, attempts):
+    import main
+    from admin_exports import iter_rows
+
+    rows = list(iter_rows(
+        lambda export_db: main._test_attempts_query(export_db),
+        models.TestAttempt.taken_at, models.TestAttempt.attempt_id,
+        main._test_attempt_key, main._test_attempt_row, batch_size=2
+    ))
+    assert len(rows) == len({row["attempt_id"] for row in rows}) == 7
@@ -0,0 +1,34 @@
+# test_pdf_reports.py
+"""Batch PDF exports: unique entry names and ZIPs that survive a failed report."""
+
+import io
+import zipfile
+
+import pdf_reports
+from pdf_reports import PDFRenderService, report_entries, stream_zip, unique_names
+
+
+def test_unique_names_skip_names_already_taken():
+    assert unique_names(["A.pdf", "A.pdf", "A_2.pdf"]) == ["A.pdf", "A_2.pdf", "A_2_2.pdf"]
+    assert unique_names(["A.pdf", "A_2.pdf", "A.pdf", "A.pdf"]) == ["A.pdf", "A_2.pdf", "A_3.pdf", "A_4.pdf"]
+    assert unique_names(["a/b", "a_b"]) == ["a_b", "a_b_2"]
+
+
+def test_failed_report_becomes_an_error_entry(monkeypatch):
+    def fake_render(payload, report_date=None):
+        if payload["user_name"] == "Broken":
+            raise ValueError("bad payload")
+        return f"%PDF {payload['user_name']}".encode()
+
+    monkeypatch.setattr(pdf_reports, "render_report_pdf", fake_render)
+    service = PDFRenderService(workers=0)
+    payloads = [{"user_name": "Ana"}, {"user_name": "Broken"}, {"user_name": "Ben"}]
+    names = ["Ana.pdf", "Broken.pdf", "Ben.pdf"]
+
+    data = b"".join(stream_zip(report_entries(names, service.render_many(payloads, return_exceptions=True))))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ["Ana.pdf", "Broken_ERROR.txt", "Ben.pdf"]
+        assert archive.read("Ben.pdf") == b"%PDF Ben"
+        assert b"bad payload" in archive.read("Broken_ERROR.txt")
+    assert service.cache.metrics()["entries"] == 2  # Failures are not cached
@@ -0,0 +1,99 @@
+# test_session_store.py
+"""Per-session locking on the shared session stores (no lost updates, one decode per request)."""
+
+import threading
+import time
+
+import pytest
+
+from adaptive_assessment import AdaptiveSession
+from session_store import InMemorySessionStore, RedisSessionStore, SessionLockTimeout, SQLiteSessionStore
+
+
+class FakeRedis:
+    """Just enough of redis-py for RedisSessionStore."""
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False, px=None):
+        with self._lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode("utf-8") if isinstance(value, str) else value
+            return True
+
+    def delete(self, key):
+        return self.data.pop(key, None) is not None
+
+    def incr(self, key):
+        with self._lock:
+            self.data[key] = int(self.data.get(key, 0)) + 1
+            return self.data[key]
+
+    def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        return [k for k in list(self.data) if k.startswith(prefix)]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store_factory(request, tmp_path):
+    redis = FakeRedis()
+
+    def make():
+        # Each call is a separate "worker" sharing the same backend
+        if request.param == "memory":
+            return make.shared
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        return RedisSessionStore(client=redis)
+
+    make.shared = InMemorySessionStore()
+    return make
+
+
+def test_concurrent_updates_are_not_lost(store_factory):
+    stores = [store_factory(), store_factory()]
+    stores[0].save(AdaptiveSession(session_id="s1", user_id=1))
+
+    def bump(store):
+        for _ in range(10):
+            with store.lock("s1"):
+                session = store.get("s1")
+                round_number = session.round_number
+                time.sleep(0.001)  # Widen the read-modify-write window
+                session.round_number = round_number + 1
+                store.save(session)
+
+    threads = [threading.Thread(target=bump, args=(store,)) for store in stores for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stores[0].get("s1").round_number == 40
+
+
+def test_session_is_decoded_once_while_locked(store_factory):
+    store = store_factory()
+    store.save(AdaptiveSession(session_id="s1", user_id=1))
+    with store.lock("s1"):
+        first = store.get("s1")
+        with store.lock("s1"):  # Re-entrant
+            assert store.get("s1") is first
+    assert store.get("s1") is not None
+
+
+def test_lock_times_out_while_another_worker_holds_it(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    holder, waiter = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    waiter.lock_timeout_seconds = 0.1
+    with holder.lock("s1"):
+        with pytest.raises(SessionLockTimeout):
+            with waiter.lock("s1"):
+                pass
+    with waiter.lock("s1"):
+        pass
@@ -0,0 +1,247 @@
+# trait_rollups.py
+"""
+Materialized Trait Distribution Rollups
+
+The trait-distribution report used to join options to student_answers across
+all time on every request, which rules out date ranges and per-week trends at
+our row counts.
+
+trait_daily_rollups holds answer counts per (day, strand, test type, trait):
+- The code that saves answers calls record_answers() in the same transaction,
+  so the rollups stay exact without rescanning student_answers
+- Reports (totals, from/to/strand/test_type filters, daily or weekly series)
+  read only the rollup table
+- Deleting a user subtracts their answers (remove_user_answers)
+- backfill_if_empty() fills the table once from existing answers at startup;
+  rebuild() recomputes it from scratch (e.g. after bulk edits to option
+  trait tags, since rollups keep the trait an answer had when it was saved)
+"""
+
+import datetime
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+import models
+
+
+UNSPECIFIED_STRAND = "UNSPECIFIED"
+
+# (day, strand, test_type, trait_tag)
+RollupKey = Tuple[datetime.date, str, str, str]
+
+
+def normalize_strand(strand: Optional[str]) -> str:
+    return (strand or "").strip().upper() or UNSPECIFIED_STRAND
+
+
+def is_reportable_trait(trait: Optional[str]) -> bool:
+    # Same rule the report always used: untagged options are not traits
+    return bool(trait) and trait != "None"
+
+
+def option_traits(db, option_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+    """trait_tag for each option id (one query)."""
+    ids = set(option_ids)
+    if not ids:
+        return {}
+    return dict(
+        db.query(models.Option.option_id, models.Option.trait_tag)
+        .filter(models.Option.option_id.in_(ids))
+        .all()
+    )
+
+
+def _attempt_day():
+    # Day bucket of an attempt, computed by the database so writes, deletes and
+    # rebuilds all agree (taken_at is a server default)
+    return func.date(models.TestAttempt.taken_at)
+
+
+def attempt_days(db, attempt_ids: Iterable[int]) -> Dict[int, datetime.date]:
+    """Rollup day for each flushed attempt id (one query)."""
+    ids = set(attempt_ids)
+    if not ids:
+        return {}
+    rows = db.query(models.TestAttempt.attempt_id, _attempt_day()).filter(
+        models.TestAttempt.attempt_id.in_(ids)
+    ).all()
+    return {attempt_id: _as_date(day) for attempt_id, day in rows}
+
+
+def record_answers(db, traits: Iterable[Optional[str]], strand: Optional[str], test_type: str,
+                   attempt_id: int) -> List[str]:
+    """
+    Add one attempt's chosen traits to the rollups (inside the caller's transaction,
+    after the attempt has been flushed). Returns the traits that were counted.
+    """
+    counted = [t for t in traits if is_reportable_trait(t)]
+    key = (attempt_days(db, [attempt_id])[attempt_id], normalize_strand(strand), test_type)
+    add_counts(db, Counter((*key, trait) for trait in counted))
+    return counted
+
+
+def add_counts(db, counts: Dict[RollupKey, int]):
+    """Upsert answer_count += n for each rollup key."""
+    if not counts:
+        return
+    rows = [
+        {"day": day, "strand": strand, "test_type": test_type, "trait_tag": trait, "answer_count": n}
+        for (day, strand, test_type, trait), n in sorted(counts.items())  # Fixed order avoids upsert deadlocks
+    ]
+    table = models.TraitDailyRollup.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "strand", "test_type", "trait_tag"],
+            set_={"answer_count": table.c.answer_count + stmt.excluded.answer_count}
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Generic fallback: update, insert when the bucket does not exist yet
+    for row in rows:
+        updated = db.execute(
+            table.update()
+            .where(
+                (table.c.day == row["day"]) & (table.c.strand == row["strand"]) &
+                (table.c.test_type == row["test_type"]) & (table.c.trait_tag == row["trait_tag"])
+            )
+            .values(answer_count=table.c.answer_count + row["answer_count"])
+        )
+        if updated.rowcount == 0:
+            db.execute(table.insert(), row)
+
+
+def _answer_buckets(*conditions):
+    """SELECT day, strand, test_type, trait_tag, count over student_answers (reportable traits only)."""
+    strand = func.coalesce(
+        func.nullif(func.upper(func.trim(models.TestAttempt.user_strand)), ""),
+        UNSPECIFIED_STRAND
+    )
+    day = _attempt_day()
+    return (
+        select(day, strand, models.Test.test_type, models.Option.trait_tag, func.count(models.StudentAnswer.answer_id))
+        .select_from(models.StudentAnswer)
+        .join(models.TestAttempt, models.TestAttempt.attempt_id == models.StudentAnswer.attempt_id)
+        .join(models.Test, models.Test.test_id == models.TestAttempt.test_id)
+        .join(models.Option, models.Option.option_id == models.StudentAnswer.chosen_option_id)
+        .where(models.Option.trait_tag.isnot(None), models.Option.trait_tag.notin_(["", "None"]))
+        .where(models.TestAttempt.taken_at.isnot(None), *conditions)
+        .group_by(day, strand, models.Test.test_type, models.Option.trait_tag)
+    )
+
+
+def remove_user_answers(db, user_id: int):
+    """Take a user's answers back out of the rollups (call before deleting them, same transaction)."""
+    counts = {
+        (_as_date(day), strand, test_type, trait): -count
+        for day, strand, test_type, trait, count in db.execute(
+            _answer_buckets(models.TestAttempt.user_id == user_id)
+        ).all()
+    }
+    if counts:
+        add_counts(db, counts)
+        db.query(models.TraitDailyRollup).filter(
+            models.TraitDailyRollup.answer_count <= 0
+        ).delete(synchronize_session=False)
+
+
+def rebuild(db) -> int:
+    """Recompute every rollup from student_answers (one INSERT ... SELECT). Returns the row count."""
+    db.query(models.TraitDailyRollup).delete(synchronize_session=False)
+    db.execute(insert(models.TraitDailyRollup).from_select(
+        ["day", "strand", "test_type", "trait_tag", "answer_count"], _answer_buckets()
+    ))
+    db.commit()
+    count = db.query(func.count(models.TraitDailyRollup.rollup_id)).scalar() or 0
+    print(f"[REPORT] Rebuilt trait rollups ({count} rows)")
+    return count
+
+
+def backfill_if_empty(db) -> bool:
+    """Build the rollups from existing answers the first time the table is deployed."""
+    if db.query(models.TraitDailyRollup.rollup_id).first() is not None:
+        return False
+    if db.query(models.StudentAnswer.answer_id).first() is None:
+        return False
+    rebuild(db)
+    return True
+
+
+# ---------------- reads ----------------
+
+def _as_date(value) -> datetime.date:
+    # SQLite hands back ISO strings for func.date()/Date columns in some paths
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def _filtered(query, date_from=None, date_to=None, strand=None, test_type=None):
+    R = models.TraitDailyRollup
+    if date_from is not None:
+        query = query.filter(R.day >= date_from)
+    if date_to is not None:
+        query = query.filter(R.day <= date_to)
+    if strand:
+        query = query.filter(R.strand == normalize_strand(strand))
+    if test_type:
+        query = query.filter(R.test_type == test_type)
+    return query
+
+
+def totals(db, date_from: Optional[datetime.date] = None, date_to: Optional[datetime.date] = None,
+           strand: Optional[str] = None, test_type: Optional[str] = None) -> Dict[str, int]:
+    """Answer count per trait within the filters."""
+    R = models.TraitDailyRollup
+    query = db.query(R.trait_tag, func.sum(R.answer_count))
+    rows = _filtered(query, date_from, date_to, strand, test_type).group_by(R.trait_tag).all()
+    return {trait: int(count or 0) for trait, count in rows}
+
+
+def distribution(db, **filters) -> List[dict]:
+    """[{"trait", "count"}] sorted by count, descending."""
+    return [
+        {"trait": trait, "count": count}
+        for trait, count in Counter(totals(db, **filters)).most_common()
+    ]
+
+
+def trend(db, interval: str = "week", date_from: Optional[datetime.date] = None,
+          date_to: Optional[datetime.date] = None, strand: Optional[str] = None,
+          test_type: Optional[str] = None) -> List[dict]:
+    """
+    Trait counts per period, oldest first. interval="week" buckets by ISO week
+    (period = that Monday), interval="day" returns the daily rollups as-is.
+    """
+    R = models.TraitDailyRollup
+    query = db.query(R.day, R.trait_tag, func.sum(R.answer_count))
+    rows = _filtered(query, date_from, date_to, strand, test_type).group_by(R.day, R.trait_tag).all()
+
+    periods: Dict[datetime.date, Counter] = defaultdict(Counter)
+    for day, trait, count in rows:
+        day = _as_date(day)
+        if interval == "week":
+            day -= datetime.timedelta(days=day.weekday())
+        periods[day][trait] += int(count or 0)
+
+    return [
+        {
+            "period": period.isoformat(),
+            "total": sum(counts.values()),
+            "traits": [{"trait": t, "count": c} for t, c in counts.most_common()]
+        }
+        for period, counts in sorted(periods.items())
+    ]
@@ -8,6 +8,7 @@ This module provides:
 4. SPECIALIZED_TRAIT_SYSTEM - New unique traits per career path
 """
 
+from functools import lru_cache
 from typing import Dict, List, Set, Tuple
 from trait_mapping import TRAIT_MAPPING, apply_trait_mapping
 
@@ -463,10 +464,43 @@ EXPANDED_TRAIT_MAPPING = {
 }
 
 
+# ==================== LOOKUP INDEXES ====================
+# Built once at import so the matching functions below never rescan
+# TRAIT_CATEGORIES per trait.
+
+def _build_category_index() -> Dict[str, Dict[str, bool]]:
+    """trait -> {category: is_core}, categories in TRAIT_CATEGORIES order"""
+    index: Dict[str, Dict[str, bool]] = {}
+    for cat_name, cat_data in TRAIT_CATEGORIES.items():
+        for trait in cat_data["related_traits"]:
+            index.setdefault(trait, {})[cat_name] = False
+        for trait in cat_data["core_traits"]:
+            index.setdefault(trait, {})[cat_name] = True
+    # Re-order each trait's categories to follow TRAIT_CATEGORIES
+    order = {cat_name: i for i, cat_name in enumerate(TRAIT_CATEGORIES)}
+    return {
+        trait: dict(sorted(cats.items(), key=lambda item: order[item[0]]))
+        for trait, cats in index.items()
+    }
+
+
+TRAIT_CATEGORY_INDEX: Dict[str, Dict[str, bool]] = _build_category_index()
+_NO_CATEGORIES: Dict[str, bool] = {}
+
+
+def get_trait_categories(trait: str) -> Dict[str, bool]:
+    """Categories a trait belongs to, as {category: is_core} (empty if none)"""
+    return TRAIT_CATEGORY_INDEX.get(trait, _NO_CATEGORIES)
+
+
+@lru_cache(maxsize=65536)
 def get_trait_similarity(trait1: str, trait2: str) -> float:
     """
     Calculate similarity between two traits (0.0 to 1.0)
     Returns 1.0 for exact match, relationship score for related traits, 0.0 otherwise
+    
+    Memoized per (trait1, trait2). The order matters: a few TRAIT_RELATIONSHIPS
+    pairs carry a different weight in each direction.
     """
     # Exact match
     if trait1 == trait2:
@@ -488,14 +522,15 @@ def get_trait_similarity(trait1: str, trait2: str) -> float:
         if trait1 in TRAIT_RELATIONSHIPS[trait2]:
             return TRAIT_RELATIONSHIPS[trait2][trait1]
     
-    # Check if both traits are in the same category
-    for category_data in TRAIT_CATEGORIES.values():
-        all_category_traits = set(category_data["core_traits"] + category_data["related_traits"])
-        if trait1 in all_category_traits and trait2 in all_category_traits:
+    # Check if both traits are in the same category (first shared category wins)
+    categories2 = get_trait_categories(trait2)
+    for cat_name, core1 in get_trait_categories(trait1).items():
+        core2 = categories2.get(cat_name)
+        if core2 is not None:
             # Both in same category - give base similarity
-            if trait1 in category_data["core_traits"] and trait2 in category_data["core_traits"]:
+            if core1 and core2:
                 return 0.6  # Both core traits in same category
-            elif trait1 in category_data["core_traits"] or trait2 in category_data["core_traits"]:
+            elif core1 or core2:
                 return 0.4  # One core, one related in same category
             return 0.3  # Both related traits in same category
     
@@ -551,15 +586,14 @@ def calculate_trait_match_score(user_traits: List[str], course_traits: List[str]
     user_categories = set()
     course_categories = set()
     
+    # One add() at a time, as set.update() pre-sizes the table and changes the iteration order
     for u_trait in user_traits:
-        for cat_name, cat_data in TRAIT_CATEGORIES.items():
-            if u_trait in cat_data["core_traits"] or u_trait in cat_data["related_traits"]:
-                user_categories.add(cat_name)
+        for cat_name in get_trait_categories(u_trait):
+            user_categories.add(cat_name)
     
     for c_trait in course_traits:
-        for cat_name, cat_data in TRAIT_CATEGORIES.items():
-            if c_trait in cat_data["core_traits"] or c_trait in cat_data["related_traits"]:
-                course_categories.add(cat_name)
+        for cat_name in get_trait_categories(c_trait):
+            course_categories.add(cat_name)
     
     # Bonus for matching categories
     matching_categories = user_categories.intersection(course_categories)
@@ -579,6 +613,117 @@ def calculate_trait_match_score(user_traits: List[str], course_traits: List[str]
     }
 
 
+class CourseTraitMatrix:
+    """
+    Course x trait matrix for calculate_catalog_match_scores: each course's
+    traits as indexes into one trait vocabulary, plus the per-course values
+    that do not depend on the user (normalized trait set, categories).
+    """
+    
+    def __init__(self, course_traits: List[List[str]]):
+        self.vocabulary: List[str] = []
+        self.trait_index: Dict[str, int] = {}
+        self.rows: List[List[int]] = []
+        self.normalized: List[Set[str]] = []
+        self.categories: List[Set[str]] = []
+        
+        for traits in course_traits:
+            row = []
+            for trait in traits:
+                idx = self.trait_index.get(trait)
+                if idx is None:
+                    idx = self.trait_index[trait] = len(self.vocabulary)
+                    self.vocabulary.append(trait)
+                row.append(idx)
+            self.rows.append(row)
+            self.normalized.append({EXPANDED_TRAIT_MAPPING.get(t, t) for t in traits})
+            categories = set()
+            for trait in traits:
+                for cat_name in get_trait_categories(trait):
+                    categories.add(cat_name)
+            self.categories.append(categories)
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def similarity_rows(self, user_traits: List[str]) -> Dict[str, List[float]]:
+        """user trait -> similarity to every vocabulary trait"""
+        return {
+            u_trait: [get_trait_similarity(u_trait, c_trait) for c_trait in self.vocabulary]
+            for u_trait in dict.fromkeys(user_traits)
+        }
+
+
+def calculate_catalog_match_scores(user_traits: List[str], matrix: CourseTraitMatrix) -> List[Tuple[float, List[str], Dict]]:
+    """
+    calculate_trait_match_score for one user against every course at once
+    
+    Returns one (match_score, matched_traits, match_details) per matrix row,
+    identical to the scalar function. The user-side work (normalization,
+    categories, a similarity row per user trait) is done once instead of
+    once per course.
+    """
+    if not user_traits:
+        return [(0.0, [], {"exact": [], "similar": [], "category": []}) for _ in matrix.rows]
+    
+    normalized_user = [EXPANDED_TRAIT_MAPPING.get(t, t) for t in user_traits]
+    similarity = matrix.similarity_rows(user_traits)
+    user_sims = [(u_trait, similarity[u_trait]) for u_trait in user_traits]
+    vocabulary = matrix.vocabulary
+    
+    user_categories = set()
+    for u_trait in user_traits:
+        for cat_name in get_trait_categories(u_trait):
+            user_categories.add(cat_name)
+    
+    results = []
+    for row, normalized_course, course_categories in zip(matrix.rows, matrix.normalized, matrix.categories):
+        if not row:
+            results.append((0.0, [], {"exact": [], "similar": [], "category": []}))
+            continue
+        
+        exact_matches = []
+        similar_matches = []
+        total_score = 0.0
+        used_course_traits = set()
+        
+        # First pass: Exact matches on normalized traits
+        for u_trait in normalized_user:
+            if u_trait in normalized_course and u_trait not in used_course_traits:
+                exact_matches.append(u_trait)
+                total_score += 15.0
+                used_course_traits.add(u_trait)
+        
+        # Second pass: Similar matches, first unused course trait at >= 0.5
+        for u_trait, sims in user_sims:
+            for idx in row:
+                c_trait = vocabulary[idx]
+                if c_trait in used_course_traits:
+                    continue
+                sim = sims[idx]
+                if sim >= 0.5:
+                    similar_matches.append((u_trait, c_trait, sim))
+                    total_score += sim * 10.0
+                    used_course_traits.add(c_trait)
+                    break
+        
+        # Third pass: Category-level matches
+        category_matches = []
+        for cat in user_categories.intersection(course_categories):
+            category_matches.append(cat)
+            total_score += 3.0
+        
+        matched_traits = exact_matches + [f"{u}≈{c}" for u, c, _ in similar_matches[:3]]
+        results.append((total_score, matched_traits[:7], {
+            "exact": exact_matches,
+            "similar": [(u, c, round(sim, 2)) for u, c, sim in similar_matches],
+            "category": category_matches,
+            "user_categories": list(user_categories),
+            "course_categories": list(course_categories)
+        }))
+    return results
+
+
 def get_user_profile_from_traits(trait_scores: Dict[str, float]) -> Dict:
     """
     Analyze user's trait scores to create a profile summary
@@ -596,11 +741,8 @@ def get_user_profile_from_traits(trait_scores: Dict[str, float]) -> Dict:
     # Count category matches
     category_scores = {}
     for trait in top_traits:
-        for cat_name, cat_data in TRAIT_CATEGORIES.items():
-            if trait in cat_data["core_traits"]:
-                category_scores[cat_name] = category_scores.get(cat_name, 0) + 2
-            elif trait in cat_data["related_traits"]:
-                category_scores[cat_name] = category_scores.get(cat_name, 0) + 1
+        for cat_name, is_core in get_trait_categories(trait).items():
+            category_scores[cat_name] = category_scores.get(cat_name, 0) + (2 if is_core else 1)
     
     # Sort categories by score
     sorted_categories = sorted(category_scores.items(), key=lambda x: x[1], reverse=True)
@@ -663,3 +805,29 @@ if __name__ == "__main__":
     print(f"  Score: {score:.1f}")
     print(f"  Matched: {matched}")
     print(f"  Details: {details}")
+    
+    # Catalog-level matching must agree with the scalar function course by course
+    import random
+    from courses_specialized import COURSES_POOL_SPECIALIZED
+    
+    catalog = [
+        [t.strip() for t in (", ".join(c["trait_tag"]) if isinstance(c.get("trait_tag"), list) else c.get("trait_tag") or "").split(",")]
+        for c in COURSES_POOL_SPECIALIZED
+    ]
+    catalog += [[], ["Helping-others", "Helping-others"], ["Scientific-thinking", "Research-oriented", "Laboratory"]]
+    matrix = CourseTraitMatrix(catalog)
+    vocabulary = sorted(set(matrix.vocabulary) | set(TRAIT_CATEGORY_INDEX) | set(TRAIT_RELATIONSHIPS) | set(EXPANDED_TRAIT_MAPPING))
+    
+    rng = random.Random(42)
+    mismatches = 0
+    for _ in range(500):
+        user = rng.sample(vocabulary, rng.randint(0, 12))
+        batch = calculate_catalog_match_scores(user, matrix)
+        scalar = [calculate_trait_match_score(user, traits) for traits in catalog]
+        if batch != scalar:
+            mismatches += 1
+        ranking = lambda results: sorted(range(len(results)), key=lambda i: results[i][0], reverse=True)
+        if ranking(batch) != ranking(scalar):
+            mismatches += 1
+    print(f"\n🧮 Catalog Matching Parity: {len(catalog)} courses x 500 users, {mismatches} mismatches")
+    assert mismatches == 0